@@ -559,10 +559,15 @@ type AnalysisResult struct {
 	ExecutionMode ExecutionMode `json:"execution_mode"`
 	Reason        string        `json:"reason"`
 	Details       struct {
-		Imports             []string `json:"imports"`
-		HasExplicitGPUCalls bool     `json:"has_explicit_gpu_calls"`
-		ExplicitGPUCalls    []string `json:"explicit_gpu_calls"`
-		Lines               []int    `json:"lines_considered"`
+		Imports                 []string `json:"imports"`
+		HasExplicitGPUCalls     bool     `json:"has_explicit_gpu_calls"`
+		ExplicitGPUCalls        []string `json:"explicit_gpu_calls"`
+		Lines                   []int    `json:"lines_considered"`
+		EstimatedGPUMemoryBytes int64    `json:"estimated_gpu_memory_bytes"`
+		BlockingCalls           [][]any  `json:"blocking_calls"`     // [call, line, kind]
+		RequestInitCalls        [][]any  `json:"request_init_calls"` // [call, line, kind, function, move to, latency ms]
+		RequestInitLatencyMs    float64  `json:"request_init_latency_ms"`
+		GPUAccelerationHints    []string `json:"gpu_acceleration_hints"`
 	} `json:"details"`
 }
 
@@ -910,6 +915,28 @@ func printAnalysisResult(result map[string]AnalysisResult) {
 			fmt.Printf("    CUDA Calls: %v\n", analysis.Details.ExplicitGPUCalls)
 		}
 		fmt.Printf("    Lines Considered: %v\n", analysis.Details.Lines)
+		if analysis.Details.EstimatedGPUMemoryBytes > 0 {
+			fmt.Printf("    Estimated GPU Memory: %d MiB\n", analysis.Details.EstimatedGPUMemoryBytes/(1024*1024))
+		}
+		if len(analysis.Details.BlockingCalls) > 0 {
+			fmt.Printf("    Blocking Calls in async handler:\n")
+			for _, call := range analysis.Details.BlockingCalls {
+				if len(call) == 3 {
+					fmt.Printf("      line %v: %v (%v)\n", call[1], call[0], call[2])
+				}
+			}
+		}
+		for _, hint := range analysis.Details.GPUAccelerationHints {
+			fmt.Printf("    Hint: %s\n", hint)
+		}
+		if len(analysis.Details.RequestInitCalls) > 0 {
+			fmt.Printf("    Initialization on every request (~%.0f ms per request):\n", analysis.Details.RequestInitLatencyMs)
+			for _, call := range analysis.Details.RequestInitCalls {
+				if len(call) == 6 {
+					fmt.Printf("      line %v: %v in %v, move to %v (~%v ms)\n", call[1], call[0], call[3], call[4], call[5])
+				}
+			}
+		}
 	}
 }
 func setInferredExecutionMode(f *fn.Function, exmode ExecutionMode) {
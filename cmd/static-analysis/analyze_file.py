@@ -1,12 +1,57 @@
 import ast
-
-from constants import ExecutionModes, GPU_IMPORTS, TENSOR_SIZE_THRESHOLD_TENSORFLOW, \
-    TENSOR_SIZE_THRESHOLD_PYTORCH, PYTORCH_TENSOR_OPS, TENSORFLOW_TENSOR_OPS
-from tensor_estimation import estimate_pytorch_tensor_size, estimate_tensorflow_tensor_size
+import os
+
+from constant_propagation import ConstantScopes, CUDA, OPTIONAL_CUDA, is_device_func
+from calibration import load_thresholds
+from constants import ExecutionModes, GPU_IMPORTS, PYTORCH_TENSOR_OPS, TENSORFLOW_TENSOR_OPS, LARGE_FILE_SIZE, \
+    GPU_MEMORY_OVERHEAD, CUDA_CONTEXT_BYTES, SCOPE_WEIGHTS, LOOP_WEIGHT, \
+    REQUEST_HANDLERS, GPU_LIBRARY_IMPORTS, ARRAY_LIBRARIES, NUMPY_ARRAY_OPS, PANDAS_FRAME_OPS, CUML_ESTIMATORS, \
+    GPU_EQUIVALENTS, ARRAY_BYTES_THRESHOLD
+from hot_path import CallGraph, MODULE_SCOPE, REQUEST, STARTUP, OTHER
+from blocking_lint import BlockingCallLinter, is_self_attribute
+from request_init import init_call, move_target, INIT_CALL_NAMES
+from model_zoo import find_model, weight_dtype_bytes, LoadedModel, MODEL_CALL_NAMES, INFERENCE_METHODS
+from prefilter import may_use_gpu, PREFILTER_REASON
+from symbols import ImportTable
+from tensor_estimation import estimate_pytorch_tensor_size, estimate_tensorflow_tensor_size, estimate_op_cost, \
+    dtype_bytes, matmul_cost, tensor_shape, as_tensor, array_value, AtLeast, TensorValue, SAME_SHAPE_METHODS, \
+    COST_OP_NAMES
+from token_scanner import scan_file, RELEVANT_CALL_NAMES
 from util import get_full_attr_name
 
-
-def analyze_file(filename):
+# (root name, op suffix) -> framework, so an op is found with a few dict
+# lookups instead of scanning the op sets for every call.
+TENSOR_OP_LOOKUP = {
+    **{("torch", op): "pytorch" for op in PYTORCH_TENSOR_OPS},
+    **{("tf", op): "tensorflow" for op in TENSORFLOW_TENSOR_OPS},
+}
+MAX_TENSOR_OP_PARTS = max(op.count('.') + 1 for _, op in TENSOR_OP_LOOKUP)
+ARRAY_OPS = {"numpy": NUMPY_ARRAY_OPS, "pandas": PANDAS_FRAME_OPS}
+# Last names of the tensor constructors and array ops, e.g. uniform
+TENSOR_OP_NAMES = {op.rpartition('.')[2] for _, op in TENSOR_OP_LOOKUP}
+ARRAY_OP_NAMES = {op.rpartition('.')[2] for ops in ARRAY_OPS.values() for op in ops}
+# Last names of every call evaluate_tensor can give a value, any other call is
+# rejected by one set lookup before its name is even resolved
+TENSOR_VALUE_NAMES = SAME_SHAPE_METHODS | TENSOR_OP_NAMES | ARRAY_OP_NAMES | MODEL_CALL_NAMES | COST_OP_NAMES
+TENSOR_SIZE_ESTIMATORS = {
+    "pytorch": estimate_pytorch_tensor_size,
+    "tensorflow": estimate_tensorflow_tensor_size,
+}
+# Last name of every call explicit_gpu_calls_check can match
+EXPLICIT_GPU_CALL_NAMES = {'device', 'to', 'cuda'}
+# Node types which never contain a call or import
+LEAF_NODES = (ast.Constant, ast.Name, ast.expr_context, ast.operator, ast.unaryop, ast.cmpop, ast.boolop,
+              ast.alias, ast.Pass, ast.Break, ast.Continue, ast.Global, ast.Nonlocal)
+
+
+def analyze_file(filename, large_file_size=LARGE_FILE_SIZE, thresholds=None):
+    """Classify a single python file.
+
+    Files larger than large_file_size bytes are scanned token by token
+    instead of being parsed into a syntax tree, which keeps memory bounded.
+    Tensors and functions are big by the given calibration.Thresholds, by
+    default those of the calibrated profile or the constants.
+    """
     result = {
         "execution_mode": ExecutionModes.CPU,
         "reason": "",
@@ -19,25 +64,81 @@ def analyze_file(filename):
     }
 
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            source = f.read()
+        if not may_use_gpu(filename):
+            result["reason"] = PREFILTER_REASON
+            result["details"]["has_explicit_gpu_calls"] = False
+            result["details"]["small_calls"] = []
+            result["details"]["big_calls"] = []
+            result["details"]["cost"] = {"functions": {}, "ops": [], "scopes": {}, "request_path": []}
+            result["details"]["models"] = []
+            result["details"]["estimated_gpu_memory_bytes"] = 0
+            result["details"]["blocking_calls"] = []
+            result["details"]["request_init_calls"] = []
+            result["details"]["request_init_latency_ms"] = 0
+            result["details"]["array_calls"] = []
+            result["details"]["array_ops"] = []
+            result["details"]["gpu_acceleration_hints"] = []
+            return result
+
+        thresholds = thresholds or load_thresholds()
+        analyzer = GPUCodeAnalyzer(thresholds)
+        if large_file_size is not None and os.path.getsize(filename) > large_file_size:
+            analyzer.scan(filename)
+        else:
+            with open(filename, 'r', encoding='utf-8') as f:
+                source = f.read()
 
-        tree = ast.parse(source)
-        analyzer = GPUCodeAnalyzer()
-        analyzer.visit(tree)
+            tree = ast.parse(source)
+            analyzer.visit(tree)
 
         explicit_gpu_calls = analyzer.explicit_gpu_calls
         imports_found = analyzer.imports
         lines_considered = analyzer.lines_considered
         small_calls = analyzer.small_calls
         big_calls = analyzer.big_calls
-
-        result["details"]["explicit_gpu_calls"] = list(set(explicit_gpu_calls))
-        result["details"]["imports"] = list(imports_found)
+        optional_gpu_calls = analyzer.optional_gpu_calls
+        function_costs = analyzer.function_costs
+        analyzer.weigh_costs()
+        analyzer.finish_blocking_calls()
+        weighted_flops = analyzer.weighted_flops
+        costly_function = max(weighted_flops, key=weighted_flops.get, default=None)
+        if costly_function is not None and weighted_flops[costly_function] < thresholds.function_flops:
+            costly_function = None
+        # big tensors created once at startup don't need a GPU on every request
+        hot_big_calls = [call for call, owner in zip(big_calls, analyzer.big_call_owners)
+                         if analyzer.owner_scopes.get(owner) != STARTUP]
+        models = analyzer.models
+        # a model loaded at startup is big by the inferences run on requests
+        model_flops = analyzer.model_flops
+        big_models = [model for model in models if model_flops[model[0]] >= thresholds.function_flops]
+        gpu_libraries = analyzer.gpu_libraries
+        big_array_calls = [call for call in analyzer.array_calls if call[2] >= ARRAY_BYTES_THRESHOLD]
+        costly_array_ops = [op for op in analyzer.array_ops if op[1] >= thresholds.function_flops]
+        accelerated = {call[0] for call in big_array_calls} | {op[3] for op in costly_array_ops}
+        hint_libraries = accelerated | analyzer.estimator_libraries
+
+        result["details"]["explicit_gpu_calls"] = sorted(set(explicit_gpu_calls))
+        result["details"]["optional_gpu_calls"] = sorted(set(optional_gpu_calls))
+        result["details"]["imports"] = sorted(imports_found)
         result["details"]["has_explicit_gpu_calls"] = bool(explicit_gpu_calls)
         result["details"]["lines_considered"] = lines_considered
         result["details"]["small_calls"] = small_calls
         result["details"]["big_calls"] = big_calls
+        result["details"]["cost"] = {
+            "functions": function_costs,
+            "ops": sorted(analyzer.op_costs, key=lambda op: (op[2], op[0])),
+            "scopes": analyzer.scope_costs,
+            "request_path": analyzer.request_path,
+        }
+        result["details"]["models"] = models
+        result["details"]["blocking_calls"] = analyzer.blocking_calls
+        init_calls = analyzer.request_init_calls()
+        result["details"]["request_init_calls"] = init_calls
+        result["details"]["request_init_latency_ms"] = round(sum(call[5] for call in init_calls), 3)
+        result["details"]["array_calls"] = sorted(analyzer.array_calls, key=lambda call: (call[3], call[1]))
+        result["details"]["array_ops"] = sorted(analyzer.array_ops, key=lambda op: (op[2], op[0]))
+        result["details"]["gpu_acceleration_hints"] = [
+            f"GPU-acceleratable with {GPU_EQUIVALENTS[library]} ({library})" for library in sorted(hint_libraries)]
 
         # TODO rework
         if explicit_gpu_calls:
@@ -45,15 +146,47 @@ def analyze_file(filename):
             result["reason"] = (
                 f"Detected {len(explicit_gpu_calls)} explicit gpu calls"
             )
-        elif imports_found and small_calls and not big_calls:
+        elif gpu_libraries:
+            result["execution_mode"] = ExecutionModes.GPU
+            result["reason"] = (
+                f"Detected imports of {', '.join(sorted(gpu_libraries))}, which only run on a GPU."
+            )
+        elif big_models:
+            name, params, flops, _ = max(big_models, key=lambda model: model_flops[model[0]])
+            result["execution_mode"] = ExecutionModes.GPU_PREFERRED
+            result["reason"] = (
+                f"Detected {len(big_models)} pretrained model(s), the largest {name} with {params / 1e6:.0f}M "
+                f"parameters and {flops / 1e9:.3g} GFLOPs per inference, and {len(imports_found)} relevant imports."
+            )
+        elif imports_found and hot_big_calls:
+            result["execution_mode"] = ExecutionModes.GPU_PREFERRED
+            result["reason"] = (
+                f"Detected {len(hot_big_calls)} big pytorch/tensorflow call(s) and {len(imports_found)} relevant imports."
+            )
+        elif imports_found and costly_function is not None:
+            scope = analyzer.owner_scopes.get(analyzer.cost_owners[costly_function], OTHER)
+            result["execution_mode"] = ExecutionModes.GPU_PREFERRED
+            result["reason"] = (
+                f"Estimated {weighted_flops[costly_function]:.3g} weighted FLOPs in {costly_function} ({scope} code) "
+                f"and {len(imports_found)} relevant imports."
+            )
+        elif accelerated:
             result["execution_mode"] = ExecutionModes.CPU_PREFERRED
             result["reason"] = (
-                f"Detected {len(small_calls)} small pytorch/tensorflow call(s) and {len(imports_found)} relevant imports."
+                f"Detected {len(big_array_calls)} large NumPy/pandas call(s) and {len(costly_array_ops)} costly "
+                f"array op(s) running on the CPU, GPU-acceleratable with "
+                f"{'/'.join(GPU_EQUIVALENTS[library] for library in sorted(accelerated))}."
             )
         elif imports_found and big_calls:
-            result["execution_mode"] = ExecutionModes.GPU_PREFERRED
+            result["execution_mode"] = ExecutionModes.CPU_PREFERRED
             result["reason"] = (
-                f"Detected {len(big_calls)} big pytorch/tensorflow call(s) and {len(imports_found)} relevant imports."
+                f"Detected {len(big_calls)} big pytorch/tensorflow call(s), all in startup code, "
+                f"and {len(imports_found)} relevant imports."
+            )
+        elif imports_found and small_calls:
+            result["execution_mode"] = ExecutionModes.CPU_PREFERRED
+            result["reason"] = (
+                f"Detected {len(small_calls)} small pytorch/tensorflow call(s) and {len(imports_found)} relevant imports."
             )
         elif imports_found:
             result["execution_mode"] = ExecutionModes.CPU_PREFERRED
@@ -63,6 +196,10 @@ def analyze_file(filename):
         else:
             result["reason"] = "No GPU-related calls or imports detected."
 
+        result["details"]["estimated_gpu_memory_bytes"] = 0
+        if result["execution_mode"] in (ExecutionModes.GPU, ExecutionModes.GPU_PREFERRED):
+            result["details"]["estimated_gpu_memory_bytes"] = estimate_gpu_memory(function_costs)
+
     except Exception as e:
         result["reason"] = f"Failed to analyze {filename}: {e}"
 
@@ -70,51 +207,503 @@ def analyze_file(filename):
     return result
 
 
+def estimate_gpu_memory(function_costs):
+    """GPU memory needed to hold every tensor and model weight of the file at
+    once, plus allocator overhead and the CUDA context."""
+    total = sum(cost["bytes"] for cost in function_costs.values())
+    return int(total * GPU_MEMORY_OVERHEAD) + CUDA_CONTEXT_BYTES
+
+
 class GPUCodeAnalyzer(ast.NodeVisitor):
-    def __init__(self):
+    def __init__(self, thresholds=None):
+        self.thresholds = thresholds or load_thresholds()
+        self.tensor_thresholds = {
+            "pytorch": self.thresholds.tensor_bytes_pytorch,
+            "tensorflow": self.thresholds.tensor_bytes_tensorflow,
+        }
         self.imports = set()
+        self.import_table = ImportTable()
         self.explicit_gpu_calls = []
         self.lines_considered = []
         self.small_calls = []
         self.big_calls = []
+        self.optional_gpu_calls = []
+        self.scopes = ConstantScopes(self.evaluate_tensor)
+        self.scope_names = []
+        # {"function or Class.method": {"bytes": ..., "flops": ...}}
+        self.function_costs = {}
+        # Hot path weighting: the function or method owning the code being
+        # visited, which of its calls are in loops and the calls between them
+        self.owners = [MODULE_SCOPE]
+        self.cost_owners = {}
+        self.loop_depth = 0
+        self.loop_depths = []
+        self.loop_flops = {}
+        self.big_call_owners = []
+        self.call_graph = CallGraph()
+        self.weighted_flops = {}
+        self.scope_costs = {}
+        self.owner_scopes = {}
+        self.request_path = []
+        # Calls blocking the event loop in async handlers
+        self.blocking_calls = []
+        # the models bound to self attributes by (class, attribute) and
+        # (class, attribute, line) of the self.attribute() calls in handlers
+        self.model_attributes = {}
+        self.handler_self_calls = []
+        # (call, line, kind, latency ms, owner, in loop) of initialization calls
+        self.init_calls = []
+        self.looped = set()
+        self.op_costs = []
+        self.models = []
+        # (model name, FLOPs, owner, in loop) of every call running a model,
+        # weighed into the FLOPs of each model's costliest inference
+        self.model_inferences = []
+        self.model_flops = {}
+        # CPU array work with a GPU equivalent: (library, call, bytes, line)
+        # of arrays and frames, (op, FLOPs, line, library) of ops on them
+        self.array_calls = []
+        self.array_ops = []
+        self.estimator_libraries = set()
+        self.gpu_libraries = set()
+
+    # Visitor function of each node type, shared by the analyzers of all files
+    _handlers = {}
+
+    def visit(self, node):
+        # Same as NodeVisitor.visit, but the visitor method is looked up once
+        # per node type instead of once per node.
+        cls = node.__class__
+        handler = self._handlers.get(cls)
+        if handler is None:
+            method = getattr(GPUCodeAnalyzer, 'visit_' + cls.__name__, None)
+            # NodeVisitor.visit_Constant only forwards to the deprecated visit_Num etc.
+            if method is None or method is getattr(ast.NodeVisitor, 'visit_Constant', None):
+                # nodes without children of interest are not entered at all
+                handler = GPUCodeAnalyzer._skip if issubclass(cls, LEAF_NODES) else GPUCodeAnalyzer.generic_visit
+            else:
+                handler = method
+            self._handlers[cls] = handler
+        return handler(self, node)
+
+    def generic_visit(self, node):
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+
+    def _skip(self, node):
+        pass
+
+    def scan(self, filename):
+        """Collect the same findings as visit() from a token scan of filename."""
+        kinds = []
+        for event in scan_file(filename, max(self.tensor_thresholds.values())):
+            kind = event[0]
+            if kind == "import":
+                self.visit(event[1])
+            elif kind == "call":
+                self.check_call(event[1])
+            elif kind == "assign":
+                if isinstance(event[2], ast.BinOp):
+                    self.check_binary(event[2])
+                if event[1].startswith("self."):
+                    self.add_model_attribute(event[1][len("self."):], event[2])
+                else:
+                    self.scopes.bind(event[1], event[2])
+            elif kind == "handler":
+                self.lint_handler(event[1])
+            elif kind == "ref":
+                self.add_call_edge(event[1], event[2])
+            elif kind == "enter":
+                kinds.append(event[1])
+                if event[1] == "loop":
+                    self.loop_depth += 1
+                else:
+                    self.enter_scope(event[1], event[2])
+            elif kind == "exit":
+                if kinds.pop() == "loop":
+                    self.loop_depth -= 1
+                else:
+                    self.exit_scope()
+
+    def add_import(self, module):
+        # submodules such as torch.nn count as their framework
+        root = module.partition('.')[0] if module else None
+        if root in GPU_IMPORTS:
+            self.imports.add(root)
+        elif root in GPU_LIBRARY_IMPORTS:
+            self.gpu_libraries.add(root)
 
     def visit_Import(self, node):
+        self.import_table.add(node)
         for alias in node.names:
-            if alias.name in GPU_IMPORTS:
-                self.imports.add(alias.name)
+            self.add_import(alias.name)
         self.generic_visit(node)
 
     def visit_ImportFrom(self, node):
-        if node.module in GPU_IMPORTS:
-            self.imports.add(node.module)
+        self.import_table.add(node)
+        self.add_import(node.module)
         self.generic_visit(node)
 
     def visit_Call(self, node):
-        full_name = get_full_attr_name(node.func)
+        func = node.func
+        if isinstance(func, ast.Name):
+            self.add_call_edge(func.id, False)
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'self':
+            self.add_call_edge(func.attr, True)
+        self.check_call(node)
+        self.generic_visit(node)
 
-        self.explicit_gpu_calls, self.lines_considered = explicit_gpu_calls_check(node)
+    def visit_Attribute(self, node):
+        # a dotted name such as self.encoder.layer.forward holds no calls,
+        # only the expression it starts from can
+        value = node.value
+        while value.__class__ is ast.Attribute:
+            value = value.value
+        if value.__class__ is not ast.Name:
+            self.visit(value)
+
+    def visit_BinOp(self, node):
+        self.check_binary(node)
+        self.generic_visit(node)
 
-        # TODO check for numpy, pandas, https://github.com/rapidsai/cuml
-        # todo maybe check if function uses a AI model
-        # Track pytorch function calls
-        if is_pytorch_tensor_op(full_name):
-            size = estimate_pytorch_tensor_size(node)
-            if size is not None:
-                if size < TENSOR_SIZE_THRESHOLD_PYTORCH:
-                    self.small_calls.append(("pytorch", full_name, size, node.lineno))
-                else:
-                    self.big_calls.append(("pytorch", full_name, size, node.lineno))
-
-        # Track tensorflow function calls
-        elif is_tensorflow_tensor_op(full_name):
-            size = estimate_tensorflow_tensor_size(node)
-            if size is not None:
-                if size < TENSOR_SIZE_THRESHOLD_TENSORFLOW:
-                    self.small_calls.append(("tensorflow", full_name, size, node.lineno))
-                else:
-                    self.big_calls.append(("tensorflow", full_name, size, node.lineno))
+    # Scopes and bindings for constant propagation
+
+    def visit_Module(self, node):
+        self.scopes.bind_module_constants(node)
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        self.enter_scope("function", node.name)
+        self.bind_arguments(node.args)
+        self.generic_visit(node)
+        if isinstance(node, ast.AsyncFunctionDef) and node.name in REQUEST_HANDLERS:
+            self.lint_handler(node)
+        self.exit_scope()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
 
+    def visit_Lambda(self, node):
+        self.scopes.push("function")
+        self.bind_arguments(node.args)
         self.generic_visit(node)
+        self.scopes.pop()
+
+    def visit_ClassDef(self, node):
+        self.enter_scope("class", node.name)
+        self.generic_visit(node)
+        self.exit_scope()
+
+    def lint_handler(self, node):
+        """Lint an async handler, while the names bound in it are in scope."""
+        linter = BlockingCallLinter(self.scopes.evaluate, self.import_table.resolve)
+        self.blocking_calls.extend(linter.lint(node))
+        class_name = self.call_graph.classes.get(self.owners[-1])
+        self.handler_self_calls.extend((class_name, attr, lineno) for attr, lineno in linter.self_calls)
+
+    def add_model_attribute(self, attr, value_node):
+        value = self.scopes.evaluate(value_node) if value_node is not None else None
+        if isinstance(value, LoadedModel):
+            self.model_attributes[(self.call_graph.classes.get(self.owners[-1]), attr)] = value
+
+    def finish_blocking_calls(self):
+        """Add the handlers' calls of self attributes which hold a model, once
+        every method has been visited, and sort the findings by line."""
+        for class_name, attr, lineno in self.handler_self_calls:
+            if (class_name, attr) in self.model_attributes:
+                self.blocking_calls.append((f"self.{attr}", lineno, "inference"))
+        self.blocking_calls.sort(key=lambda finding: (finding[1], finding[0]))
+
+    def bind_arguments(self, args):
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None:
+                self.scopes.bind(arg.arg, None)
+
+    def enter_scope(self, kind, name):
+        """Enter the body of a named function or class."""
+        owner = self.owners[-1]
+        if kind == "function" and owner == MODULE_SCOPE:
+            # a function or method directly in the module or in classes
+            class_name = ".".join(self.scope_names) or None
+            owner = f"{class_name}.{name}" if class_name else name
+            self.call_graph.add_function(owner, class_name)
+        self.scopes.push(kind)
+        self.scope_names.append(name)
+        self.owners.append(owner)
+        self.loop_depths.append(self.loop_depth)
+        self.loop_depth = 0
+
+    def exit_scope(self):
+        self.scopes.pop()
+        self.scope_names.pop()
+        self.owners.pop()
+        self.loop_depth = self.loop_depths.pop()
+
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        for target in node.targets:
+            if is_self_attribute(target):
+                self.add_model_attribute(target.attr, node.value)
+            self.scopes.bind_target(target, node.value)
+
+    def visit_AnnAssign(self, node):
+        self.generic_visit(node)
+        self.scopes.bind_target(node.target, node.value)
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+        if isinstance(node.target, ast.Name):
+            value = ast.BinOp(left=ast.Name(id=node.target.id, ctx=ast.Load()), op=node.op, right=node.value)
+            self.scopes.bind(node.target.id, value)
+
+    def visit_NamedExpr(self, node):
+        self.generic_visit(node)
+        self.scopes.bind_target(node.target, node.value)
+
+    def visit_For(self, node):
+        self.scopes.bind_target(node.target)
+        self.visit(node.target)
+        self.visit(node.iter)
+        self.visit_loop_body(node)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self.visit(node.test)
+        self.visit_loop_body(node)
+
+    def visit_loop_body(self, node):
+        self.loop_depth += 1
+        for stmt in node.body:
+            self.visit(stmt)
+        self.loop_depth -= 1
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    def visit_With(self, node):
+        for item in node.items:
+            if item.optional_vars is not None:
+                self.scopes.bind_target(item.optional_vars)
+        self.generic_visit(node)
+
+    visit_AsyncWith = visit_With
+
+    def call_name(self, func, names):
+        """Return the resolved name of a call whose last name is in names,
+        otherwise None.  Most calls are methods such as logger.info, whose
+        last name is kept by import resolution, or plain names such as len
+        which aren't imported, so one set lookup rules them out."""
+        if isinstance(func, ast.Attribute):
+            if func.attr not in names:
+                return None
+        elif isinstance(func, ast.Name):
+            if func.id not in names and func.id not in self.import_table.names:
+                return None
+        full_name = self.import_table.resolve(get_full_attr_name(func))
+        return full_name if full_name.rpartition('.')[2] in names else None
+
+    def check_call(self, node):
+        full_name = self.call_name(node.func, RELEVANT_CALL_NAMES)
+        if full_name is None:
+            return
+
+        name = full_name.rpartition('.')[2]
+        if name in EXPLICIT_GPU_CALL_NAMES:
+            explicit_gpu_calls, lines = explicit_gpu_calls_check(node, full_name, self.scopes)
+            self.explicit_gpu_calls.extend(explicit_gpu_calls)
+            self.lines_considered.extend(lines)
+            if is_optional_gpu_call(node, self.scopes):
+                self.optional_gpu_calls.append(full_name)
+
+        # todo maybe check if function uses a AI model
+        # Track pytorch and tensorflow function calls
+        framework = tensor_op_framework(full_name) if name in TENSOR_OP_NAMES else None
+        if framework is not None:
+            estimate = TENSOR_SIZE_ESTIMATORS[framework]
+            threshold = self.tensor_thresholds[framework]
+            element_bytes = dtype_bytes(node)
+            # literals are counted only until they pass the threshold
+            size = estimate(node, -(-threshold // element_bytes), self.scopes.evaluate_int)
+            if isinstance(size, AtLeast):
+                # only a lower bound, too rough for the memory estimate
+                self.big_calls.append((framework, full_name, f"≥{size}", node.lineno))
+                self.big_call_owners.append(self.owners[-1])
+            elif size is not None:
+                self.add_cost(size * element_bytes, 0)
+                if size * element_bytes < threshold:
+                    self.small_calls.append((framework, full_name, size, node.lineno))
+                else:
+                    self.big_calls.append((framework, full_name, size, node.lineno))
+                    self.big_call_owners.append(self.owners[-1])
+
+        if name in COST_OP_NAMES:
+            cost = estimate_op_cost(node, full_name, self.scopes.evaluate)
+            if cost is not None:
+                self.add_op_cost(full_name, cost, node.lineno)
+
+        array_op = array_library_op(full_name) if name in ARRAY_OP_NAMES else None
+        if array_op is not None:
+            value = array_value(node, *array_op, self.scopes.evaluate)
+            if value is not None:
+                self.array_calls.append((array_op[0], full_name, value.bytes, node.lineno))
+        elif name in CUML_ESTIMATORS and full_name.startswith("sklearn."):
+            self.estimator_libraries.add("sklearn")
+
+        model = find_model(node, full_name, self.scopes.evaluate) if name in MODEL_CALL_NAMES else None
+        if model is not None:
+            model_name, model_cost = model
+            # the weights are held where the model is loaded, its FLOPs are
+            # spent where it is called
+            self.add_cost(model_cost.params * weight_dtype_bytes(node), 0)
+            self.models.append((model_name, model_cost.params, int(model_cost.flops), node.lineno))
+
+        if name in INFERENCE_METHODS and self.models and isinstance(node.func, ast.Attribute):
+            self.add_inference(self.model_of(node.func.value))
+
+        # anything else init_call matches is a model found above
+        if name in INIT_CALL_NAMES or model is not None:
+            init = init_call(node, full_name, self.scopes.evaluate)
+            if init is not None:
+                self.init_calls.append((full_name, node.lineno, *init, self.owners[-1], self.loop_depth > 0))
+
+    def check_binary(self, node):
+        if isinstance(node.op, ast.MatMult):
+            cost = matmul_cost(as_tensor(self.scopes.evaluate(node.left)), as_tensor(self.scopes.evaluate(node.right)))
+            if cost is not None:
+                self.add_op_cost("@", cost, node.lineno)
+
+    def add_op_cost(self, name, cost, lineno):
+        # ops on numpy and pandas data run on the CPU whatever the device
+        library = cost.result.library if cost.result is not None else None
+        if library is not None:
+            self.array_ops.append((name, cost.flops, lineno, library))
+        else:
+            self.add_cost(cost.bytes, cost.flops)
+            self.op_costs.append((name, cost.flops, lineno))
+
+    def add_cost(self, nbytes, flops):
+        """Add to the cost of the function or module code being visited."""
+        name = ".".join(self.scope_names) or MODULE_SCOPE
+        cost = self.function_costs.get(name)
+        if cost is None:
+            cost = self.function_costs[name] = {"bytes": 0, "flops": 0}
+            self.cost_owners[name] = self.owners[-1]
+        cost["bytes"] += nbytes
+        cost["flops"] += flops
+        if self.loop_depth:
+            self.loop_flops[name] = self.loop_flops.get(name, 0) + flops
+
+    def add_call_edge(self, name, is_method):
+        self.call_graph.add_call(self.owners[-1], name, is_method, self.loop_depth > 0)
+        if self.models:
+            if is_method:
+                self.add_inference(self.model_attributes.get((self.call_graph.classes.get(self.owners[-1]), name)))
+            else:
+                self.add_inference(self.scopes.lookup(name))
+
+    def model_of(self, node):
+        """Return the LoadedModel a name or self attribute is bound to."""
+        if is_self_attribute(node):
+            return self.model_attributes.get((self.call_graph.classes.get(self.owners[-1]), node.attr))
+        return self.scopes.lookup(node.id) if isinstance(node, ast.Name) else None
+
+    def add_inference(self, model):
+        """Charge the FLOPs of an inference to the code calling the model."""
+        if isinstance(model, LoadedModel):
+            flops = int(model.cost.flops)
+            self.add_cost(0, flops)
+            self.model_inferences.append((model.name, flops, self.owners[-1], self.loop_depth > 0))
+
+    def weigh_costs(self):
+        """Weight the function costs by the scope they run in, once the whole
+        file is visited, and total them per scope."""
+        self.owner_scopes, self.request_path, self.looped = self.call_graph.classify()
+        looped = self.looped
+        for name, cost in self.function_costs.items():
+            owner = self.cost_owners[name]
+            scope = self.owner_scopes.get(owner, OTHER)
+            weight = SCOPE_WEIGHTS[scope]
+            # all of a function called in a loop runs in that loop
+            loop_flops = cost["flops"] if owner in looped else self.loop_flops.get(name, 0)
+            loop_weight = weight * LOOP_WEIGHT if scope == REQUEST else weight
+            self.weighted_flops[name] = (cost["flops"] - loop_flops) * weight + loop_flops * loop_weight
+
+            totals = self.scope_totals(scope)
+            totals["bytes"] += cost["bytes"]
+            totals["flops"] += cost["flops"]
+            totals["weighted_flops"] += self.weighted_flops[name]
+            totals["functions"].append(name)
+        for name, flops, owner, in_loop in self.model_inferences:
+            scope = self.owner_scopes.get(owner, OTHER)
+            weight = SCOPE_WEIGHTS[scope] * (LOOP_WEIGHT if scope == REQUEST and (in_loop or owner in looped) else 1)
+            self.model_flops[name] = max(self.model_flops.get(name, 0), flops * weight)
+        for name, _, flops, _ in self.models:
+            if name not in self.model_flops:
+                # a model the file never calls is run by whoever handles requests
+                self.model_flops[name] = flops
+                totals = self.scope_totals(REQUEST)
+                totals["flops"] += flops
+                totals["weighted_flops"] += flops * SCOPE_WEIGHTS[REQUEST]
+        for totals in self.scope_costs.values():
+            totals["functions"].sort()
+
+    def scope_totals(self, scope):
+        totals = self.scope_costs.get(scope)
+        if totals is None:
+            totals = self.scope_costs[scope] = {"bytes": 0, "flops": 0, "weighted_flops": 0, "functions": []}
+        return totals
+
+    def request_init_calls(self):
+        """Return [call, line, kind, function, where to move it, latency ms]
+        of the initialization calls on the request path, once the costs are
+        weighed.  Calls in loops are paid LOOP_WEIGHT times per request."""
+        findings = []
+        for full_name, lineno, kind, latency, owner, in_loop in self.init_calls:
+            if self.owner_scopes.get(owner) != REQUEST:
+                continue
+            if in_loop or owner in self.looped:
+                latency *= LOOP_WEIGHT
+            target = move_target(owner, kind, self.call_graph.classes)
+            findings.append((full_name, lineno, kind, owner, target, round(latency, 3)))
+        return sorted(findings, key=lambda finding: (finding[1], finding[0]))
+
+    def evaluate_tensor(self, node):
+        """Evaluate tensor constructors, ops and same shape methods such as
+        .to(device) to a TensorValue, for the cost of ops on their result."""
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.MatMult):
+                cost = matmul_cost(as_tensor(self.scopes.evaluate(node.left)),
+                                   as_tensor(self.scopes.evaluate(node.right)))
+                return cost.result if cost is not None else None
+            return None
+
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in SAME_SHAPE_METHODS:
+            value = self.scopes.evaluate(func.value)
+            if isinstance(value, (TensorValue, LoadedModel)):
+                return value
+        full_name = self.call_name(func, TENSOR_VALUE_NAMES)
+        if full_name is None:
+            return None
+        name = full_name.rpartition('.')[2]
+        model = find_model(node, full_name, self.scopes.evaluate) if name in MODEL_CALL_NAMES else None
+        if model is not None:
+            return LoadedModel(*model)
+        array_op = array_library_op(full_name) if name in ARRAY_OP_NAMES else None
+        if array_op is not None:
+            return array_value(node, *array_op, self.scopes.evaluate)
+        if name in TENSOR_OP_NAMES and tensor_op_framework(full_name) is not None:
+            shape = tensor_shape(node, self.scopes.evaluate_int)
+            return TensorValue(shape, dtype_bytes(node)) if shape is not None else None
+        if name not in COST_OP_NAMES:
+            return None
+        cost = estimate_op_cost(node, full_name, self.scopes.evaluate)
+        return cost.result if cost is not None else None
 
     # Track tensorflow with blocks
     # I am not sure if this is necessary because we scan for tensors anyway and tensorflow opts always for cpu if no gpu is available
@@ -130,15 +719,41 @@ class GPUCodeAnalyzer(ast.NodeVisitor):
     #     self.generic_visit(node)
 
 
+def tensor_op_framework(full_name):
+    """Return "pytorch" or "tensorflow" if full_name is one of their tensor
+    constructors, e.g. torch.zeros or tf.random.uniform, otherwise None."""
+    parts = full_name.split('.')
+    for n in range(1, min(MAX_TENSOR_OP_PARTS, len(parts) - 1) + 1):
+        framework = TENSOR_OP_LOOKUP.get((parts[0], '.'.join(parts[-n:])))
+        if framework is not None:
+            return framework
+    return None
+
+
+def array_library_op(full_name):
+    """Return ("numpy" | "pandas", op) if full_name creates a numpy array or
+    a pandas frame whose size can be estimated, e.g. np.random.rand."""
+    root, _, op = full_name.partition('.')
+    library = ARRAY_LIBRARIES.get(root)
+    if library is None or op not in ARRAY_OPS[library]:
+        return None
+    return library, op
+
+
 def is_pytorch_tensor_op(full_name):
-    return full_name.startswith("torch.") and any(full_name.endswith(f".{op}") for op in PYTORCH_TENSOR_OPS)
+    return tensor_op_framework(full_name) == "pytorch"
 
 
 def is_tensorflow_tensor_op(full_name):
-    return full_name.startswith("tf.") and any(full_name.endswith(f".{op}") for op in TENSORFLOW_TENSOR_OPS)
+    return tensor_op_framework(full_name) == "tensorflow"
+
 
+def explicit_gpu_calls_check(node, full_name=None, scopes=None):
+    if full_name is None:
+        full_name = get_full_attr_name(node.func)
+    if scopes is None:
+        scopes = ConstantScopes()
 
-def explicit_gpu_calls_check(node):
     explicit_gpu_calls = []
     explicit_gpu_calls_lines = []
     if (isinstance(node.func, ast.Attribute) and node.func.attr == 'device') or \
@@ -147,10 +762,10 @@ def explicit_gpu_calls_check(node):
         if node.args:
             first_arg = node.args[0]
 
-            # Case 1: The arg is a constant string "cuda" => GPU only
-            if isinstance(first_arg, ast.Constant) and first_arg.value == "cuda":
+            # Case 1: The arg is "cuda", or a name bound to it => GPU only
+            if scopes.device_of(first_arg) == CUDA:
                 explicit_gpu_calls_lines.append(node.lineno)
-                explicit_gpu_calls.append(get_full_attr_name(node.func))
+                explicit_gpu_calls.append(full_name)
 
             # # Case 2: Check for something like: torch.device("cuda" if torch.cuda.is_available() else "cpu")
             # elif isinstance(first_arg, ast.IfExp):
@@ -172,19 +787,27 @@ def explicit_gpu_calls_check(node):
     elif is_attr_call(node.func, 'to'):
         if node.args:
             first_arg = node.args[0]
-            if isinstance(first_arg, ast.Constant) and first_arg.value == "cuda":
+            if scopes.device_of(first_arg) == CUDA:
                 explicit_gpu_calls_lines.append(node.lineno)
-                explicit_gpu_calls.append(get_full_attr_name(node.func))
+                explicit_gpu_calls.append(full_name)
 
     # Detect model.cuda()
     elif is_attr_call(node.func, 'cuda'):
         # cuda() typically has no args, but if it has args you can extend this logic
         explicit_gpu_calls_lines.append(node.lineno)
-        explicit_gpu_calls.append(get_full_attr_name(node.func))
+        explicit_gpu_calls.append(full_name)
 
     return explicit_gpu_calls, explicit_gpu_calls_lines
 
 
+def is_optional_gpu_call(node, scopes):
+    """Detect torch.device(...) and model.to(...) with a device which is cuda
+    only when available, e.g. device = "cuda" if torch.cuda.is_available() else "cpu"."""
+    if not node.args or not (is_device_func(node.func) or is_attr_call(node.func, 'to')):
+        return False
+    return scopes.device_of(node.args[0]) is OPTIONAL_CUDA
+
+
 # A helper function to check if this is a call to torch.cuda.is_available()
 def is_cuda_is_available(call_node):
     # call_node should be an ast.Call with func torch.cuda.is_available
@@ -0,0 +1,196 @@
+"""
+Benchmark suite for the static analyzer.
+
+    python benchmarks/bench.py [--only NAME ...] [--update-baselines] [--check]
+
+A synthetic function project is generated with benchmarks/corpus.py and
+every benchmark runs in its own process, so its peak RSS can be measured.
+Wall time, files (or calls) per second and peak RSS are compared with
+benchmarks/baselines.json; --check exits non-zero if any benchmark is more
+than --tolerance times slower or larger than its baseline.  Baselines are
+machine dependent, refresh them with --update-baselines when comparing on
+a different machine.
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from corpus import generate_project  # noqa: E402
+
+BASELINES_FILE = os.path.join(BENCHMARKS_DIR, "baselines.json")
+
+
+def bench_analyze_small(corpus):
+    from analyze_file import analyze_file
+    files = glob.glob(os.path.join(corpus, "function", "pkg*", "*", "*.py"))
+    for filepath in files:
+        analyze_file(filepath)
+    return len(files)
+
+
+def bench_analyze_giant(corpus):
+    from analyze_file import analyze_file
+    files = glob.glob(os.path.join(corpus, "function", "generated", "*.py"))
+    for filepath in files:
+        analyze_file(filepath)
+    return len(files)
+
+
+def bench_analyze_deep_chains(corpus):
+    from analyze_file import analyze_file
+    files = glob.glob(os.path.join(corpus, "function", "chains", "*.py"))
+    for filepath in files:
+        analyze_file(filepath)
+    return len(files)
+
+
+def bench_tensor_estimators(corpus):
+    from constants import TENSOR_SIZE_THRESHOLD_PYTORCH, TENSOR_SIZE_THRESHOLD_TENSORFLOW
+    from tensor_estimation import estimate_pytorch_tensor_size, estimate_tensorflow_tensor_size
+    calls = []
+    for filepath in glob.glob(os.path.join(corpus, "function", "tables", "*.py")):
+        with open(filepath, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        calls.extend(node for node in ast.walk(tree) if isinstance(node, ast.Call))
+
+    start = time.perf_counter()
+    for _ in range(20):
+        for node in calls:
+            estimate_pytorch_tensor_size(node, TENSOR_SIZE_THRESHOLD_PYTORCH)
+            estimate_tensorflow_tensor_size(node, TENSOR_SIZE_THRESHOLD_TENSORFLOW)
+            estimate_pytorch_tensor_size(node)
+            estimate_tensorflow_tensor_size(node)
+    return 20 * len(calls), time.perf_counter() - start
+
+
+def bench_visitor(corpus):
+    from analyze_file import GPUCodeAnalyzer
+    from visitor_benchmark import generate_source
+    tree = ast.parse(generate_source(20000))
+    calls = sum(1 for node in ast.walk(tree) if isinstance(node, ast.Call))
+
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        GPUCodeAnalyzer().visit(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return calls, best
+
+
+def bench_directory_serial(corpus):
+    from classifier import analyze_directory_for_gpu_code
+    return len(analyze_directory_for_gpu_code(corpus, workers=1))
+
+
+def bench_directory_parallel(corpus):
+    from classifier import analyze_directory_for_gpu_code
+    return len(analyze_directory_for_gpu_code(corpus, workers=0))
+
+
+BENCHMARKS = {
+    "analyze_file_small": bench_analyze_small,
+    "analyze_file_giant": bench_analyze_giant,
+    "analyze_file_deep_chains": bench_analyze_deep_chains,
+    "tensor_estimators": bench_tensor_estimators,
+    "visitor": bench_visitor,
+    "directory_serial": bench_directory_serial,
+    "directory_parallel": bench_directory_parallel,
+}
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage  # bytes on macOS, KiB elsewhere
+
+
+def run_one(name, corpus):
+    """Run a single benchmark in this process and print its measurement."""
+    start = time.perf_counter()
+    outcome = BENCHMARKS[name](corpus)
+    wall = time.perf_counter() - start
+    # benchmarks which need setup time their own measured section
+    items, wall = outcome if isinstance(outcome, tuple) else (outcome, wall)
+    print(json.dumps({"wall_s": wall, "items": items, "items_per_s": items / wall if wall else None,
+                      "peak_rss_kb": peak_rss_kb()}))
+
+
+def run_isolated(name, corpus):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-one", name, corpus],
+                            check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(name, measurement, baseline, tolerance):
+    """Return the report line and whether the measurement regressed."""
+    line = (f"{name:26} {measurement['wall_s'] * 1000:9.1f} ms {measurement['items_per_s']:12,.0f}/s "
+            f"{(measurement['peak_rss_kb'] or 0) / 1024:8.1f} MiB")
+    if not baseline:
+        return line + "   (no baseline)", False
+    regressed = False
+    ratios = []
+    for key, label in (("wall_s", "time"), ("peak_rss_kb", "rss")):
+        if measurement.get(key) and baseline.get(key):
+            ratio = measurement[key] / baseline[key]
+            ratios.append(f"{label} x{ratio:.2f}")
+            regressed = regressed or ratio > tolerance
+    return line + "   " + ", ".join(ratios) + ("   REGRESSION" if regressed else ""), regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), default=None)
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--run-one", nargs=2, metavar=("NAME", "CORPUS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(*args.run_one)
+        return
+
+    baselines = {}
+    if os.path.exists(BASELINES_FILE):
+        with open(BASELINES_FILE, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    results = {}
+    regressions = 0
+    with tempfile.TemporaryDirectory() as corpus:
+        generate_project(corpus)
+        for name in args.only or BENCHMARKS:
+            results[name] = run_isolated(name, corpus)
+            line, regressed = compare(name, results[name], baselines.get(name), args.tolerance)
+            regressions += regressed
+            print(line)
+
+    if args.update_baselines:
+        baselines.update({name: {key: round(value, 4) for key, value in result.items() if key != "items"}
+                          for name, result in results.items()})
+        with open(BASELINES_FILE, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write("\n")
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Generate synthetic function projects for benchmarking the analyzer.
+
+    python benchmarks/corpus.py OUTPUT_DIR [--small-files 400] [--giant-files 3]
+
+The project contains many small modules in a package tree, a few giant
+modules, modules with deep attribute chains and modules embedding huge
+tensor literals, all imported by the function's func.py, plus a vendored
+virtualenv which the walker must prune and stray scripts nothing imports.
+"""
+import argparse
+import os
+import random
+
+SMALL_MODULE_KINDS = ["plain", "torch", "tensorflow", "cuda"]
+
+
+def small_module(rng, index):
+    kind = SMALL_MODULE_KINDS[index % len(SMALL_MODULE_KINDS)]
+    lines = []
+    if kind == "torch":
+        lines.append("import torch")
+    elif kind == "tensorflow":
+        lines.append("import tensorflow as tf")
+    elif kind == "cuda":
+        lines.append("import torch")
+    lines.append("import logging")
+    lines.append("")
+    for f in range(rng.randint(3, 8)):
+        lines.append(f"def handler_{index}_{f}(request, items):")
+        lines.append(f"    logging.info('handling %s', request.path)")
+        lines.append(f"    total = sum(item.value for item in items if item.enabled)")
+        if kind == "torch":
+            lines.append(f"    t = torch.zeros({rng.randint(1, 64)}, {rng.randint(1, 64)})")
+        elif kind == "tensorflow":
+            lines.append(f"    t = tf.random.uniform([{rng.randint(1, 64)}, {rng.randint(1, 64)}])")
+        elif kind == "cuda" and f == 0:
+            lines.append("    model.to('cuda')")
+        lines.append(f"    return {{'total': total, 'count': len(items)}}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def giant_module(rng, functions):
+    lines = ["import torch", "import json", ""]
+    for f in range(functions):
+        lines.append(f"def step_{f}(state, batch):")
+        lines.append(f"    x = torch.randn({rng.randint(1, 32)}, {rng.randint(1, 32)})")
+        lines.append(f"    y = state.layers[{f % 10}].forward(batch.inputs, scale={f}.0)")
+        lines.append(f"    state.metrics.record('step_{f}', json.dumps({{'loss': float(y.mean())}}))")
+        lines.append(f"    return x + y")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def deep_chain_module(depth, calls):
+    chain = ".".join(f"level{i}" for i in range(depth))
+    lines = ["import torch", ""]
+    for c in range(calls):
+        lines.append(f"value_{c} = self.{chain}.compute_{c % 7}(torch.ones({c % 5 + 1}))")
+    return "\n".join(lines) + "\n"
+
+
+def tensor_literal_module(elements, nesting):
+    row = ", ".join(str(i % 97) for i in range(max(1, elements // nesting)))
+    table = "[" + ", ".join(f"[{row}]" for _ in range(nesting)) + "]"
+    return f"import torch\nimport tensorflow as tf\n\nLOOKUP = torch.tensor({table})\nTABLE = tf.constant({table})\n"
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def generate_project(root, small_files=400, giant_files=3, giant_functions=4000, deep_chain_files=4,
+                     chain_depth=40, literal_files=2, literal_elements=200000, vendored_files=200, stray_files=2,
+                     seed=0):
+    """Write a synthetic function project below root and return the number
+    of .py files the analyzer is expected to analyze."""
+    rng = random.Random(seed)
+    imports = []
+    write(os.path.join(root, "function", "__init__.py"), "from .func import new\n")
+    for i in range(small_files):
+        package = os.path.join(root, "function", f"pkg{i % 20}", f"sub{i % 3}")
+        write(os.path.join(package, f"module_{i}.py"), small_module(rng, i))
+        imports.append(f"from .pkg{i % 20}.sub{i % 3} import module_{i}")
+    for i in range(giant_files):
+        write(os.path.join(root, "function", "generated", f"giant_{i}.py"), giant_module(rng, giant_functions))
+        imports.append(f"from .generated import giant_{i}")
+    for i in range(deep_chain_files):
+        write(os.path.join(root, "function", "chains", f"chain_{i}.py"), deep_chain_module(chain_depth, 2000))
+        imports.append(f"from .chains import chain_{i}")
+    for i in range(literal_files):
+        write(os.path.join(root, "function", "tables", f"table_{i}.py"),
+              tensor_literal_module(literal_elements, 1 + i * 50))
+        imports.append(f"import function.tables.table_{i}")
+    write(os.path.join(root, "function", "func.py"), "\n".join(imports) + "\n" + small_module(rng, 0))
+    # scripts next to the function which it never imports
+    for i in range(stray_files):
+        write(os.path.join(root, "scripts", f"export_{i}.py"), small_module(rng, 1))
+    # a local virtualenv full of dependencies which should never be analyzed
+    venv = os.path.join(root, ".venv")
+    write(os.path.join(venv, "pyvenv.cfg"), "home = /usr/bin\n")
+    for i in range(vendored_files):
+        write(os.path.join(venv, "lib", "python3", "site-packages", f"dep{i % 10}", f"mod_{i}.py"),
+              small_module(rng, i))
+    return 1 + 1 + small_files + giant_files + deep_chain_files + literal_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir")
+    parser.add_argument("--small-files", type=int, default=400)
+    parser.add_argument("--giant-files", type=int, default=3)
+    parser.add_argument("--literal-elements", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    files = generate_project(args.output_dir, small_files=args.small_files, giant_files=args.giant_files,
+                             literal_elements=args.literal_elements, seed=args.seed)
+    print(f"wrote {files} analyzable files to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
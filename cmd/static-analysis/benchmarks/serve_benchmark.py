@@ -0,0 +1,84 @@
+"""
+Compare a cold classifier run per analysis with requests to a warm
+`classifier --serve` process.
+
+    python benchmarks/serve_benchmark.py [--classifier dist/classifier] [--runs 10]
+
+By default the classifier is run from source with the current interpreter;
+pass the pyinstaller executable to include its unpacking cost.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+STATIC_ANALYSIS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTDATA_DIR = os.path.join(STATIC_ANALYSIS_DIR, "tests", "testdata")
+
+
+def classifier_command(classifier):
+    if classifier:
+        return [os.path.abspath(classifier)]
+    return [sys.executable, os.path.join(STATIC_ANALYSIS_DIR, "classifier.py")]
+
+
+def bench_cold(command, directory, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command + [directory, "--no-cache"], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_warm(command, directory, runs):
+    process = subprocess.Popen(command + ["--serve", "--no-cache"], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        request = json.dumps({"directory": directory}) + "\n"
+        # the first request pays for process startup, report it separately
+        start = time.perf_counter()
+        process.stdin.write(request)
+        process.stdin.flush()
+        process.stdout.readline()
+        first = time.perf_counter() - start
+
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            process.stdin.write(request)
+            process.stdin.flush()
+            response = json.loads(process.stdout.readline())
+            timings.append(time.perf_counter() - start)
+            assert "results" in response, response
+        return first, timings
+    finally:
+        process.stdin.close()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--classifier", default=None, help="classifier executable (default: run from source)")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    command = classifier_command(args.classifier)
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copytree(TESTDATA_DIR, os.path.join(directory, "function"))
+        cold = bench_cold(command, directory, args.runs)
+        first, warm = bench_warm(command, directory, args.runs)
+
+    print(f"cold exec:        mean {sum(cold) / len(cold) * 1000:8.1f} ms  min {min(cold) * 1000:8.1f} ms")
+    print(f"warm first req:        {first * 1000:8.1f} ms")
+    print(f"warm request:     mean {sum(warm) / len(warm) * 1000:8.1f} ms  min {min(warm) * 1000:8.1f} ms")
+    print(f"speedup:          {sum(cold) / sum(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
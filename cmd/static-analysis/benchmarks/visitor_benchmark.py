@@ -0,0 +1,58 @@
+"""
+Measure how many call nodes per second GPUCodeAnalyzer processes.
+
+    python benchmarks/visitor_benchmark.py [--calls 20000] [--runs 5]
+
+The generated module mixes tensor constructors, device calls and ordinary
+method calls on deep attribute chains, as found in real function code.
+bench.py --check runs it as the "visitor" benchmark.
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_file import GPUCodeAnalyzer  # noqa: E402
+
+CALL_TEMPLATES = [
+    "x{i} = torch.zeros({i} % 7 + 1, 3)",
+    "y{i} = tf.random.uniform([{i} % 5 + 1, 8])",
+    "z{i} = self.encoder.layers.block.norm.forward(x{i})",
+    "model.to(device)",
+    "logging.info('step %d', {i})",
+    "w{i} = torch.tensor([1.0, 2.0, 3.0])",
+    "v{i} = helpers.preprocess(load(path), size=({i}, {i}))",
+]
+
+
+def generate_source(calls):
+    lines = ["import torch", "import tensorflow as tf"]
+    for i in range(calls):
+        lines.append(CALL_TEMPLATES[i % len(CALL_TEMPLATES)].format(i=i))
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    tree = ast.parse(generate_source(args.calls))
+    call_nodes = sum(1 for node in ast.walk(tree) if isinstance(node, ast.Call))
+
+    best = None
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        GPUCodeAnalyzer().visit(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"{call_nodes} calls in {best * 1000:.1f} ms: {call_nodes / best:,.0f} calls/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import ast
+
+from constants import BLOCKING_CALLS, BLOCKING_METHODS, BLOCKING_FLOPS_THRESHOLD
+from model_zoo import find_model, LoadedModel
+from tensor_estimation import as_tensor, estimate_op_cost, matmul_cost
+from util import get_full_attr_name
+
+
+class BlockingCallLinter(ast.NodeVisitor):
+    """Find calls which block the event loop in the body of an async handler.
+
+    Flagged are known blocking calls (time.sleep, requests.get, open, ...),
+    model loads, inference with a loaded model and torch/tf ops estimated
+    to need at least BLOCKING_FLOPS_THRESHOLD FLOPs.  Awaited calls and code
+    in nested functions and lambdas, such as the callable given to
+    loop.run_in_executor(), don't run on the event loop and are skipped.
+
+    Calls of self.<attribute>() are collected in self_calls, they are
+    inference if another method assigns a model to the attribute, which
+    may only be known once the whole class is analyzed.
+    """
+
+    def __init__(self, evaluate, resolve=lambda full_name: full_name):
+        # evaluate maps a name to its value, e.g. a LoadedModel, and resolve
+        # a call name to its canonical name through the module's imports
+        self.evaluate = evaluate
+        self.resolve = resolve
+        self.findings = []
+        self.self_calls = []
+
+    def lint(self, handler):
+        """Return [(call name, line, kind)] for handler."""
+        for stmt in handler.body:
+            self.visit(stmt)
+        return self.findings
+
+    def visit_FunctionDef(self, node):
+        pass
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_Lambda = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+    def visit_Await(self, node):
+        if isinstance(node.value, ast.Call):
+            # the awaited call is asynchronous, its arguments are not
+            self.generic_visit(node.value)
+        else:
+            self.generic_visit(node)
+
+    def visit_Call(self, node):
+        kind = self.blocking_kind(node)
+        if kind is not None:
+            self.findings.append((self.resolve(get_full_attr_name(node.func)) or "<call>", node.lineno, kind))
+        elif is_self_attribute(node.func):
+            self.self_calls.append((node.func.attr, node.lineno))
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, ast.MatMult):
+            cost = matmul_cost(as_tensor(self.evaluate(node.left)), as_tensor(self.evaluate(node.right)))
+            if cost is not None and cost.flops >= BLOCKING_FLOPS_THRESHOLD:
+                self.findings.append(("@", node.lineno, "compute"))
+        self.generic_visit(node)
+
+    def blocking_kind(self, node):
+        func = node.func
+        full_name = self.resolve(get_full_attr_name(func))
+        if full_name in BLOCKING_CALLS:
+            return BLOCKING_CALLS[full_name]
+        if isinstance(func, ast.Attribute) and func.attr in BLOCKING_METHODS:
+            return BLOCKING_METHODS[func.attr]
+        if not full_name:
+            return None
+        if find_model(node, full_name, self.evaluate) is not None:
+            return "model_load"
+        if isinstance(func, ast.Name) and isinstance(self.evaluate(func), LoadedModel):
+            return "inference"
+        cost = estimate_op_cost(node, full_name, self.evaluate)
+        if cost is not None and cost.flops >= BLOCKING_FLOPS_THRESHOLD:
+            return "compute"
+        return None
+
+
+def is_self_attribute(node):
+    return isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'self'
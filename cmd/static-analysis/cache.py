@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import constants
+from calibration import load_thresholds
+
+CACHE_DIR_ENV = "FUNC_ANALYSIS_CACHE_DIR"
+DEFAULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+CACHE_FILE_SUFFIX = ".json"
+
+
+def default_cache_dir():
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "func", "static-analysis")
+
+
+def analyzer_fingerprint(thresholds=None):
+    """Hash of every setting in constants.py and of the calibrated
+    thresholds, by default those currently loaded, so changing an import
+    list, op set or threshold invalidates all cached results."""
+    settings = {"thresholds": list(thresholds or load_thresholds())}
+    for name, value in sorted(vars(constants).items()):
+        if not name.isupper():
+            continue
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        settings[name] = repr(value)
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+class AnalysisCache:
+    """On-disk cache of analyze_file results keyed by file content.
+
+    Each entry is a separate file which is written atomically, so several
+    classifier processes may share a cache directory.  Entries are evicted
+    least recently used first once the directory grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.thresholds = None
+        self.fingerprint = None
+        self.refresh()
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self):
+        """Recompute the fingerprint if the thresholds profile changed since,
+        e.g. by --calibrate while a --serve process keeps this cache."""
+        thresholds = load_thresholds()
+        if thresholds != self.thresholds:
+            self.thresholds = thresholds
+            self.fingerprint = analyzer_fingerprint(thresholds)
+
+    def key_for_file(self, filepath):
+        """Return the cache key for filepath, or None if it can't be read."""
+        digest = hashlib.sha256(self.fingerprint.encode())
+        try:
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(block)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def get(self, key):
+        if key is None:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        if key is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(result, f)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass  # the cache is an optimization only
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue  # removed by a concurrent process
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from collections import namedtuple
+
+from constants import TENSOR_BYTES_THRESHOLD_PYTORCH, TENSOR_BYTES_THRESHOLD_TENSORFLOW, FUNCTION_FLOPS_THRESHOLD, \
+    GPU_LATENCY_BUDGET_SECONDS
+
+THRESHOLDS_ENV = "FUNC_ANALYSIS_THRESHOLDS"
+PROFILE_VERSION = 2
+
+# Square matrix sizes and vector lengths measured, growing until a single run
+# takes longer than MAX_RUN_SECONDS
+MATMUL_SIZES = (64, 128, 256, 512, 1024)
+ELEMENTWISE_SIZES = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+MAX_RUN_SECONDS = 0.5
+REPEATS = 5
+
+
+class Thresholds(namedtuple("Thresholds", "tensor_bytes_pytorch tensor_bytes_tensorflow function_flops")):
+    """Sizes from which work is worth a GPU: bytes of a pytorch or tensorflow
+    tensor and estimated FLOPs of a function."""
+
+
+DEFAULT_THRESHOLDS = Thresholds(TENSOR_BYTES_THRESHOLD_PYTORCH, TENSOR_BYTES_THRESHOLD_TENSORFLOW,
+                                FUNCTION_FLOPS_THRESHOLD)
+
+_loaded = {}
+
+
+def default_profile_path():
+    if os.environ.get(THRESHOLDS_ENV):
+        return os.environ[THRESHOLDS_ENV]
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "func", "static-analysis", "thresholds.json")
+
+
+def load_thresholds(path=None):
+    """Return the Thresholds of the profile at path, or of the default
+    profile, falling back to the constants if there is none or it is
+    invalid.  A profile is read again only once it changes."""
+    path = path or default_profile_path()
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return DEFAULT_THRESHOLDS
+    if key not in _loaded:
+        _loaded[key] = read_profile(path) or DEFAULT_THRESHOLDS
+    return _loaded[key]
+
+
+def read_profile(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        if profile.get("version") != PROFILE_VERSION:
+            return None
+        thresholds = Thresholds(*(int(profile[field]) for field in Thresholds._fields))
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+    return thresholds if all(value > 0 for value in thresholds) else None
+
+
+def derive_thresholds(flops_per_second, bytes_per_second, budget=GPU_LATENCY_BUDGET_SECONDS):
+    """Thresholds for a CPU with the given matmul and elementwise throughput:
+    the tensor bytes it streams and the FLOPs it computes in budget seconds,
+    the least CPU time a GPU can save."""
+    tensor_bytes = max(1, round(bytes_per_second * budget))
+    return Thresholds(tensor_bytes, tensor_bytes, max(1, round(flops_per_second * budget)))
+
+
+def calibrate(path=None):
+    """Measure this CPU with NumPy micro-benchmarks, write the thresholds
+    profile to path (default: default_profile_path()) and return it."""
+    flops_per_second = measure_matmul()
+    bytes_per_second = measure_elementwise()
+    thresholds = derive_thresholds(flops_per_second, bytes_per_second)
+    profile = {
+        "version": PROFILE_VERSION,
+        "matmul_flops_per_second": flops_per_second,
+        "elementwise_bytes_per_second": bytes_per_second,
+        "latency_budget_seconds": GPU_LATENCY_BUDGET_SECONDS,
+        **thresholds._asdict(),
+    }
+    write_profile(path or default_profile_path(), profile)
+    return profile
+
+
+def measure_matmul():
+    """Peak float32 matmul FLOPs per second over growing matrix sizes."""
+    import numpy as np
+
+    best = 0.0
+    for n in MATMUL_SIZES:
+        a = np.random.rand(n, n).astype(np.float32)
+        b = np.random.rand(n, n).astype(np.float32)
+        seconds = best_time(lambda: a @ b)
+        best = max(best, 2 * n ** 3 / seconds)
+        if seconds > MAX_RUN_SECONDS:
+            break
+    return best
+
+
+def measure_elementwise():
+    """Tensor bytes per second a float32 addition gets through on the largest
+    vectors measured, where memory bandwidth rather than call overhead limits
+    it.  Bytes are counted per result element, as the tensor thresholds
+    compare with the size of one tensor, not with the traffic of its op."""
+    import numpy as np
+
+    # smaller sizes are views of the largest arrays, allocated once
+    size = ELEMENTWISE_SIZES[-1]
+    a, b, out = (np.ones(size, dtype=np.float32) for _ in range(3))
+    rate = 0.0
+    for n in ELEMENTWISE_SIZES:
+        seconds = best_time(lambda: np.add(a[:n], b[:n], out=out[:n]))
+        rate = n * a.itemsize / seconds
+        if seconds > MAX_RUN_SECONDS:
+            break
+    return rate
+
+
+def best_time(run):
+    """Shortest of REPEATS timed runs after an untimed one, which pays for
+    first touching the memory of the operands."""
+    run()
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+        if best > MAX_RUN_SECONDS:
+            break
+    return max(best, 1e-9)
+
+
+def write_profile(path, profile):
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=4)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -1,27 +1,287 @@
+import argparse
 import json
+import multiprocessing
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 from analyze_file import analyze_file
+from cache import AnalysisCache, DEFAULT_CACHE_MAX_BYTES
+from calibration import THRESHOLDS_ENV, calibrate
+from constants import ExecutionModes, LARGE_FILE_SIZE
+from import_graph import reachable_files
+from prefilter import PREFILTER_REASON
+from server import DEFAULT_IDLE_TIMEOUT, serve_stdio, serve_unix_socket
+from walker import walk_python_files
+
+DEFAULT_CHUNKSIZE = 8
+
+
+def analyze_files(filepaths, workers=1, chunksize=DEFAULT_CHUNKSIZE, large_file_size=LARGE_FILE_SIZE):
+    """Yield the analyze_file result of every path in input order.
+
+    With more than one worker the files are handed out to a process pool in
+    chunks of `chunksize`; `workers=0` uses one worker per CPU.  Results are
+    yielded as soon as they are available, and closing the generator early
+    cancels the work not yet started.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(filepaths))
+
+    analyze = partial(analyze_file, large_file_size=large_file_size)
+    if workers <= 1:
+        for filepath in filepaths:
+            yield analyze(filepath)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield from executor.map(analyze, filepaths, chunksize=max(1, chunksize))
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def iter_analysis(filepaths, workers=1, chunksize=DEFAULT_CHUNKSIZE, cache=None, stats=None,
+                  large_file_size=LARGE_FILE_SIZE):
+    """Yield (filepath, result) for every path in order.
+
+    Results for files whose content is found in `cache` are reused instead of
+    parsing the file again.  If a `stats` dict is passed it is filled with
+    counters describing the run once the generator is exhausted.
+    """
+    cached = [None] * len(filepaths)
+    keys = [None] * len(filepaths)
+    pending = []
+    if cache is not None:
+        cache.refresh()
+        # the cache may outlive this run, e.g. across --serve requests
+        hits, misses = cache.hits, cache.misses
 
-def analyze_directory_for_gpu_code():
-    """Analyze all non-test .py files in the directory."""
-    current_dir = os.getcwd()
+    for i, filepath in enumerate(filepaths):
+        if cache is not None:
+            keys[i] = cache.key_for_file(filepath)
+            cached[i] = cache.get(keys[i])
+        if cached[i] is None:
+            pending.append(filepath)
+
+    prefiltered = 0
+    blocking_calls = 0
+    request_init_calls = 0
+    analyzed = analyze_files(pending, workers, chunksize, large_file_size)
+    try:
+        for i, filepath in enumerate(filepaths):
+            result = cached[i]
+            if result is None:
+                result = next(analyzed)
+                if result["reason"] == PREFILTER_REASON:
+                    prefiltered += 1
+                if cache is not None and not result["reason"].startswith("Failed to analyze"):
+                    cache.put(keys[i], result)
+            blocking_calls += len(result["details"].get("blocking_calls", ()))
+            request_init_calls += len(result["details"].get("request_init_calls", ()))
+            yield filepath, result
+    finally:
+        analyzed.close()
+
+    if cache is not None:
+        cache.evict()
+
+    if stats is not None:
+        stats["files"] = len(filepaths)
+        stats["prefiltered"] = prefiltered
+        stats["blocking_calls"] = blocking_calls
+        stats["request_init_calls"] = request_init_calls
+        if cache is not None:
+            stats["cache_hits"] = cache.hits - hits
+            stats["cache_misses"] = cache.misses - misses
+
+
+def iter_directory_analysis(current_dir=None, workers=1, chunksize=DEFAULT_CHUNKSIZE, cache=None, stats=None,
+                            max_file_size=None, large_file_size=LARGE_FILE_SIZE, all_files=False):
+    """Yield (filepath, result) for all non-test .py files in the directory.
+
+    Unless all_files is set, only the files the function's entry point
+    reaches through imports are analyzed, the skipped ones are listed in
+    stats["unreachable"] relative to the directory.
+    """
+    current_dir = current_dir or os.getcwd()
+    filepaths = walk_python_files(current_dir, max_file_size, stats)
+    unreachable = []
+    if not all_files:
+        filepaths, unreachable = reachable_files(current_dir, filepaths)
+    if stats is not None:
+        stats["unreachable_files"] = len(unreachable)
+        stats["unreachable"] = [os.path.relpath(path, current_dir) for path in unreachable]
+    yield from iter_analysis(filepaths, workers, chunksize, cache, stats, large_file_size)
+
+
+def analyze_directory_for_gpu_code(current_dir=None, workers=1, chunksize=DEFAULT_CHUNKSIZE, cache=None, stats=None,
+                                   max_file_size=None, large_file_size=LARGE_FILE_SIZE, all_files=False):
+    """Analyze the non-test .py files in the directory reachable from the
+    function's entry point, or all of them with all_files.  Results are
+    keyed by the path of the file relative to the directory."""
+    current_dir = current_dir or os.getcwd()
     analysis_results = {}
 
-    for root, _, files in os.walk(current_dir):
-        for filename in files:
-            if (
-                    filename.endswith('.py')
-                    and 'test' not in filename.lower()
-                    and 'classifier' not in filename.lower() # not needed when executing executable
-                    and 'analyze_file' not in filename.lower() # not needed when executing executable
-                    and 'venv' not in root # not needed when executing executable
-            ):
-                filepath = os.path.join(root, filename)
-                # print(f"Analyzing {filepath}...")  # only for testing
-                analysis_results[filename] = analyze_file(filepath)
-
-    print(json.dumps(analysis_results, indent=4))
+    for filepath, result in iter_directory_analysis(current_dir, workers, chunksize, cache, stats,
+                                                    max_file_size, large_file_size, all_files):
+        # print(f"Analyzing {filepath}...")  # only for testing
+        analysis_results[os.path.relpath(filepath, current_dir)] = result
+
+    return analysis_results
 
-if __name__ == "__main__":
-    analyze_directory_for_gpu_code()
 
+def aggregate_execution_mode(modes):
+    """Combine per-file execution modes the same way deploy.go does."""
+    final = None
+    for mode in modes:
+        if mode == ExecutionModes.GPU:
+            return ExecutionModes.GPU
+        if mode == ExecutionModes.GPU_PREFERRED:
+            final = ExecutionModes.GPU_PREFERRED
+        elif mode == ExecutionModes.CPU_PREFERRED and final != ExecutionModes.GPU_PREFERRED:
+            final = ExecutionModes.CPU_PREFERRED
+        elif mode == ExecutionModes.CPU and final is None:
+            final = ExecutionModes.CPU
+    return final or ExecutionModes.CPU_PREFERRED
+
+
+def stream_directory_analysis(out, current_dir=None, workers=1, chunksize=DEFAULT_CHUNKSIZE, cache=None, stats=None,
+                              max_file_size=None, large_file_size=LARGE_FILE_SIZE, all_files=False):
+    """Write one compact JSON record per file as soon as it is analyzed,
+    followed by a summary record.
+
+    File records look like {"file": ..., "path": ..., "result": {...}}, with
+    file relative to the directory, the last record is {"summary":
+    {"execution_mode": ..., <stats>}}.  Readers may stop as soon as a file
+    result has execution_mode "gpu".
+    """
+    current_dir = current_dir or os.getcwd()
+    stats = {} if stats is None else stats
+    modes = []
+
+    for filepath, result in iter_directory_analysis(current_dir, workers, chunksize, cache, stats,
+                                                    max_file_size, large_file_size, all_files):
+        record = {"file": os.path.relpath(filepath, current_dir), "path": filepath, "result": result}
+        out.write(json.dumps(record, separators=(",", ":")) + "\n")
+        out.flush()
+        modes.append(result["execution_mode"])
+
+    summary = {"execution_mode": aggregate_execution_mode(modes)}
+    summary.update(stats)
+    out.write(json.dumps({"summary": summary}, separators=(",", ":")) + "\n")
+    out.flush()
+
+
+def handle_request(request, workers=1, chunksize=DEFAULT_CHUNKSIZE, cache=None, max_file_size=None,
+                   large_file_size=LARGE_FILE_SIZE, all_files=False):
+    """Answer one --serve request.
+
+    A request names either a "directory" to analyze like a normal run, or a
+    list of "files" whose results are keyed by the given path.  A directory
+    request may set "all_files" to analyze unreachable files too.
+    """
+    stats = {}
+    if "files" in request:
+        results = {filepath: result for filepath, result
+                   in iter_analysis(list(request["files"]), workers, chunksize, cache, stats, large_file_size)}
+    elif "directory" in request:
+        results = analyze_directory_for_gpu_code(request["directory"], workers, chunksize, cache, stats,
+                                                 max_file_size, large_file_size,
+                                                 request.get("all_files", all_files))
+    else:
+        raise ValueError("request needs a 'directory' or 'files' entry")
+    return {"results": results, "stats": stats}
+
+
+def print_stats(stats):
+    """Print run counters to stderr, keeping stdout parseable as JSON."""
+    summary = ", ".join(f"{name}={value}" for name, value in stats.items() if not isinstance(value, list))
+    print(f"classifier: {summary}", file=sys.stderr)
+    if stats.get("unreachable"):
+        print(f"classifier: skipped unreachable files: {', '.join(stats['unreachable'])}", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a function as cpu or gpu workload.")
+    parser.add_argument("directory", nargs="?", default=None,
+                        help="directory to analyze (default: current working directory)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="number of analyzer processes, 0 for one per CPU (default: 1)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"files handed to a worker at a time (default: {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't read or write the per-file result cache")
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache location (default: $FUNC_ANALYSIS_CACHE_DIR or ~/.cache/func/static-analysis)")
+    parser.add_argument("--cache-max-bytes", type=int, default=DEFAULT_CACHE_MAX_BYTES,
+                        help=f"evict cache entries beyond this size (default: {DEFAULT_CACHE_MAX_BYTES})")
+    parser.add_argument("--max-file-size", type=int, default=None,
+                        help="skip .py files larger than this many bytes")
+    parser.add_argument("--large-file-size", type=int, default=LARGE_FILE_SIZE,
+                        help=f"scan files larger than this many bytes token by token to bound memory "
+                             f"(default: {LARGE_FILE_SIZE})")
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json",
+                        help="json prints one object when done, ndjson streams a record per file (default: json)")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep running and answer JSON requests, one per line, on stdin or --socket")
+    parser.add_argument("--socket", default=None,
+                        help="with --serve, listen on this unix socket instead of stdin/stdout")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help=f"with --serve, exit after this many idle seconds (default: {DEFAULT_IDLE_TIMEOUT})")
+    parser.add_argument("--all-files", action="store_true",
+                        help="analyze every .py file, not only those the function's entry point imports")
+    parser.add_argument("--fail-on-blocking", action="store_true",
+                        help="exit with status 1 if an async handler blocks the event loop")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="benchmark this CPU with NumPy and write the size thresholds profile the analysis uses")
+    parser.add_argument("--thresholds", default=None,
+                        help="thresholds profile to write or use (default: $FUNC_ANALYSIS_THRESHOLDS or "
+                             "~/.config/func/static-analysis/thresholds.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.thresholds:
+        # through the environment, so pool workers load the same profile
+        os.environ[THRESHOLDS_ENV] = args.thresholds
+    if args.calibrate:
+        print(json.dumps(calibrate(), indent=4))
+        return 0
+    cache = None if args.no_cache else AnalysisCache(args.cache_dir, args.cache_max_bytes)
+    if args.serve:
+        def handler(request):
+            return handle_request(request, args.workers, args.chunksize, cache, args.max_file_size,
+                                  args.large_file_size, args.all_files)
+
+        if args.socket:
+            serve_unix_socket(args.socket, handler, args.idle_timeout)
+        else:
+            serve_stdio(handler, args.idle_timeout)
+        return 0
+
+    stats = {}
+    if args.format == "ndjson":
+        try:
+            stream_directory_analysis(sys.stdout, args.directory, args.workers, args.chunksize, cache, stats,
+                                      args.max_file_size, args.large_file_size, args.all_files)
+        except BrokenPipeError:
+            # the reader stopped early, e.g. after a gpu verdict
+            sys.stdout = None
+            return 0
+    else:
+        analysis_results = analyze_directory_for_gpu_code(args.directory, args.workers, args.chunksize, cache, stats,
+                                                          args.max_file_size, args.large_file_size, args.all_files)
+        print(json.dumps(analysis_results, indent=4))
+    print_stats(stats)
+    if args.fail_on_blocking and stats.get("blocking_calls"):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support() # required for process pools in the pyinstaller executable
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import ast
+import operator
+from collections import Counter
+
+CUDA = "cuda"
+
+
+class OptionalCuda:
+    """Value of a device which is cuda only when available, e.g.
+    torch.device("cuda" if torch.cuda.is_available() else "cpu")."""
+
+    def __repr__(self):
+        return "OPTIONAL_CUDA"
+
+
+OPTIONAL_CUDA = OptionalCuda()
+# Marks a name which is bound to something we can't evaluate, so lookups
+# don't fall through to an outer scope.
+UNKNOWN = object()
+
+
+class Deferred:
+    """A module constant bound ahead of its assignment, evaluated in the
+    module scope once a name is looked up before its assignment is visited."""
+
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+# Results beyond this are certainly not tensor dimensions
+MAX_INT_VALUE = 10 ** 15
+MAX_EXPONENT = 64
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class ConstantScopes:
+    """Values of names bound to integer constants, simple arithmetic on them
+    or device strings, tracked per module, class and function scope.
+
+    Bindings are recorded in the order the analyzer visits them, names bound
+    to anything else shadow outer scopes as unknown.
+    """
+
+    def __init__(self, evaluate_other=None):
+        self.scopes = [("module", {})]
+        # Values of the names looked up and the arithmetic evaluated since the
+        # scopes last changed, a call's arguments are evaluated again when
+        # the call is assigned
+        self.resolved = {}
+        self.arithmetic = {}
+        # Evaluates the calls and operators not known here, e.g. to tensor shapes
+        self.evaluate_other = evaluate_other
+
+    def push(self, kind):
+        self.scopes.append((kind, {}))
+        self.changed()
+
+    def pop(self):
+        self.scopes.pop()
+        self.changed()
+
+    def changed(self):
+        self.resolved.clear()
+        self.arithmetic.clear()
+
+    def bind(self, name, value_node):
+        value = self.evaluate(value_node) if value_node is not None else None
+        self.scopes[-1][1][name] = UNKNOWN if value is None else value
+        self.resolved.pop(name, None)
+        if self.arithmetic:
+            self.arithmetic.clear()
+
+    def bind_target(self, target, value_node=None):
+        """Bind an assignment target, unpacking tuples where possible."""
+        if isinstance(target, ast.Name):
+            self.bind(target.id, value_node)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            values = value_node.elts if isinstance(value_node, (ast.Tuple, ast.List)) else []
+            if len(values) != len(target.elts):
+                values = [None] * len(target.elts)
+            for element, value in zip(target.elts, values):
+                self.bind_target(element, value)
+        elif isinstance(target, ast.Starred):
+            self.bind_target(target.value)
+
+    def bind_module_constants(self, module):
+        """Bind module level names assigned exactly once before visiting the
+        module, so functions defined above the assignment can use them.
+
+        Their values are only evaluated if they are looked up before the
+        assignment rebinds them, most never are.
+        """
+        assigns = [stmt for stmt in module.body if isinstance(stmt, ast.Assign)
+                   and all(isinstance(target, ast.Name) for target in stmt.targets)]
+        if not assigns:
+            return
+        counts = Counter(name for stmt in module_statements(module.body) for name in bound_names(stmt))
+        names = self.scopes[0][1]
+        for stmt in assigns:
+            if all(counts[target.id] == 1 for target in stmt.targets):
+                for target in stmt.targets:
+                    names[target.id] = Deferred(stmt.value)
+
+    def lookup(self, name):
+        if name in self.resolved:
+            return self.resolved[name]
+        value = None
+        innermost = len(self.scopes) - 1
+        for i in range(innermost, -1, -1):
+            kind, names = self.scopes[i]
+            # class bodies are not visible from the methods defined in them
+            if kind == "class" and i != innermost:
+                continue
+            if name in names:
+                value = names[name]
+                if value.__class__ is Deferred:
+                    value = self.evaluate_deferred(names, name, value.node)
+                value = None if value is UNKNOWN else value
+                break
+        self.resolved[name] = value
+        return value
+
+    def evaluate_deferred(self, names, name, value_node):
+        # a constant defined in terms of itself is unknown
+        names[name] = UNKNOWN
+        scopes, resolved, arithmetic = self.scopes, self.resolved, self.arithmetic
+        self.scopes, self.resolved, self.arithmetic = scopes[:1], {}, {}
+        try:
+            value = self.evaluate(value_node)
+        except RecursionError:  # a very long chain of constants defined below their use
+            value = None
+        finally:
+            self.scopes, self.resolved, self.arithmetic = scopes, resolved, arithmetic
+        names[name] = UNKNOWN if value is None else value
+        return names[name]
+
+    def evaluate(self, node):
+        """Return the int, str or OPTIONAL_CUDA value of node, whatever
+        evaluate_other returns for it, or None."""
+        cls = node.__class__
+        if cls is ast.Constant:
+            value = node.value
+            return value if value.__class__ is int or value.__class__ is str else None
+        if cls is ast.Name:
+            return self.lookup(node.id)
+        if cls is ast.BinOp:
+            return self.evaluate_binary(node)
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            value = self.evaluate(node.operand)
+            return UNARY_OPERATORS[type(node.op)](value) if is_int(value) else None
+        if isinstance(node, ast.IfExp):
+            body, orelse = self.evaluate(node.body), self.evaluate(node.orelse)
+            if body == orelse:
+                return body
+            if is_cuda(body) or is_cuda(orelse) or OPTIONAL_CUDA in (body, orelse):
+                return OPTIONAL_CUDA
+            return None
+        if isinstance(node, ast.Call):
+            if node.args and is_device_func(node.func):
+                # torch.device(...) and tf.device(...) carry the device string along
+                return self.evaluate(node.args[0])
+            return self.evaluate_other(node) if self.evaluate_other is not None else None
+        return None
+
+    def evaluate_binary(self, node):
+        op = BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            return self.evaluate_other(node) if self.evaluate_other is not None else None
+        if node in self.arithmetic:
+            return self.arithmetic[node]
+        value = self.arithmetic[node] = self.evaluate_arithmetic(op, node)
+        return value
+
+    def evaluate_arithmetic(self, op, node):
+        left, right = self.evaluate(node.left), self.evaluate(node.right)
+        if not is_int(left) or not is_int(right):
+            return None
+        if op in (operator.pow, operator.lshift) and not 0 <= right <= MAX_EXPONENT:
+            return None
+        try:
+            value = op(left, right)
+        except ZeroDivisionError:
+            return None
+        return value if abs(value) <= MAX_INT_VALUE else None
+
+    def evaluate_int(self, node):
+        value = self.evaluate(node)
+        return value if is_int(value) else None
+
+    def device_of(self, node):
+        """Return CUDA, OPTIONAL_CUDA or None for a device argument."""
+        value = self.evaluate(node)
+        if value is OPTIONAL_CUDA:
+            return OPTIONAL_CUDA
+        return CUDA if is_cuda(value) else None
+
+
+def is_device_func(func):
+    return (isinstance(func, ast.Attribute) and func.attr == 'device') or \
+        (isinstance(func, ast.Name) and func.id == 'device')
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_cuda(value):
+    return isinstance(value, str) and (value == CUDA or value.startswith(CUDA + ":"))
+
+
+def module_statements(body):
+    """Yield the statements executed at module level, without descending
+    into function and class bodies."""
+    for stmt in body:
+        yield stmt
+        # simple statements, most of a module, have no body to descend into
+        if hasattr(stmt, 'body') and not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                yield from module_statements(getattr(stmt, field, []))
+
+
+def bound_names(stmt):
+    if isinstance(stmt, ast.Assign):
+        targets = stmt.targets
+    elif isinstance(stmt, (ast.AugAssign, ast.AnnAssign, ast.For, ast.AsyncFor)):
+        targets = [stmt.target]
+    elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+        targets = [item.optional_vars for item in stmt.items if item.optional_vars is not None]
+    elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [stmt.name]
+    elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        return [alias.asname or alias.name.split('.')[0] for alias in stmt.names]
+    else:
+        return []
+    return [name for target in targets for name in target_names(target)]
+
+
+def target_names(target):
+    if isinstance(target, ast.Name):
+        return (target.id,)
+    return [node.id for node in ast.walk(target) if isinstance(node, ast.Name)]
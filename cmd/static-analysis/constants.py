@@ -5,9 +5,121 @@ class ExecutionModes:
     CPU_PREFERRED = 'cpu_preferred'
 
 
-GPU_IMPORTS = {'torch', 'tensorflow', "transformers", "json"} # TODO remove json
+GPU_IMPORTS = {'torch', 'torchvision', 'torchaudio', 'tensorflow', 'keras', "transformers", "json"} # TODO remove json
 PYTORCH_TENSOR_OPS = {'tensor', 'randn', 'zeros', 'ones', 'empty'}
 TENSORFLOW_TENSOR_OPS = {'constant', 'zeros', 'ones', 'fill', 'random.uniform', 'random.normal'}
+# Libraries which only run on a CUDA device
+GPU_LIBRARY_IMPORTS = {'cupy', 'cupyx', 'cudf', 'cuml', 'cugraph'}
+
+# CPU array libraries whose large workloads have a GPU equivalent, with the
+# ops whose size is estimated, by their name after np. or pd.
+ARRAY_LIBRARIES = {'np': 'numpy', 'pd': 'pandas'}
+NUMPY_ARRAY_OPS = {'array', 'zeros', 'ones', 'empty', 'full', 'arange', 'random.rand', 'random.randn',
+                   'random.random', 'random.normal', 'random.uniform', 'random.randint'}
+PANDAS_FRAME_OPS = {'DataFrame', 'read_csv'}
+# scikit-learn estimators with a cuML implementation
+CUML_ESTIMATORS = {'KMeans', 'DBSCAN', 'PCA', 'TruncatedSVD', 'NearestNeighbors', 'KNeighborsClassifier',
+                   'KNeighborsRegressor', 'LinearRegression', 'LogisticRegression', 'Ridge', 'Lasso', 'ElasticNet',
+                   'RandomForestClassifier', 'RandomForestRegressor', 'SVC', 'SVR', 'TSNE'}
+GPU_EQUIVALENTS = {'numpy': 'CuPy', 'pandas': 'cuDF', 'sklearn': 'cuML'}
+# numpy and pandas default to float64 and int64
+ARRAY_DTYPE_BYTES = 8
+# Arrays of at least this many bytes, or array ops of at least
+# FUNCTION_FLOPS_THRESHOLD FLOPs, are worth a GPU equivalent library
+ARRAY_BYTES_THRESHOLD = 10 ** 6 * ARRAY_DTYPE_BYTES
 
 TENSOR_SIZE_THRESHOLD_TENSORFLOW = 1000
-TENSOR_SIZE_THRESHOLD_PYTORCH = 1000
\ No newline at end of file
+TENSOR_SIZE_THRESHOLD_PYTORCH = 1000
+
+# Bytes per element by dtype name, e.g. torch.float64, tf.int8 or "float16".
+# Both frameworks default to float32.
+DTYPE_BYTES = {
+    'float64': 8, 'double': 8, 'float32': 4, 'float': 4, 'float16': 2, 'half': 2, 'bfloat16': 2,
+    'int64': 8, 'long': 8, 'int32': 4, 'int': 4, 'int16': 2, 'short': 2, 'int8': 1, 'uint8': 1,
+    'bool': 1, 'complex64': 8, 'complex128': 16,
+}
+DEFAULT_DTYPE_BYTES = 4
+# A tensor is big when its memory reaches the element threshold at the default dtype
+TENSOR_BYTES_THRESHOLD_TENSORFLOW = TENSOR_SIZE_THRESHOLD_TENSORFLOW * DEFAULT_DTYPE_BYTES
+TENSOR_BYTES_THRESHOLD_PYTORCH = TENSOR_SIZE_THRESHOLD_PYTORCH * DEFAULT_DTYPE_BYTES
+
+# Ops whose FLOPs are estimated, by their last name
+MATMUL_OPS = {'matmul', 'mm', 'bmm', 'dot'}
+LINEAR_OPS = {'linear'}
+CONV_OPS = {'conv1d', 'conv2d', 'conv3d'}
+LINEAR_LAYERS = {'Linear'}
+CONV_LAYERS = {'Conv1d', 'Conv2d', 'Conv3d'}
+# A function estimated to run at least this many floating point operations
+# is worth a GPU.
+FUNCTION_FLOPS_THRESHOLD = 10 ** 8
+# A GPU only pays off for work the CPU needs longer than this for: below it
+# kernel launches and host to device copies cost more than they save.
+# `classifier --calibrate` replaces the thresholds above by the tensor bytes
+# and FLOPs the measured CPU gets through in this time.
+GPU_LATENCY_BUDGET_SECONDS = 0.001
+# Entry points of a function: handle() runs on every request, the others once
+# per instance.  Code reached from them is weighted by its scope, and code in
+# loops on the request path once more by LOOP_WEIGHT.
+REQUEST_HANDLERS = {'handle'}
+STARTUP_HANDLERS = {'start', '__init__', 'new'}
+SCOPE_WEIGHTS = {'request': 1.0, 'startup': 0.01, 'other': 1.0}
+LOOP_WEIGHT = 10
+
+# Calls which block the event loop when made directly in an async handler,
+# by full name and by method name, with the kind of work they block on
+BLOCKING_CALLS = {
+    'time.sleep': 'sleep',
+    'requests.get': 'network', 'requests.post': 'network', 'requests.put': 'network',
+    'requests.patch': 'network', 'requests.delete': 'network', 'requests.head': 'network',
+    'requests.request': 'network', 'urllib.request.urlopen': 'network', 'urlopen': 'network',
+    'socket.create_connection': 'network',
+    'subprocess.run': 'subprocess', 'subprocess.call': 'subprocess', 'subprocess.check_call': 'subprocess',
+    'subprocess.check_output': 'subprocess', 'os.system': 'subprocess',
+    'open': 'file', 'json.load': 'file', 'pickle.load': 'file', 'np.load': 'file', 'pd.read_csv': 'file',
+    'pd.read_parquet': 'file', 'torch.load': 'file', 'tf.keras.models.load_model': 'file', 'shutil.copyfile': 'file',
+}
+BLOCKING_METHODS = {
+    'read_text': 'file', 'read_bytes': 'file', 'write_text': 'file', 'write_bytes': 'file',
+    'predict': 'inference', 'generate': 'inference', 'forward': 'inference',
+}
+# torch/tf ops estimated to take at least this many FLOPs block the event loop
+BLOCKING_FLOPS_THRESHOLD = 10 ** 7
+
+# Initialization which should run once per instance, not on every request,
+# by full name and by method name, with its kind
+INIT_CALLS = {
+    'torch.load': 'model_load', 'torch.jit.load': 'model_load', 'torch.hub.load': 'model_load',
+    'tf.keras.models.load_model': 'model_load', 'keras.models.load_model': 'model_load',
+    'tf.saved_model.load': 'model_load', 'joblib.load': 'model_load', 'timm.create_model': 'model_load',
+    'pipeline': 'model_load', 'transformers.pipeline': 'model_load', 'SentenceTransformer': 'model_load',
+    'sentence_transformers.SentenceTransformer': 'model_load',
+    'onnxruntime.InferenceSession': 'model_load', 'ort.InferenceSession': 'model_load',
+    'requests.Session': 'client', 'httpx.Client': 'client', 'httpx.AsyncClient': 'client',
+    'aiohttp.ClientSession': 'client', 'boto3.client': 'client', 'boto3.resource': 'client',
+    'boto3.Session': 'client', 'redis.Redis': 'client', 'redis.StrictRedis': 'client',
+    'pymongo.MongoClient': 'client', 'MongoClient': 'client', 'openai.OpenAI': 'client', 'OpenAI': 'client',
+    'openai.AsyncOpenAI': 'client', 'AsyncOpenAI': 'client', 'grpc.insecure_channel': 'client',
+    'grpc.secure_channel': 'client', 'psycopg2.connect': 'client',
+    're.compile': 'regex',
+    'open': 'file', 'np.load': 'file', 'pd.read_csv': 'file', 'pd.read_parquet': 'file', 'pickle.load': 'file',
+    'json.load': 'file',
+}
+INIT_METHODS = {'from_pretrained': 'model_load'}
+# Estimated latency in milliseconds of one initialization of each kind.  Known
+# models take their weight bytes divided by MODEL_LOAD_BYTES_PER_SECOND instead,
+# from_pretrained of tokenizers and processors loads no weights.
+INIT_LATENCY_MS = {'model_load': 1000, 'tokenizer_load': 100, 'client': 50, 'file': 10, 'regex': 0.1}
+MODEL_LOAD_BYTES_PER_SECOND = 500 * 1024 * 1024
+
+# GPU memory estimate: tensor and weight bytes times the overhead for
+# activations and allocator caching, plus the memory of the CUDA context
+GPU_MEMORY_OVERHEAD = 1.2
+CUDA_CONTEXT_BYTES = 512 * 1024 * 1024
+
+# Bump whenever the analyzer logic changes in a way that affects results, so
+# cached results from older versions are no longer used.
+ANALYZER_VERSION = 20
+
+# Files larger than this many bytes are analyzed with the token scanner, which
+# doesn't keep the whole source and syntax tree in memory.
+LARGE_FILE_SIZE = 4 * 1024 * 1024
@@ -0,0 +1,67 @@
+from constants import REQUEST_HANDLERS, STARTUP_HANDLERS
+
+MODULE_SCOPE = "<module>"
+
+REQUEST = "request"
+STARTUP = "startup"
+OTHER = "other"
+
+
+class CallGraph:
+    """Calls between the functions and methods of one file, to find the code
+    which runs on every request.
+
+    Functions are identified by their qualified name ("new", "Function.handle").
+    Only plain calls of module functions, f(), and of methods of the same
+    class, self.f(), are followed; code nested in a function belongs to it.
+    """
+
+    def __init__(self):
+        self.classes = {}  # qualified function name -> qualified class name or None
+        self.calls = {}  # qualified function name -> {(is_method, name, in_loop)}
+        self.add_function(MODULE_SCOPE)
+
+    def add_function(self, qualified_name, class_name=None):
+        self.classes[qualified_name] = class_name
+        self.calls.setdefault(qualified_name, set())
+
+    def add_call(self, caller, name, is_method, in_loop=False):
+        if caller in self.calls:
+            self.calls[caller].add((is_method, name, in_loop))
+
+    def callees(self, caller, loops_only=False):
+        class_name = self.classes.get(caller)
+        for is_method, name, in_loop in self.calls.get(caller, ()):
+            callee = f"{class_name}.{name}" if is_method and class_name else name
+            if callee in self.classes and (in_loop or not loops_only):
+                yield callee
+
+    def reachable(self, roots):
+        seen = set(roots)
+        stack = list(roots)
+        while stack:
+            for callee in self.callees(stack.pop()):
+                if callee not in seen:
+                    seen.add(callee)
+                    stack.append(callee)
+        return seen
+
+    def classify(self):
+        """Return {function: REQUEST | STARTUP | OTHER}, the request path and
+        the functions of the request path which are called in a loop there.
+
+        The request path starts at handle(); start(), __init__(), new() and
+        module level code are startup code unless the request path calls
+        them too.  Files without a handler can't be told apart and all of
+        their code is OTHER.
+        """
+        request = self.reachable([name for name in self.classes if name.rpartition('.')[2] in REQUEST_HANDLERS])
+        if not request:
+            return {}, [], set()
+        startup = self.reachable([MODULE_SCOPE] + [
+            name for name in self.classes if name.rpartition('.')[2] in STARTUP_HANDLERS])
+        scopes = {}
+        for name in self.classes:
+            scopes[name] = REQUEST if name in request else STARTUP if name in startup else OTHER
+        looped = self.reachable([callee for caller in request for callee in self.callees(caller, loops_only=True)])
+        return scopes, sorted(request), looped
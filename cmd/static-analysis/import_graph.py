@@ -0,0 +1,141 @@
+import ast
+import os
+import re
+
+from constant_propagation import bound_names, module_statements
+from constants import REQUEST_HANDLERS
+
+# The package the function templates put the function in, relative to the
+# project root, and the names its __init__.py exports for the runtime.
+ENTRY_PACKAGE = "function"
+ENTRY_NAMES = REQUEST_HANDLERS | {"new"}
+# Import statements at the start of a line, at any indentation, and calls
+# importing a module given by a constant name
+IMPORT_PATTERN = re.compile(
+    rb"^[ \t]*(?:from[ \t]+\.*[\w.]*[ \t]+import[ \t]*(?:\([^)]*\)|[^\r\n#;]*)|import[ \t]+[^\r\n#;]*)",
+    re.MULTILINE)
+DYNAMIC_IMPORT_PATTERN = re.compile(rb"\b(?:import_module|__import__)\(\s*[\'\"]([\w.]+)[\'\"]")
+# Backslash line continuations, joined before matching import statements
+CONTINUATION_PATTERN = re.compile(rb"\\\r?\n")
+# Import statements ast can't parse, e.g. cut off by a comment in
+# parentheses, are read loosely: every dotted name after from/import
+LOOSE_FROM_PATTERN = re.compile(r"from\s+(\.*)([\w.]*)\s+import\b(.*)", re.DOTALL)
+
+
+def find_entry(root):
+    """Return the path of the function's function/__init__.py, or None if the
+    project doesn't have one exporting new() or handle()."""
+    path = os.path.join(os.path.abspath(root), ENTRY_PACKAGE, "__init__.py")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+    except (OSError, UnicodeDecodeError, SyntaxError, ValueError):
+        return None
+    names = {name for stmt in module_statements(tree.body) for name in bound_names(stmt)}
+    return path if names & ENTRY_NAMES else None
+
+
+def reachable_files(root, filepaths):
+    """Split filepaths into the files reachable through imports from the
+    function's entry point and the unreachable rest.
+
+    Modules are named by their path relative to root, function/func.py is
+    function.func.  Imports anywhere in a module count, including those in
+    functions and importlib.import_module("name") calls with a constant
+    name, and importing a module reaches the __init__.py of its packages.
+    Without an entry point every file is reachable.
+    """
+    entry = find_entry(root)
+    if entry is None:
+        return list(filepaths), []
+
+    root = os.path.abspath(root)
+    modules = {module_name(root, path): path for path in filepaths}
+    entry_module = module_name(root, entry)
+    modules.setdefault(entry_module, entry)
+
+    seen = {entry_module}
+    stack = [entry_module]
+    while stack:
+        module = stack.pop()
+        path = modules[module]
+        package = module if path.endswith("__init__.py") else module.rpartition('.')[0]
+        for name in imported_modules(path, package):
+            # importing a.b.c runs a/__init__.py and a/b/__init__.py too
+            parts = name.split('.')
+            for i in range(1, len(parts) + 1):
+                candidate = '.'.join(parts[:i])
+                if candidate in modules and candidate not in seen:
+                    seen.add(candidate)
+                    stack.append(candidate)
+
+    reachable = {modules[module] for module in seen}
+    return [path for path in filepaths if path in reachable], [path for path in filepaths if path not in reachable]
+
+
+def module_name(root, path):
+    relative = os.path.relpath(path, root)[:-len(".py")].replace(os.sep, '.')
+    return relative[:-len(".__init__")] if relative.endswith(".__init__") else relative
+
+
+def imported_modules(path, package):
+    """Yield the absolute names of the modules path may import, with names
+    imported from a module also tried as its submodules.
+
+    Import statements are found with a regex over the raw bytes instead of
+    parsing the whole file, which would cost as much as analyzing it.  Lines
+    which only look like imports, e.g. in docstrings, reach too much, which
+    is harmless.  Statements which don't parse are read loosely rather than
+    skipped, so a module is never unreachable by mistake.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return
+    data = CONTINUATION_PATTERN.sub(b" ", data)
+    for match in IMPORT_PATTERN.finditer(data):
+        text = match.group().decode('utf-8', 'replace').strip()
+        try:
+            node = ast.parse(text).body[0]
+        except (SyntaxError, ValueError):
+            node = loose_import(text)
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name
+        else:
+            base = resolve_relative(node.module, node.level, package)
+            if base is None:
+                continue
+            if base:
+                yield base
+            for alias in node.names:
+                yield f"{base}.{alias.name}" if base else alias.name
+    for match in DYNAMIC_IMPORT_PATTERN.finditer(data):
+        yield match.group(1).decode('ascii')
+
+
+def loose_import(text):
+    """An ast.Import or ast.ImportFrom of every dotted name in text, an
+    import statement which doesn't parse."""
+    match = LOOSE_FROM_PATTERN.match(text)
+    if match is None:
+        names = re.findall(r"[A-Za-z_][\w.]*", text[len("import"):])
+        return ast.Import(names=[ast.alias(name=name) for name in names if name != "as"])
+    names = re.findall(r"[A-Za-z_]\w*", match.group(3))
+    return ast.ImportFrom(module=match.group(2) or None, names=[ast.alias(name=name) for name in names if name != "as"],
+                          level=len(match.group(1)))
+
+
+def resolve_relative(module, level, package):
+    """Absolute name of `from <level dots><module> import ...` in package,
+    or None if it leaves the project."""
+    if not level:
+        return module or ""
+    parts = package.split('.') if package else []
+    if level - 1 > len(parts):
+        return None
+    base = parts[:len(parts) - (level - 1)]
+    if module:
+        base.append(module)
+    return '.'.join(base)
@@ -0,0 +1,189 @@
+import ast
+from collections import namedtuple
+
+from constants import DTYPE_BYTES, DEFAULT_DTYPE_BYTES
+from util import get_full_attr_name
+
+# Parameters and FLOPs of one inference of a known pretrained model.  Vision
+# models are measured on a 224x224 image (as published by torchvision and
+# timm), language models on a sequence of TEXT_TOKENS tokens.
+ModelCost = namedtuple("ModelCost", "params flops")
+
+TEXT_TOKENS = 128
+
+
+class LoadedModel(namedtuple("LoadedModel", "name cost")):
+    """Value of a name bound to a known model, e.g. model = resnet50()."""
+
+
+def text_model(params):
+    # a transformer forward pass costs about 2 FLOPs per parameter and token
+    return ModelCost(params, 2 * params * TEXT_TOKENS)
+
+
+TORCHVISION_MODELS = {
+    "alexnet": ModelCost(61_100_840, 0.71e9),
+    "vgg16": ModelCost(138_357_544, 15.47e9),
+    "vgg19": ModelCost(143_667_240, 19.63e9),
+    "resnet18": ModelCost(11_689_512, 1.81e9),
+    "resnet34": ModelCost(21_797_672, 3.66e9),
+    "resnet50": ModelCost(25_557_032, 4.09e9),
+    "resnet101": ModelCost(44_549_160, 7.80e9),
+    "resnet152": ModelCost(60_192_808, 11.51e9),
+    "resnext50_32x4d": ModelCost(25_028_904, 4.23e9),
+    "wide_resnet50_2": ModelCost(68_883_240, 11.40e9),
+    "densenet121": ModelCost(7_978_856, 2.83e9),
+    "inception_v3": ModelCost(27_161_264, 5.71e9),
+    "googlenet": ModelCost(6_624_904, 1.50e9),
+    "squeezenet1_0": ModelCost(1_248_424, 0.82e9),
+    "mobilenet_v2": ModelCost(3_504_872, 0.30e9),
+    "mobilenet_v3_small": ModelCost(2_542_856, 0.06e9),
+    "mobilenet_v3_large": ModelCost(5_483_032, 0.22e9),
+    "efficientnet_b0": ModelCost(5_288_548, 0.39e9),
+    "efficientnet_b4": ModelCost(19_341_616, 4.39e9),
+    "efficientnet_b7": ModelCost(66_347_960, 37.75e9),
+    "efficientnet_v2_s": ModelCost(21_458_488, 8.37e9),
+    "regnet_y_16gf": ModelCost(83_590_140, 15.91e9),
+    "convnext_tiny": ModelCost(28_589_128, 4.46e9),
+    "convnext_base": ModelCost(88_591_464, 15.36e9),
+    "convnext_large": ModelCost(197_767_336, 34.36e9),
+    "swin_t": ModelCost(28_288_354, 4.49e9),
+    "swin_b": ModelCost(87_768_224, 15.43e9),
+    "vit_b_16": ModelCost(86_567_656, 17.56e9),
+    "vit_b_32": ModelCost(88_224_232, 4.41e9),
+    "vit_l_16": ModelCost(304_326_632, 61.55e9),
+    "vit_l_32": ModelCost(306_535_400, 15.38e9),
+    "vit_h_14": ModelCost(632_045_800, 167.29e9),
+    "fasterrcnn_resnet50_fpn": ModelCost(41_755_286, 134.38e9),
+    "maskrcnn_resnet50_fpn": ModelCost(44_401_393, 134.38e9),
+    "retinanet_resnet50_fpn": ModelCost(34_014_999, 151.54e9),
+    "fcn_resnet50": ModelCost(35_322_218, 152.72e9),
+    "deeplabv3_resnet50": ModelCost(42_004_074, 178.72e9),
+}
+
+TIMM_MODELS = {
+    "resnet50": TORCHVISION_MODELS["resnet50"],
+    "efficientnet_b0": TORCHVISION_MODELS["efficientnet_b0"],
+    "mobilenetv3_large_100": ModelCost(5_483_032, 0.22e9),
+    "convnext_base": TORCHVISION_MODELS["convnext_base"],
+    "vit_small_patch16_224": ModelCost(22_050_664, 4.61e9),
+    "vit_base_patch16_224": ModelCost(86_567_656, 17.58e9),
+    "vit_large_patch16_224": ModelCost(304_326_632, 61.60e9),
+    "deit_base_patch16_224": ModelCost(86_567_656, 17.58e9),
+    "swin_base_patch4_window7_224": ModelCost(87_768_224, 15.47e9),
+    "eva02_large_patch14_448": ModelCost(305_080_000, 362.3e9),
+}
+
+# Hub names without their organization, lower case
+TRANSFORMERS_MODELS = {
+    "distilbert-base-uncased": text_model(66_362_880),
+    "bert-base-uncased": text_model(109_482_240),
+    "bert-large-uncased": text_model(335_141_888),
+    "roberta-base": text_model(124_645_632),
+    "roberta-large": text_model(355_359_744),
+    "all-minilm-l6-v2": text_model(22_713_216),
+    "all-mpnet-base-v2": text_model(109_486_464),
+    "gpt2": text_model(124_439_808),
+    "gpt2-medium": text_model(354_823_168),
+    "gpt2-large": text_model(774_030_080),
+    "gpt2-xl": text_model(1_557_611_200),
+    "t5-small": text_model(60_506_624),
+    "t5-base": text_model(222_903_552),
+    "t5-large": text_model(737_668_096),
+    "flan-t5-xl": text_model(2_849_757_184),
+    "bart-large": text_model(406_291_456),
+    "opt-1.3b": text_model(1_315_758_080),
+    "phi-2": text_model(2_779_683_840),
+    "gpt-j-6b": text_model(6_053_381_344),
+    "llama-2-7b-hf": text_model(6_738_415_616),
+    "llama-2-13b-hf": text_model(13_015_864_320),
+    "mistral-7b-v0.1": text_model(7_241_732_096),
+    "falcon-7b": text_model(6_921_720_704),
+    "whisper-small": text_model(241_734_912),
+    "whisper-large-v3": text_model(1_543_490_560),
+    "clip-vit-base-patch32": ModelCost(151_277_313, 4.4e9),
+    "vit-base-patch16-224": TIMM_MODELS["vit_base_patch16_224"],
+}
+
+# Last names of every call find_model can match
+MODEL_CALL_NAMES = {"from_pretrained", "create_model", "pipeline", "SentenceTransformer", "load"} | set(
+    TORCHVISION_MODELS)
+# Methods running a model besides calling it, e.g. model.generate(ids)
+INFERENCE_METHODS = {"forward", "generate", "encode"}
+# Roots of the calls constructing torchvision architectures, e.g.
+# models.resnet50() or timm.models.resnet50().  A bare resnet50() is only
+# one once its import resolves it to such a module.
+TORCHVISION_ROOTS = {"models", "torchvision", "timm"}
+# from_pretrained of these classes loads vocabularies and configs, no weights
+WEIGHTLESS_PRETRAINED_SUFFIXES = ("Tokenizer", "TokenizerFast", "Processor", "FeatureExtractor", "Config")
+
+
+def find_model(node, full_name, evaluate):
+    """Match a call loading a known model against the tables.
+
+    Recognized are torchvision constructors (models.vit_l_16(weights=...)),
+    torch.hub.load("pytorch/vision", "resnet50"), timm.create_model("...")
+    and transformers' from_pretrained("..."), pipeline(model="...") and
+    SentenceTransformer("...").  full_name is resolved through the module's
+    imports, so functions of the file named like a model don't match.
+    evaluate maps the name argument to its string value.  Returns
+    (model name, ModelCost) or None.
+    """
+    parts = full_name.split('.')
+    name = parts[-1]
+    if name not in MODEL_CALL_NAMES:
+        return None
+
+    if name in TORCHVISION_MODELS and parts[0] in TORCHVISION_ROOTS:
+        return name, TORCHVISION_MODELS[name]
+
+    if name == "load" and full_name.endswith("hub.load"):
+        model = model_argument(node, 1, "model", evaluate)
+        return lookup(model, TORCHVISION_MODELS)
+    if name == "create_model":
+        model = model_argument(node, 0, "model_name", evaluate)
+        return lookup(model, TIMM_MODELS) or lookup(model, TORCHVISION_MODELS)
+    if name == "from_pretrained":
+        if is_weightless_pretrained(full_name):
+            return None
+        model = model_argument(node, 0, "pretrained_model_name_or_path", evaluate)
+        return lookup(model, TRANSFORMERS_MODELS)
+    if name == "SentenceTransformer" and parts[0] == "sentence_transformers":
+        return lookup(model_argument(node, 0, "model_name_or_path", evaluate), TRANSFORMERS_MODELS)
+    if name == "pipeline" and parts[0] == "transformers":
+        return lookup(model_argument(node, None, "model", evaluate), TRANSFORMERS_MODELS)
+    return None
+
+
+def is_weightless_pretrained(full_name):
+    """AutoTokenizer.from_pretrained(...) and the like."""
+    return full_name.rpartition('.')[0].rpartition('.')[2].endswith(WEIGHTLESS_PRETRAINED_SUFFIXES)
+
+
+def model_argument(node, position, keyword, evaluate):
+    for kw in node.keywords:
+        if kw.arg == keyword:
+            return evaluate(kw.value)
+    if position is not None and len(node.args) > position:
+        return evaluate(node.args[position])
+    return None
+
+
+def lookup(model, table):
+    if not isinstance(model, str):
+        return None
+    key = model.lower().rpartition('/')[2]
+    # a local checkout such as ./models/bert-base-uncased/ names the model too
+    key = key or model.lower().rstrip('/').rpartition('/')[2]
+    cost = table.get(key)
+    return (model, cost) if cost is not None else None
+
+
+def weight_dtype_bytes(node):
+    """Bytes per parameter of a loaded model, from torch_dtype=torch.float16."""
+    for kw in node.keywords:
+        if kw.arg in ("torch_dtype", "dtype"):
+            if isinstance(kw.value, ast.Constant) and isinstance(kw.value.value, str):
+                return DTYPE_BYTES.get(kw.value.value, DEFAULT_DTYPE_BYTES)
+            return DTYPE_BYTES.get(get_full_attr_name(kw.value).rpartition('.')[2], DEFAULT_DTYPE_BYTES)
+    return DEFAULT_DTYPE_BYTES
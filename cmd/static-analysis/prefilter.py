@@ -0,0 +1,32 @@
+import mmap
+import re
+
+from constants import GPU_IMPORTS, GPU_LIBRARY_IMPORTS, ARRAY_LIBRARIES, REQUEST_HANDLERS
+
+PREFILTER_REASON = "No GPU framework names, device calls or request handlers in source, skipped parsing."
+
+# Any file the AST analyzer could classify as something other than cpu
+# contains at least one of these byte sequences.  Framework names are matched
+# as prefixes so submodules (torch.nn, tensorflow.keras) are covered too.
+# Request handlers are kept for the blocking call lint and the request path
+# initialization report, which apply to plain Python handlers as well.
+PREFILTER_NAMES = GPU_IMPORTS | GPU_LIBRARY_IMPORTS | set(ARRAY_LIBRARIES.values()) | {"sklearn"}
+PREFILTER_PATTERN = re.compile(
+    rb"\b(?:" + rb"|".join(re.escape(name.encode()) for name in sorted(PREFILTER_NAMES)) + rb")"
+    rb"|\btf\."
+    rb"|\.cuda\b"
+    rb"|\.to\s*\("
+    rb"|\bdevice\s*\("
+    rb"|\btimm\b|\bfrom_pretrained\b|\bSentenceTransformer\b"
+    rb"|\bdef\s+(?:" + rb"|".join(name.encode() for name in sorted(REQUEST_HANDLERS)) + rb")\b"
+)
+
+
+def may_use_gpu(filename):
+    """Scan the raw bytes of filename once for anything GPU related."""
+    with open(filename, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return PREFILTER_PATTERN.search(data) is not None
+        except ValueError:  # empty files can't be mapped
+            return False
@@ -0,0 +1,57 @@
+from constants import INIT_CALLS, INIT_METHODS, INIT_LATENCY_MS, MODEL_LOAD_BYTES_PER_SECOND
+from model_zoo import find_model, is_weightless_pretrained, weight_dtype_bytes
+
+# Kinds which are only worth moving when they load the same thing every time
+CONSTANT_ARGUMENT_KINDS = {"file", "regex"}
+# Last names of every call init_call can match
+INIT_CALL_NAMES = {name.rpartition('.')[2] for name in INIT_CALLS} | set(INIT_METHODS)
+
+
+def init_call(node, full_name, evaluate):
+    """Match a call doing initialization which could run once instead of on
+    every request.
+
+    Flagged are model and tokenizer loads, client and connection
+    constructors, and regex compiles and file reads of a constant argument.
+    Returns (kind, estimated latency in ms) or None.
+    """
+    kind = INIT_CALLS.get(full_name) or INIT_METHODS.get(full_name.rpartition('.')[2])
+    if kind is None:
+        model = find_model(node, full_name, evaluate)
+        if model is None:
+            return None
+        kind = "model_load"
+    if kind in CONSTANT_ARGUMENT_KINDS and not (node.args and isinstance(evaluate(node.args[0]), str)):
+        return None
+    if full_name == "open" and not is_read_mode(node, evaluate):
+        return None
+
+    if kind == "model_load":
+        if is_weightless_pretrained(full_name):
+            kind = "tokenizer_load"
+        else:
+            model = find_model(node, full_name, evaluate)
+            if model is not None:
+                return kind, model[1].params * weight_dtype_bytes(node) / MODEL_LOAD_BYTES_PER_SECOND * 1000
+    return kind, INIT_LATENCY_MS[kind]
+
+
+def move_target(owner, kind, classes):
+    """Where an initialization made in owner should move: the start() or
+    __init__() of its class, or module level for regexes and functions."""
+    class_name = classes.get(owner)
+    if kind == "regex" or class_name is None:
+        return "module level"
+    for method in ("start", "__init__"):
+        if f"{class_name}.{method}" in classes:
+            return f"{class_name}.{method}"
+    return f"{class_name}.__init__"
+
+
+def is_read_mode(node, evaluate):
+    mode = node.args[1] if len(node.args) > 1 else next(
+        (kw.value for kw in node.keywords if kw.arg == "mode"), None)
+    if mode is None:
+        return True
+    mode = evaluate(mode)
+    return isinstance(mode, str) and not set(mode) & set("wax+")
@@ -0,0 +1,91 @@
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+def respond(handler, line):
+    """Decode one request line, run handler on it and encode the response."""
+    request_id = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        request_id = request.get("id")
+        response = handler(request)
+    except Exception as e:
+        response = {"error": str(e)}
+    if request_id is not None:
+        response["id"] = request_id
+    return json.dumps(response, separators=(",", ":")) + "\n"
+
+
+def serve_stdio(handler, idle_timeout=DEFAULT_IDLE_TIMEOUT, stdin=None, stdout=None):
+    """Answer one JSON request per stdin line with one JSON line on stdout.
+
+    Returns when stdin is closed or no request arrived for idle_timeout
+    seconds.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    lines = queue.Queue()
+
+    def read_lines():
+        for line in stdin:
+            lines.put(line)
+        lines.put(None)
+
+    # A reader thread keeps the idle timeout portable, select() on pipes is
+    # not available on every platform.
+    threading.Thread(target=read_lines, daemon=True).start()
+
+    while True:
+        try:
+            line = lines.get(timeout=idle_timeout)
+        except queue.Empty:
+            return
+        if line is None:
+            return
+        if not line.strip():
+            continue
+        stdout.write(respond(handler, line))
+        stdout.flush()
+
+
+def serve_unix_socket(path, handler, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Like serve_stdio, but accept connections on a unix socket at path.
+
+    Each connection may send any number of request lines.  Returns once no
+    connection arrived for idle_timeout seconds, removing the socket file.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(path)
+        listener.listen()
+        listener.settimeout(idle_timeout)
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                return
+            with conn:
+                conn.settimeout(idle_timeout)
+                with conn.makefile('r', encoding='utf-8') as reader, \
+                        conn.makefile('w', encoding='utf-8') as writer:
+                    try:
+                        for line in reader:
+                            if line.strip():
+                                writer.write(respond(handler, line))
+                                writer.flush()
+                    except (socket.timeout, OSError):
+                        pass
+    finally:
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
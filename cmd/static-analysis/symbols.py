@@ -0,0 +1,38 @@
+import ast
+
+# Modules named by the alias the analyzer's call tables use, e.g. tf.zeros
+CANONICAL_MODULES = {"tensorflow": "tf", "numpy": "np", "pandas": "pd"}
+
+
+class ImportTable:
+    """Names bound by the imports of a module, mapped to the dotted path they
+    refer to, so calls can be matched however the framework was imported.
+
+    `import torch as t` maps t to torch, `from torch import randn` maps randn
+    to torch.randn.  Relative imports name modules of the function itself and
+    are not recorded.
+    """
+
+    def __init__(self):
+        self.names = {}
+
+    def add(self, node):
+        """Record an ast.Import or ast.ImportFrom."""
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    self.names[alias.asname] = alias.name
+                else:
+                    root = alias.name.partition('.')[0]
+                    self.names[root] = root
+        elif node.module and not node.level:
+            for alias in node.names:
+                if alias.name != '*':
+                    self.names[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+
+    def resolve(self, full_name):
+        """Return the canonical dotted name of a call such as t.randn or
+        tensorflow.zeros, e.g. torch.randn and tf.zeros."""
+        root, dot, rest = full_name.partition('.')
+        module, sep, submodules = self.names.get(root, root).partition('.')
+        return CANONICAL_MODULES.get(module, module) + sep + submodules + dot + rest
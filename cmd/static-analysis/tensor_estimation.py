@@ -1,9 +1,19 @@
 import ast
+from collections import namedtuple
 
+from constants import DTYPE_BYTES, DEFAULT_DTYPE_BYTES, MATMUL_OPS, LINEAR_OPS, CONV_OPS, LINEAR_LAYERS, \
+    CONV_LAYERS, ARRAY_DTYPE_BYTES
 from util import get_full_attr_name
 
 
-def estimate_pytorch_tensor_size(call_node):
+def estimate_pytorch_tensor_size(call_node, limit=None, resolve=None):
+    """
+    Estimate the number of elements of a pytorch tensor constructor call.
+    With a limit, literal elements are only counted up to it, so the result
+    is min(size, limit), an AtLeast if the literal has more elements.
+    If given, resolve maps names and arithmetic in shapes to their int value
+    or None.
+    """
     size = 1
     found_shape = False
 
@@ -16,7 +26,7 @@ def estimate_pytorch_tensor_size(call_node):
         # Case 1: torch.tensor([...]) — count elements in nested list
         # Example: torch.tensor([1, 2, 3])
         if func_name.endswith("tensor") and isinstance(arg, ast.List):
-            size = count_elements(arg)
+            size = count_elements(arg, limit)
             return size if size > 0 else None
 
         # Case 2: Shape as Tuple or List
@@ -24,10 +34,10 @@ def estimate_pytorch_tensor_size(call_node):
         if isinstance(arg, (ast.Tuple, ast.List)):
             dims = []
             for elt in arg.elts:
-                if isinstance(elt, ast.Constant) and isinstance(elt.value, int):
-                    dims.append(elt.value)
-                else:
+                dim = dimension_value(elt, resolve)
+                if dim is None:
                     return None
+                dims.append(dim)
             if dims:
                 found_shape = True
                 for dim in dims:
@@ -39,12 +49,25 @@ def estimate_pytorch_tensor_size(call_node):
             found_shape = True
             size *= arg.value
 
+        # Case 4: Names and arithmetic resolved by constant propagation
+        # Example: torch.randn(batch_size, 3, 224, 224)
+        elif resolve is not None and isinstance(arg, (ast.Name, ast.BinOp, ast.UnaryOp)):
+            dim = resolve(arg)
+            if dim is None:
+                return None
+            found_shape = True
+            size *= dim
+
         elif isinstance(arg, (ast.Name, ast.Call, ast.Starred)):
             return None
 
     return size if found_shape else None
 
-def estimate_tensorflow_tensor_size(call_node):
+def estimate_tensorflow_tensor_size(call_node, limit=None, resolve=None):
+    """
+    Estimate the number of elements of a tensorflow tensor constructor call,
+    bounded by limit and with shapes resolved like estimate_pytorch_tensor_size.
+    """
     if not isinstance(call_node, ast.Call):
         return None
 
@@ -52,17 +75,17 @@ def estimate_tensorflow_tensor_size(call_node):
     if full_name == "tf.constant":
         if call_node.args:
             arg = call_node.args[0]
-            return count_elements(arg)
+            return count_elements(arg, limit)
         return None
 
     for arg in call_node.args:
         if isinstance(arg, (ast.List, ast.Tuple)):
             dims = []
             for elt in arg.elts:
-                if isinstance(elt, ast.Constant) and isinstance(elt.value, int):
-                    dims.append(elt.value)
-                else:
+                dim = dimension_value(elt, resolve)
+                if dim is None:
                     return None
+                dims.append(dim)
             if dims:
                 size = 1
                 for dim in dims:
@@ -75,16 +98,273 @@ def estimate_tensorflow_tensor_size(call_node):
     return None
 
 
-def count_elements(node):
+def dimension_value(node, resolve=None):
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+        return node.value
+    if resolve is not None:
+        return resolve(node)
+    return None
+
+
+class AtLeast(int):
+    """An element count cut off at a limit, the literal has more elements."""
+
+
+def count_elements(node, limit=None):
     """
-    Recursively count total number of constants in a nested ast.List
+    Count total number of constants in a nested ast.List.
+    The lists are walked with an explicit stack so deeply nested literals can't
+    hit the recursion limit, and counting stops once more than limit are
+    found, returning AtLeast(limit).
     """
     if not isinstance(node, ast.List):
         return 0
     total = 0
-    for elt in node.elts:
-        if isinstance(elt, ast.Constant):
-            total += 1
-        elif isinstance(elt, ast.List):
-            total += count_elements(elt)
-    return total
\ No newline at end of file
+    stack = [node]
+    while stack:
+        for elt in stack.pop().elts:
+            if isinstance(elt, ast.Constant):
+                total += 1
+                if limit is not None and total > limit:
+                    return AtLeast(limit)
+            elif isinstance(elt, ast.List):
+                stack.append(elt)
+    return total
+
+
+# Cost model
+
+class TensorValue(namedtuple("TensorValue", "shape dtype_bytes library", defaults=(None,))):
+    """Shape and element size of a tensor bound to a name, so the cost of
+    ops on it can be estimated.  library is "numpy" or "pandas" for arrays
+    and frames on the CPU, None for pytorch and tensorflow tensors."""
+
+    @property
+    def bytes(self):
+        return product(self.shape) * self.dtype_bytes
+
+
+class OpCost(namedtuple("OpCost", "flops bytes result")):
+    """Estimated FLOPs of an op, the bytes it allocates (its result or the
+    parameters of a layer) and its result as a TensorValue or None."""
+
+
+# Data constructors take the tensor's elements, all others its shape
+DATA_CONSTRUCTORS = {"tensor", "constant"}
+# Arguments holding the size of numpy.random functions, by position
+RANDOM_SIZE_ARGUMENTS = {"random": 0, "normal": 2, "uniform": 2, "randint": 2}
+# Methods returning a tensor of the same shape, or the same model
+SAME_SHAPE_METHODS = {"to", "cuda", "cpu", "contiguous", "detach", "clone", "eval"}
+COST_OP_NAMES = MATMUL_OPS | LINEAR_OPS | CONV_OPS | LINEAR_LAYERS | CONV_LAYERS
+
+
+def product(values):
+    result = 1
+    for value in values:
+        result *= value
+    return result
+
+
+def dtype_bytes(call_node, default=DEFAULT_DTYPE_BYTES):
+    """Bytes per element of the tensor created by call_node, from its dtype
+    keyword, e.g. dtype=torch.float16 or dtype="int8"."""
+    for keyword in call_node.keywords:
+        if keyword.arg == "dtype":
+            value = keyword.value
+            if isinstance(value, ast.Constant) and isinstance(value.value, str):
+                name = value.value
+            else:
+                name = get_full_attr_name(value).rpartition('.')[2]
+            return DTYPE_BYTES.get(name, default)
+    return default
+
+
+def tensor_shape(call_node, resolve=None):
+    """Return the shape of the tensor created by a pytorch or tensorflow
+    constructor call as a tuple, or None if it isn't known."""
+    name = get_full_attr_name(call_node.func).rpartition('.')[2]
+    if not call_node.args:
+        return None
+    first = call_node.args[0]
+
+    if name in DATA_CONSTRUCTORS:
+        return literal_shape(first)
+
+    if isinstance(first, (ast.Tuple, ast.List)):
+        return shape_of(first.elts, resolve)
+    # torch.zeros(2, 3)
+    return shape_of(call_node.args, resolve)
+
+
+def literal_shape(node):
+    """Shape of literal data, taken from the first element at every nesting
+    level, ragged lists aren't tensors anyway."""
+    shape = []
+    while isinstance(node, ast.List):
+        shape.append(len(node.elts))
+        if not node.elts:
+            break
+        node = node.elts[0]
+    return tuple(shape) if shape else None
+
+
+def shape_of(nodes, resolve=None):
+    dims = [dimension_value(node, resolve) for node in nodes]
+    if not dims or any(dim is None or dim < 0 for dim in dims):
+        return None
+    return tuple(dims)
+
+
+def array_value(call_node, library, op, evaluate):
+    """Return the TensorValue of the numpy array created by np.<op>(...) or
+    the pandas frame created by pd.<op>(...), or None if its shape isn't
+    known.  evaluate maps arguments to their int or TensorValue value.
+
+    Frames are built from an array or a dict of equally long columns, and
+    read_csv is only sized when it reads a constant number of rows.
+    """
+    resolve = lambda node: as_int(evaluate(node))
+    element_bytes = dtype_bytes(call_node, ARRAY_DTYPE_BYTES)
+    if op in ("random.rand", "random.randn"):
+        shape = shape_of(call_node.args, resolve)
+    elif op.startswith("random."):
+        shape = size_shape(argument(call_node, RANDOM_SIZE_ARGUMENTS[op.partition('.')[2]], "size"), resolve)
+    elif op == "array":
+        shape = literal_shape(argument(call_node, 0, "object"))
+    elif op == "arange":
+        bounds = [dimension_value(arg, resolve) for arg in call_node.args[:2]]
+        if not bounds or None in bounds or len(call_node.args) > 2:
+            return None
+        shape = (max(bounds[-1] - (bounds[0] if len(bounds) == 2 else 0), 0),)
+    elif op == "read_csv":
+        rows = argument(call_node, None, "nrows")
+        rows = dimension_value(rows, resolve) if rows is not None else None
+        columns = argument(call_node, None, "usecols")
+        shape = (rows, len(columns.elts) if isinstance(columns, (ast.List, ast.Tuple)) else 1) if rows else None
+    elif op == "DataFrame":
+        return frame_value(argument(call_node, 0, "data"), evaluate)
+    else:
+        # zeros, ones, empty and full take the shape first
+        shape = size_shape(argument(call_node, 0, "shape"), resolve)
+    return TensorValue(shape, element_bytes, library) if shape is not None else None
+
+
+def frame_value(data, evaluate):
+    if isinstance(data, ast.Dict):
+        columns = [as_tensor(evaluate(value)) for value in data.values]
+        if not columns or any(column is None or len(column.shape) != 1 for column in columns):
+            return None
+        rows = max(column.shape[0] for column in columns)
+        return TensorValue((rows, len(columns)), max(column.dtype_bytes for column in columns), "pandas")
+    value = as_tensor(evaluate(data)) if data is not None else None
+    if value is None or not 1 <= len(value.shape) <= 2:
+        return None
+    return TensorValue(value.shape if len(value.shape) == 2 else value.shape + (1,), value.dtype_bytes, "pandas")
+
+
+def size_shape(node, resolve=None):
+    """Shape given as an int or a tuple of ints, like numpy's size and shape."""
+    if node is None:
+        return None
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return shape_of(node.elts, resolve)
+    return shape_of([node], resolve)
+
+
+def argument(call_node, position, keyword):
+    for kw in call_node.keywords:
+        if kw.arg == keyword:
+            return kw.value
+    if position is not None and len(call_node.args) > position:
+        return call_node.args[position]
+    return None
+
+
+def matmul_cost(left, right):
+    """FLOPs of left @ right, broadcasting batch dimensions like torch.matmul."""
+    if left is None or right is None or not left.shape or not right.shape:
+        return None
+    a = left.shape if len(left.shape) > 1 else (1,) + left.shape
+    b = right.shape if len(right.shape) > 1 else right.shape + (1,)
+    m, k = a[-2], a[-1]
+    n = b[-1]
+    batch = a[:-2] if len(a) >= len(b) else b[:-2]
+    shape = batch + (m, n)
+    result = TensorValue(shape, max(left.dtype_bytes, right.dtype_bytes), left.library)
+    return OpCost(2 * product(batch) * m * k * n, result.bytes, result)
+
+
+def linear_cost(inputs, weight):
+    """FLOPs of F.linear(inputs, weight) with weight of shape (out, in)."""
+    if inputs is None or weight is None or not inputs.shape or len(weight.shape) != 2:
+        return None
+    out_features, in_features = weight.shape
+    result = TensorValue(inputs.shape[:-1] + (out_features,), inputs.dtype_bytes, inputs.library)
+    return OpCost(2 * product(inputs.shape[:-1]) * in_features * out_features, result.bytes, result)
+
+
+def conv_cost(inputs, weight):
+    """FLOPs of F.convNd(inputs, weight) with unit stride and no padding."""
+    if inputs is None or weight is None or len(inputs.shape) != len(weight.shape) or len(weight.shape) < 3:
+        return None
+    spatial = tuple(max(size - kernel + 1, 0) for size, kernel in zip(inputs.shape[2:], weight.shape[2:]))
+    result = TensorValue((inputs.shape[0], weight.shape[0]) + spatial, inputs.dtype_bytes, inputs.library)
+    return OpCost(2 * product(result.shape) * product(weight.shape[1:]), result.bytes, result)
+
+
+def layer_cost(name, call_node, resolve=None):
+    """Parameter bytes and FLOPs per sample (Linear) or per output position
+    (ConvNd) of a layer constructor such as nn.Linear(512, 10)."""
+    if len(call_node.args) < 2:
+        return None
+    in_features = dimension_value(call_node.args[0], resolve)
+    out_features = dimension_value(call_node.args[1], resolve)
+    if in_features is None or out_features is None:
+        return None
+    weights = in_features * out_features
+    if name in CONV_LAYERS:
+        dims = int(name[-2])
+        kernel = call_node.args[2] if len(call_node.args) > 2 else next(
+            (keyword.value for keyword in call_node.keywords if keyword.arg == "kernel_size"), None)
+        if isinstance(kernel, (ast.Tuple, ast.List)):
+            kernel_dims = [dimension_value(elt, resolve) for elt in kernel.elts]
+        else:
+            kernel_dims = [dimension_value(kernel, resolve)] * dims if kernel is not None else [None]
+        if any(dim is None for dim in kernel_dims):
+            return None
+        weights *= product(kernel_dims)
+    return OpCost(2 * weights, (weights + out_features) * DEFAULT_DTYPE_BYTES, None)
+
+
+def estimate_op_cost(call_node, full_name, evaluate):
+    """Estimate the cost of a matmul, linear, conv or layer constructor call.
+
+    evaluate maps an operand node to its TensorValue, or to anything else if
+    it isn't a known tensor.  Method calls such as a.matmul(b) take the
+    object as their first operand.
+    """
+    name = full_name.rpartition('.')[2]
+    if name not in COST_OP_NAMES:
+        return None
+    if name in LINEAR_LAYERS or name in CONV_LAYERS:
+        return layer_cost(name, call_node, lambda node: as_int(evaluate(node)))
+
+    operands = list(call_node.args[:2])
+    if len(operands) == 1 and isinstance(call_node.func, ast.Attribute):
+        operands.insert(0, call_node.func.value)
+    if len(operands) != 2:
+        return None
+    left, right = (as_tensor(evaluate(operand)) for operand in operands)
+    if name in MATMUL_OPS:
+        return matmul_cost(left, right)
+    if name in LINEAR_OPS:
+        return linear_cost(left, right)
+    return conv_cost(left, right)
+
+
+def as_tensor(value):
+    return value if isinstance(value, TensorValue) else None
+
+
+def as_int(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
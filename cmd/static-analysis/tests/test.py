@@ -1,13 +1,42 @@
 import os
+import io
+import json
+import shutil
+import socket
+import threading
 import pytest
 import ast
 
-from analyze_file import analyze_file
-from tensor_estimation import estimate_pytorch_tensor_size, estimate_tensorflow_tensor_size
+from analyze_file import analyze_file, tensor_op_framework
+from benchmarks.corpus import generate_project
+from cache import AnalysisCache
+from calibration import Thresholds, DEFAULT_THRESHOLDS, derive_thresholds, load_thresholds, calibrate, \
+    measure_elementwise
+from import_graph import reachable_files
+from model_zoo import find_model, TORCHVISION_MODELS, TRANSFORMERS_MODELS
+import classifier
+from classifier import analyze_directory_for_gpu_code, handle_request, stream_directory_analysis
+from prefilter import may_use_gpu, PREFILTER_REASON
+from server import serve_stdio, serve_unix_socket
+from symbols import ImportTable
+from util import get_full_attr_name
+from walker import walk_python_files
+from tensor_estimation import estimate_pytorch_tensor_size, estimate_tensorflow_tensor_size, count_elements, \
+    dtype_bytes, matmul_cost, tensor_shape, AtLeast, TensorValue
 
 GPU_TESTDATA_DIR = os.path.join(os.path.dirname(__file__), "testdata/gpu")
 CPU_TESTDATA_DIR = os.path.join(os.path.dirname(__file__), "testdata/cpu")
 
+
+def analyze_source(tmp_path, source, same_with_scanner=True, **kwargs):
+    test_file = tmp_path / "func.py"
+    test_file.write_text(source)
+    result = analyze_file(str(test_file), **kwargs)
+    if same_with_scanner:
+        assert result == analyze_file(str(test_file), large_file_size=0, **kwargs)
+    return result
+
+
 class TestCPUClassification:
     def test_basic_cpu_classification(self):
         test_file = os.path.join(CPU_TESTDATA_DIR, "cpu.py")
@@ -31,12 +60,33 @@ class TestCPUClassification:
         assert result["execution_mode"] == "cpu_preferred"
         assert result["details"]["has_explicit_gpu_calls"] is False
 
+    def test_prefilter_short_circuits_plain_python(self):
+        test_file = os.path.join(CPU_TESTDATA_DIR, "cpu.py")
+        assert may_use_gpu(test_file) is False
+        assert analyze_file(test_file)["reason"] == PREFILTER_REASON
+
+    @pytest.mark.parametrize("filename", sorted(os.listdir(GPU_TESTDATA_DIR)))
+    def test_prefilter_keeps_gpu_candidates(self, filename):
+        assert may_use_gpu(os.path.join(GPU_TESTDATA_DIR, filename)) is True
+
+    def test_prefilter_empty_file(self, tmp_path):
+        test_file = tmp_path / "empty.py"
+        test_file.write_text("")
+        assert analyze_file(str(test_file))["execution_mode"] == "cpu"
+
     def test_with_real_case(self):
         test_file = os.path.join(CPU_TESTDATA_DIR, "real-case.py")
         result = analyze_file(test_file)
         print(result)
-        assert result["execution_mode"] == "cpu_preferred"
+        # torch.randn(batch_size, 3, 224, 224) with batch_size = 128 is a big call
+        assert result["execution_mode"] == "gpu_preferred"
         assert result["details"]["has_explicit_gpu_calls"] is False
+        assert result["details"]["big_calls"] == [("pytorch", "torch.randn", 128 * 3 * 224 * 224, 27)]
+        assert result["details"]["optional_gpu_calls"] == ["model.to", "to", "torch.device"]
+        # the model is loaded at startup and run by the handler
+        scopes = result["details"]["cost"]["scopes"]
+        assert scopes["startup"]["flops"] == 0
+        assert scopes["request"]["flops"] == int(TORCHVISION_MODELS["vit_l_16"].flops)
 
 
 class TestGPUClassification:
@@ -78,6 +128,656 @@ class TestGPUClassification:
         assert len(result["details"]["small_calls"]) == 0
         assert len(result["details"]["big_calls"]) == 0
 
+    def test_explicit_calls_accumulate(self, tmp_path):
+        test_file = tmp_path / "func.py"
+        test_file.write_text(
+            "import torch\n"
+            "model.cuda()\n"
+            "x = torch.device('cuda')\n"
+            "print(x)\n"
+        )
+        result = analyze_file(str(test_file))
+        assert result["execution_mode"] == "gpu"
+        assert result["details"]["explicit_gpu_calls"] == ["model.cuda", "torch.device"]
+        assert result["details"]["lines_considered"] == [2, 3]
+
+    @pytest.mark.parametrize("full_name,expected", [
+        ("torch.zeros", "pytorch"),
+        ("torch.nn.init.zeros", "pytorch"),
+        ("tf.random.uniform", "tensorflow"),
+        ("tf.uniform", None),
+        ("tf.zeros", "tensorflow"),
+        ("zeros", None),
+        ("np.zeros", None),
+        ("torch.randn_like", None),
+    ])
+    def test_tensor_op_framework(self, full_name, expected):
+        assert tensor_op_framework(full_name) == expected
+
+
+class TestConstantPropagation:
+    def test_module_constants_defined_after_use(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "def handle():\n"
+            "    return torch.zeros(BATCH, HIDDEN * 4)\n"
+            "BATCH = 64\n"
+            "HIDDEN = 256\n"
+        ), same_with_scanner=False)  # the token scanner only sees assignments before their use
+        assert result["details"]["big_calls"] == [("pytorch", "torch.zeros", 64 * 1024, 3)]
+
+    def test_module_constants_evaluated_on_use(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "def handle():\n"
+            "    return torch.zeros(ROWS, STEPS)\n"
+            "ROWS = COLUMNS * 2\n"
+            "COLUMNS = 500\n"
+            "STEPS = STEPS + 1\n"
+        ), same_with_scanner=False)
+        assert result["details"]["big_calls"] == []
+        assert result["details"]["small_calls"] == []
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "def handle():\n"
+            "    return torch.zeros(ROWS)\n"
+            "ROWS = COLUMNS * 2\n"
+            "COLUMNS = 500\n"
+        ), same_with_scanner=False)
+        assert result["details"]["big_calls"] == [("pytorch", "torch.zeros", 1000, 3)]
+
+    def test_local_assignments_and_arithmetic(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import tensorflow as tf\n"
+            "def handle(request):\n"
+            "    n = 10\n"
+            "    n *= 100\n"
+            "    rows = n // 2 - 1\n"
+            "    return tf.zeros([rows, -(-n)])\n"
+        ))
+        assert result["details"]["big_calls"] == [("tensorflow", "tf.zeros", 499 * 1000, 6)]
+
+    def test_parameters_and_class_attributes_shadow(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "n = 5000\n"
+            "def handle(n):\n"
+            "    return torch.zeros(n)\n"
+            "class Function:\n"
+            "    size = 2\n"
+            "    def handle(self):\n"
+            "        return torch.ones(size, 3)\n"
+        ))
+        assert result["details"]["big_calls"] == []
+        assert result["details"]["small_calls"] == []
+
+    def test_device_variables(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "device = 'cuda'\n"
+            "other = torch.device('cuda' if torch.cuda.is_available() else 'cpu')\n"
+            "model.to(device)\n"
+            "data.to(other)\n"
+        ))
+        assert result["execution_mode"] == "gpu"
+        assert result["details"]["explicit_gpu_calls"] == ["model.to"]
+        assert result["details"]["lines_considered"] == [4]
+        assert result["details"]["optional_gpu_calls"] == ["data.to", "torch.device"]
+
+    def test_optional_device_is_not_gpu_evidence(self, tmp_path):
+        # an availability check alone doesn't make small tensors worth a GPU
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')\n"
+            "x = torch.zeros(10).to(device)\n"
+        ))
+        assert result["execution_mode"] == "cpu_preferred"
+        assert result["details"]["optional_gpu_calls"] == ["to", "torch.device"]
+        assert result["details"]["small_calls"] == [("pytorch", "torch.zeros", 10, 3)]
+
+
+class TestCostModel:
+    @pytest.mark.parametrize("code,expected", [
+        ("torch.zeros(3, 4)", 4),
+        ("torch.zeros(3, 4, dtype=torch.float64)", 8),
+        ("tf.zeros([3], dtype=tf.int8)", 1),
+        ("tf.zeros([3], dtype='float16')", 2),
+        ("torch.zeros(3, dtype=unknown)", 4),
+    ])
+    def test_dtype_bytes(self, code, expected):
+        assert dtype_bytes(ast.parse(code).body[0].value) == expected
+
+    @pytest.mark.parametrize("code,expected", [
+        ("torch.zeros(3, 4)", (3, 4)),
+        ("tf.zeros([3, 4])", (3, 4)),
+        ("torch.tensor([[1, 2, 3], [4, 5, 6]])", (2, 3)),
+        ("tf.constant(1.0)", None),
+        ("torch.zeros(n)", None),
+    ])
+    def test_tensor_shape(self, code, expected):
+        assert tensor_shape(ast.parse(code).body[0].value) == expected
+
+    def test_matmul_cost(self):
+        cost = matmul_cost(TensorValue((8, 64, 32), 4), TensorValue((32, 16), 2))
+        assert cost.flops == 2 * 8 * 64 * 32 * 16
+        assert cost.result == TensorValue((8, 64, 16), 4)
+        assert cost.bytes == 8 * 64 * 16 * 4
+
+    def test_dtype_decides_big_calls(self, tmp_path):
+        test_file = tmp_path / "func.py"
+        test_file.write_text(
+            "import torch\n"
+            "a = torch.zeros(2000, dtype=torch.int8)\n"
+            "b = torch.zeros(600, dtype=torch.float64)\n"
+        )
+        result = analyze_file(str(test_file))
+        assert result["details"]["small_calls"] == [("pytorch", "torch.zeros", 2000, 2)]
+        assert result["details"]["big_calls"] == [("pytorch", "torch.zeros", 600, 3)]
+
+    def test_function_costs(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "N = 512\n"
+            "class Model:\n"
+            "    def forward(self):\n"
+            "        a = torch.randn(N, N).to('cpu')\n"
+            "        b = torch.matmul(a, a) @ a\n"
+            "        return b\n"
+        ))
+        assert result["details"]["cost"]["functions"] == {
+            "Model.forward": {"bytes": 3 * 512 * 512 * 4, "flops": 2 * 2 * 512 ** 3},
+        }
+        assert result["details"]["cost"]["ops"] == [("@", 2 * 512 ** 3, 6), ("torch.matmul", 2 * 512 ** 3, 6)]
+
+    def test_flops_prefer_gpu(self, tmp_path):
+        test_file = tmp_path / "func.py"
+        test_file.write_text(
+            "import torch\n"
+            "def new():\n"
+            "    return torch.nn.Linear(8192, 8192)\n"
+        )
+        result = analyze_file(str(test_file))
+        assert result["execution_mode"] == "gpu_preferred"
+        assert result["details"]["big_calls"] == []
+        assert "in new" in result["reason"]
+
+
+class TestCalibration:
+    @pytest.mark.parametrize("flops_per_second,bytes_per_second", [(10 ** 11, 10 ** 10), (3e9, 2e9), (2e12, 5e10)])
+    def test_thresholds_take_the_budget_on_the_cpu(self, flops_per_second, bytes_per_second):
+        thresholds = derive_thresholds(flops_per_second, bytes_per_second, budget=0.002)
+        # work at the thresholds takes the CPU as long as the budget
+        assert thresholds.tensor_bytes_pytorch / bytes_per_second == pytest.approx(0.002)
+        assert thresholds.tensor_bytes_tensorflow / bytes_per_second == pytest.approx(0.002)
+        assert thresholds.function_flops / flops_per_second == pytest.approx(0.002)
+        # a faster CPU keeps bigger work
+        faster = derive_thresholds(2 * flops_per_second, 2 * bytes_per_second, budget=0.002)
+        assert all(f > t for f, t in zip(faster, thresholds))
+
+    def test_profile_replaces_constants(self, tmp_path, monkeypatch):
+        profile = tmp_path / "thresholds.json"
+        monkeypatch.setenv("FUNC_ANALYSIS_THRESHOLDS", str(profile))
+        assert load_thresholds() == DEFAULT_THRESHOLDS
+        profile.write_text(json.dumps({"version": 1, "tensor_bytes_pytorch": 1000, "tensor_bytes_tensorflow": 1000,
+                                       "function_flops": 10 ** 12}))
+        # profiles of older calibrations are ignored
+        assert load_thresholds(str(profile)) == DEFAULT_THRESHOLDS
+        profile.write_text(json.dumps({"version": 2, "tensor_bytes_pytorch": 1000, "tensor_bytes_tensorflow": 1000,
+                                       "function_flops": 10 ** 12}))
+        assert load_thresholds(str(tmp_path / "other.json")) == DEFAULT_THRESHOLDS
+        thresholds = load_thresholds(str(profile))
+        assert thresholds == Thresholds(1000, 1000, 10 ** 12)
+
+        source = (
+            "import torch\n"
+            "a = torch.zeros(600)\n"
+            "def new():\n"
+            "    return torch.nn.Linear(8192, 8192)\n"
+        )
+        default = analyze_source(tmp_path, source, thresholds=DEFAULT_THRESHOLDS)
+        assert "in new" in default["reason"]
+        assert default["details"]["small_calls"] == [("pytorch", "torch.zeros", 600, 2)]
+        result = analyze_source(tmp_path, source, thresholds=thresholds)
+        assert result["execution_mode"] == "gpu_preferred"
+        assert result["reason"].startswith("Detected 1 big pytorch/tensorflow call(s)")
+        assert result["details"]["big_calls"] == [("pytorch", "torch.zeros", 600, 2)]
+
+    def test_calibrate(self, tmp_path, monkeypatch):
+        pytest.importorskip("numpy")
+        profile = tmp_path / "thresholds.json"
+        monkeypatch.setenv("FUNC_ANALYSIS_THRESHOLDS", str(profile))
+        monkeypatch.setattr("calibration.ELEMENTWISE_SIZES", (10 ** 4, 10 ** 5))
+        result = calibrate()
+        assert json.loads(profile.read_text()) == result
+        assert result["matmul_flops_per_second"] > 0
+        assert load_thresholds() == Thresholds(*(result[field] for field in Thresholds._fields))
+
+    def test_elementwise_rate_counts_result_bytes(self, monkeypatch):
+        pytest.importorskip("numpy")
+        monkeypatch.setattr("calibration.ELEMENTWISE_SIZES", (10 ** 4,))
+        monkeypatch.setattr("calibration.best_time", lambda run: 0.5)
+        # the bytes of one float32 tensor, not the traffic of both operands and the result
+        assert measure_elementwise() == 10 ** 4 * 4 / 0.5
+
+
+class TestModelZoo:
+    @pytest.mark.parametrize("code,expected", [
+        ("models.vit_l_16(weights=models.ViT_L_16_Weights.DEFAULT)", "vit_l_16"),
+        ("torchvision.models.resnet50(pretrained=True)", "resnet50"),
+        ("torchvision.models.resnet18()", "resnet18"),
+        ("timm.models.resnet50()", "resnet50"),
+        ("resnet18()", None),
+        ("torch.hub.load('pytorch/vision', 'resnet101')", "resnet101"),
+        ("timm.create_model('vit_base_patch16_224', pretrained=True)", "vit_base_patch16_224"),
+        ("AutoModel.from_pretrained('bert-base-uncased')", "bert-base-uncased"),
+        ("AutoModel.from_pretrained('meta-llama/Llama-2-7b-hf')", "meta-llama/Llama-2-7b-hf"),
+        ("transformers.pipeline('text-generation', model='gpt2')", "gpt2"),
+        ("pipeline('text-generation', model='gpt2')", None),
+        ("sentence_transformers.SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')",
+         "sentence-transformers/all-MiniLM-L6-v2"),
+        ("SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')", None),
+        ("AutoModel.from_pretrained('my-org/private-model')", None),
+        ("AutoModel.from_pretrained(path)", None),
+        ("self.resnet50()", None),
+    ])
+    def test_find_model(self, code, expected):
+        node = ast.parse(code).body[0].value
+        full_name = get_full_attr_name(node.func)
+        evaluate = lambda arg: arg.value if isinstance(arg, ast.Constant) else None
+        model = find_model(node, full_name, evaluate)
+        assert (model[0] if model is not None else None) == expected
+
+    def test_model_load_prefers_gpu(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "from transformers import AutoModel\n"
+            "MODEL = 'bert-large-uncased'\n"
+            "def new():\n"
+            "    return AutoModel.from_pretrained(MODEL, torch_dtype=torch.float16)\n"
+        ))
+        cost = TRANSFORMERS_MODELS["bert-large-uncased"]
+        assert result["execution_mode"] == "gpu_preferred"
+        assert "bert-large-uncased" in result["reason"]
+        assert result["details"]["models"] == [("bert-large-uncased", cost.params, cost.flops, 5)]
+        assert result["details"]["cost"]["functions"]["new"]["bytes"] == cost.params * 2
+        assert result["details"]["estimated_gpu_memory_bytes"] > cost.params * 2
+
+    def test_bare_names_need_a_zoo_import(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "from torchvision.models import resnet50\n"
+            "def resnet18():\n"
+            "    return torch.nn.Identity()\n"
+            "model = resnet50()\n"
+            "encoder = resnet18()\n"
+        ))
+        cost = TORCHVISION_MODELS["resnet50"]
+        assert result["details"]["models"] == [("resnet50", cost.params, int(cost.flops), 5)]
+
+    def test_small_model_stays_on_cpu(self, tmp_path):
+        test_file = tmp_path / "func.py"
+        test_file.write_text(
+            "import torch\n"
+            "from torchvision import models\n"
+            "model = models.mobilenet_v3_small()\n"
+        )
+        result = analyze_file(str(test_file))
+        assert result["execution_mode"] == "cpu_preferred"
+        assert result["details"]["models"] == [
+            ("mobilenet_v3_small", TORCHVISION_MODELS["mobilenet_v3_small"].params,
+             int(TORCHVISION_MODELS["mobilenet_v3_small"].flops), 3)]
+        assert result["details"]["estimated_gpu_memory_bytes"] == 0
+
+    MODEL_FUNCTION = (
+        "import torch\n"
+        "from transformers import AutoModelForCausalLM\n"
+        "model = AutoModelForCausalLM.from_pretrained('gpt2')\n"
+        "class Function:\n"
+        "    def start(self, cfg):\n"
+        "        self.llm = AutoModelForCausalLM.from_pretrained('gpt2-large')\n"
+        "    async def handle(self, scope, receive, send):\n"
+        "        x = torch.zeros(8, 8)\n"
+        "{handle}"
+    )
+
+    def test_model_flops_charged_where_called(self, tmp_path):
+        result = analyze_source(tmp_path, self.MODEL_FUNCTION.format(handle="        model(x)\n"))
+        flops = int(TRANSFORMERS_MODELS["gpt2"].flops)
+        scopes = result["details"]["cost"]["scopes"]
+        assert scopes["startup"]["flops"] == 0
+        assert result["details"]["cost"]["functions"]["Function.handle"]["flops"] == flops
+        # the model bound to self.llm is never called and runs on requests
+        assert scopes["request"]["flops"] == flops + int(TRANSFORMERS_MODELS["gpt2-large"].flops)
+        assert result["execution_mode"] == "gpu_preferred"
+
+    def test_model_attribute_flops_charged_where_called(self, tmp_path):
+        result = analyze_source(tmp_path, self.MODEL_FUNCTION.format(
+            handle="        for i in range(3):\n            self.llm.generate(x)\n"))
+        flops = int(TRANSFORMERS_MODELS["gpt2-large"].flops)
+        assert result["details"]["cost"]["functions"]["Function.handle"]["flops"] == flops
+        assert result["details"]["cost"]["scopes"]["request"]["weighted_flops"] == \
+            flops * 10 + int(TRANSFORMERS_MODELS["gpt2"].flops)
+
+    def test_model_run_at_startup_stays_on_cpu(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import torch\n"
+            "from torchvision import models\n"
+            "class Function:\n"
+            "    def start(self, cfg):\n"
+            "        self.model = models.resnet18()\n"
+            "        self.model(torch.zeros(1, 3, 224, 224))\n"
+            "    async def handle(self, scope, receive, send):\n"
+            "        pass\n"
+        ))
+        flops = int(TORCHVISION_MODELS["resnet18"].flops)
+        assert flops >= DEFAULT_THRESHOLDS.function_flops
+        assert result["details"]["cost"]["scopes"]["startup"]["flops"] == flops
+        assert result["execution_mode"] == "cpu_preferred"
+
+
+class TestHotPath:
+    FUNCTION = (
+        "import torch\n"
+        "def new():\n"
+        "    return Function()\n"
+        "def layer():\n"
+        "    return torch.nn.Linear(4096, 4096)\n"
+        "class Function:\n"
+        "    def start(self, cfg):\n"
+        "        self.weights = torch.randn(1024, 1024)\n"
+        "{start}"
+        "    async def handle(self, scope, receive, send):\n"
+        "        x = torch.zeros(8, 8)\n"
+        "{handle}"
+    )
+
+    def analyze(self, tmp_path, start="", handle=""):
+        return analyze_source(tmp_path, self.FUNCTION.format(start=start, handle=handle))
+
+    def test_startup_work_stays_on_cpu(self, tmp_path):
+        result = self.analyze(tmp_path, start="        self.layer = layer()\n")
+        assert result["execution_mode"] == "cpu_preferred"
+        assert "all in startup code" in result["reason"]
+        scopes = result["details"]["cost"]["scopes"]
+        assert scopes["startup"]["functions"] == ["Function.start", "layer"]
+        assert scopes["request"]["functions"] == ["Function.handle"]
+        assert result["details"]["cost"]["request_path"] == ["Function.handle"]
+
+    def test_request_loop_prefers_gpu(self, tmp_path):
+        result = self.analyze(tmp_path, handle=(
+            "        for i in range(10):\n"
+            "            self.step()\n"
+            "    def step(self):\n"
+            "        return layer()\n"
+        ))
+        assert result["execution_mode"] == "gpu_preferred"
+        assert "in layer (request code)" in result["reason"]
+        assert result["details"]["cost"]["request_path"] == ["Function.handle", "Function.step", "layer"]
+        request = result["details"]["cost"]["scopes"]["request"]
+        assert request["weighted_flops"] == request["flops"] * 10
+
+    def test_request_without_loop(self, tmp_path):
+        result = self.analyze(tmp_path, handle="        self.layer = layer()\n")
+        assert result["execution_mode"] == "cpu_preferred"
+        assert result["details"]["cost"]["scopes"]["request"]["weighted_flops"] == 2 * 4096 * 4096
+
+    def test_inline_loop(self, tmp_path):
+        result = self.analyze(tmp_path, handle="        while True: torch.nn.Linear(4096, 4096)\n")
+        assert result["execution_mode"] == "gpu_preferred"
+
+
+class TestBlockingLint:
+    FUNCTION = (
+        "import asyncio\n"
+        "import time\n"
+        "import requests\n"
+        "import torch\n"
+        "class Function:\n"
+        "    async def handle(self, scope, receive, send):\n"
+        "{handle}"
+        "        await send({{}})\n"
+        "    def start(self, cfg):\n"
+        "        self.model = torch.hub.load('pytorch/vision', 'resnet50')\n"
+    )
+
+    def lint(self, tmp_path, handle):
+        result = analyze_source(tmp_path, self.FUNCTION.format(handle=handle))
+        return [tuple(finding) for finding in result["details"]["blocking_calls"]]
+
+    def test_blocking_calls(self, tmp_path):
+        assert self.lint(tmp_path, (
+            "        time.sleep(1)\n"
+            "        body = requests.get('http://example.com', timeout=5)\n"
+            "        with open('/tmp/data') as f:\n"
+            "            f.read()\n"
+        )) == [("time.sleep", 7, "sleep"), ("requests.get", 8, "network"), ("open", 9, "file")]
+
+    def test_heavy_compute(self, tmp_path):
+        assert self.lint(tmp_path, (
+            "        a = torch.randn(1024, 1024)\n"
+            "        b = a @ a\n"
+            "        c = torch.zeros(8, 8) @ torch.zeros(8, 8)\n"
+        )) == [("@", 8, "compute")]
+
+    def test_model_attribute_inference(self, tmp_path):
+        # the model is assigned in start(), below the handler
+        assert self.lint(tmp_path, "        out = self.model(torch.zeros(1, 3, 224, 224))\n") == [
+            ("self.model", 7, "inference")]
+
+    def test_executor_and_await_are_not_blocking(self, tmp_path):
+        assert self.lint(tmp_path, (
+            "        loop = asyncio.get_running_loop()\n"
+            "        await loop.run_in_executor(None, lambda: time.sleep(1))\n"
+            "        await asyncio.to_thread(time.sleep, 1)\n"
+            "        await asyncio.sleep(1)\n"
+        )) == []
+
+    def test_handler_without_gpu_imports(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import time\n"
+            "import requests\n"
+            "async def handle(scope, receive, send):\n"
+            "    time.sleep(1)\n"
+            "    requests.get('http://example.com', timeout=5)\n"
+        ))
+        assert result["execution_mode"] == "cpu"
+        assert [tuple(finding) for finding in result["details"]["blocking_calls"]] == [
+            ("time.sleep", 4, "sleep"), ("requests.get", 5, "network")]
+
+    def test_sync_handler_is_not_linted(self, tmp_path):
+        test_file = tmp_path / "func.py"
+        test_file.write_text("import time\ndef handle(context):\n    time.sleep(1)\n")
+        assert analyze_file(str(test_file))["details"]["blocking_calls"] == []
+
+    def test_fail_on_blocking(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv("FUNC_ANALYSIS_CACHE_DIR", str(tmp_path / "cache"))
+        function_dir = tmp_path / "function"
+        function_dir.mkdir()
+        (function_dir / "func.py").write_text(self.FUNCTION.format(handle="        time.sleep(1)\n"))
+        assert classifier.main([str(function_dir)]) == 0
+        assert classifier.main([str(function_dir), "--fail-on-blocking"]) == 1
+        assert "blocking_calls=1" in capsys.readouterr().err
+
+
+class TestRequestInit:
+    FUNCTION = (
+        "import re\n"
+        "import requests\n"
+        "import torch\n"
+        "from transformers import AutoModel, AutoTokenizer\n"
+        "class Function:\n"
+        "    def start(self, cfg):\n"
+        "        self.session = requests.Session()\n"
+        "    async def handle(self, scope, receive, send):\n"
+        "{handle}"
+        "        await send({{}})\n"
+    )
+
+    def analyze(self, tmp_path, handle):
+        return analyze_source(tmp_path, self.FUNCTION.format(handle=handle))["details"]
+
+    def test_loads_on_request_path(self, tmp_path):
+        details = self.analyze(tmp_path, (
+            "        tokenizer = AutoTokenizer.from_pretrained('bert-base-uncased')\n"
+            "        weights = torch.load('weights.pt')\n"
+            "        session = requests.Session()\n"
+            "        pattern = re.compile('[a-z]+')\n"
+        ))
+        assert [tuple(call[:5]) for call in details["request_init_calls"]] == [
+            ("transformers.AutoTokenizer.from_pretrained", 9, "tokenizer_load", "Function.handle", "Function.start"),
+            ("torch.load", 10, "model_load", "Function.handle", "Function.start"),
+            ("requests.Session", 11, "client", "Function.handle", "Function.start"),
+            ("re.compile", 12, "regex", "Function.handle", "module level"),
+        ]
+        assert details["request_init_latency_ms"] == 100 + 1000 + 50 + 0.1
+
+    def test_known_model_latency_from_weights(self, tmp_path):
+        details = self.analyze(tmp_path, "        model = AutoModel.from_pretrained('gpt2')\n")
+        [call] = details["request_init_calls"]
+        assert call[5] == round(TRANSFORMERS_MODELS["gpt2"].params * 4 / (500 * 1024 * 1024) * 1000, 3)
+
+    def test_loop_multiplies_latency(self, tmp_path):
+        details = self.analyze(tmp_path, "        for i in range(3):\n            requests.Session()\n")
+        assert details["request_init_latency_ms"] == 500
+
+    def test_startup_and_dynamic_calls_are_fine(self, tmp_path):
+        details = self.analyze(tmp_path, (
+            "        pattern = re.compile(scope['path'])\n"
+            "        with open('/tmp/out', 'w') as f:\n"
+            "            f.write('done')\n"
+        ))
+        assert details["request_init_calls"] == []
+        assert details["request_init_latency_ms"] == 0
+
+    def test_handler_without_gpu_imports(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import re\n"
+            "import requests\n"
+            "def handle(context):\n"
+            "    pattern = re.compile('[a-z]+')\n"
+            "    session = requests.Session()\n"
+            "    with open('/etc/config.json') as f:\n"
+            "        return f.read()\n"
+        ))
+        assert [tuple(call[:3]) for call in result["details"]["request_init_calls"]] == [
+            ("re.compile", 4, "regex"), ("requests.Session", 5, "client"), ("open", 6, "file")]
+
+    def test_tokenizer_is_not_a_model(self):
+        node = ast.parse("AutoTokenizer.from_pretrained('bert-base-uncased')").body[0].value
+        assert find_model(node, "AutoTokenizer.from_pretrained", lambda n: n.value) is None
+
+
+class TestArrayWorkloads:
+    def test_large_numpy_arrays(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import numpy as np\n"
+            "N = 2000\n"
+            "a = np.random.rand(N, N)\n"
+            "b = np.zeros((N, N), dtype=np.float32)\n"
+            "c = np.ones(10)\n"
+        ))
+        assert result["execution_mode"] == "cpu_preferred"
+        assert "GPU-acceleratable with CuPy" in result["reason"]
+        assert result["details"]["array_calls"] == [
+            ("numpy", "np.random.rand", 2000 * 2000 * 8, 3),
+            ("numpy", "np.zeros", 2000 * 2000 * 4, 4),
+            ("numpy", "np.ones", 80, 5),
+        ]
+        assert result["details"]["gpu_acceleration_hints"] == ["GPU-acceleratable with CuPy (numpy)"]
+
+    def test_costly_array_ops_stay_off_the_torch_cost(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import numpy\n"
+            "import torch\n"
+            "a = numpy.random.randn(1000, 1000)\n"
+            "b = a @ a\n"
+            "c = numpy.dot(a, b)\n"
+        ))
+        assert result["execution_mode"] == "cpu_preferred"
+        assert result["details"]["array_ops"] == [
+            ("@", 2 * 1000 ** 3, 4, "numpy"), ("np.dot", 2 * 1000 ** 3, 5, "numpy")]
+        assert result["details"]["cost"]["ops"] == []
+
+    def test_pandas_frames(self, tmp_path):
+        result = analyze_source(tmp_path, (
+            "import numpy as np\n"
+            "import pandas as pd\n"
+            "df = pd.DataFrame({'x': np.arange(500000), 'y': np.random.normal(0, 1, size=500000)})\n"
+            "data = pd.read_csv('data.csv', nrows=10, usecols=['a', 'b'])\n"
+            "other = pd.read_csv('other.csv')\n"
+        ))
+        calls = [call for call in result["details"]["array_calls"] if call[0] == "pandas"]
+        assert calls == [("pandas", "pd.DataFrame", 500000 * 2 * 8, 3), ("pandas", "pd.read_csv", 10 * 2 * 8, 4)]
+        # the columns alone are below the threshold, the frame holding both is not
+        assert result["details"]["gpu_acceleration_hints"] == ["GPU-acceleratable with cuDF (pandas)"]
+
+    def test_sklearn_estimator_hint(self, tmp_path):
+        result = analyze_source(tmp_path, "from sklearn.cluster import KMeans\nmodel = KMeans(n_clusters=8)\n")
+        assert result["execution_mode"] == "cpu"
+        assert result["details"]["gpu_acceleration_hints"] == ["GPU-acceleratable with cuML (sklearn)"]
+
+    def test_gpu_only_libraries(self, tmp_path):
+        result = analyze_source(tmp_path, "import cupy as cp\nx = cp.zeros(10)\n")
+        assert result["execution_mode"] == "gpu"
+        assert "cupy" in result["reason"]
+
+
+class TestImportAliases:
+    @pytest.mark.parametrize("source,call", [
+        ("import torch as t\nx = t.randn(100, 100)\n", "torch.randn"),
+        ("from torch import randn\nx = randn(100, 100)\n", "torch.randn"),
+        ("from torch import randn as rn\nx = rn(100, 100)\n", "torch.randn"),
+        ("import tensorflow as tensorflow_lib\nx = tensorflow_lib.zeros([100, 100])\n", "tf.zeros"),
+        ("import tensorflow\nx = tensorflow.random.normal([100, 100])\n", "tf.random.normal"),
+    ])
+    def test_aliased_tensor_ops(self, tmp_path, source, call):
+        result = analyze_source(tmp_path, source)
+        assert result["execution_mode"] == "gpu_preferred"
+        assert [big_call[1] for big_call in result["details"]["big_calls"]] == [call]
+
+    def test_aliased_device(self, tmp_path):
+        result = analyze_source(tmp_path, "from torch import device\ndev = device('cuda')\n")
+        assert result["execution_mode"] == "gpu"
+        assert result["details"]["explicit_gpu_calls"] == ["torch.device"]
+
+    def test_submodule_imports(self, tmp_path):
+        result = analyze_source(tmp_path, "import torch.nn as nn\nimport torchvision\nfrom torch.nn import functional\n")
+        assert result["details"]["imports"] == ["torch", "torchvision"]
+
+    def test_relative_imports_are_local(self):
+        table = ImportTable()
+        table.add(ast.parse("from .torch import zeros").body[0])
+        table.add(ast.parse("from torch.nn import functional as F").body[0])
+        assert table.resolve("zeros") == "zeros"
+        assert table.resolve("F.linear") == "torch.nn.functional.linear"
+
+
+class TestLargeFileScanner:
+    @pytest.mark.parametrize("test_file", sorted(
+        [os.path.join(CPU_TESTDATA_DIR, name) for name in os.listdir(CPU_TESTDATA_DIR)]
+        + [os.path.join(GPU_TESTDATA_DIR, name) for name in os.listdir(GPU_TESTDATA_DIR)]
+    ))
+    def test_same_result_as_ast(self, test_file):
+        assert analyze_file(test_file, large_file_size=0) == analyze_file(test_file)
+
+    def test_huge_literal(self, tmp_path):
+        test_file = tmp_path / "weights.py"
+        weights = ", ".join(str(i) for i in range(200000))
+        test_file.write_text(
+            "import torch as t\n"
+            "from .. import helpers\n"
+            f"WEIGHTS = torch.tensor([{weights}])  # embedded weights\n"
+            "model = helpers.load(torch.zeros(2, 2), WEIGHTS)\n"
+            "model.to('cuda')\n"
+        )
+        result = analyze_file(str(test_file), large_file_size=1024)
+        assert result == analyze_file(str(test_file))
+        assert result["execution_mode"] == "gpu"
+        assert result["details"]["big_calls"] == [("pytorch", "torch.tensor", "≥1000", 3)]
+        # the cut off literal is not charged as if it had exactly 1000 elements
+        assert result["details"]["cost"]["functions"]["<module>"]["bytes"] == 2 * 2 * 4
+
+
 class TestTensorFlowTensorSizeEstimation:
     @pytest.mark.parametrize("code,expected", [
         ("torch.zeros(3, 4)", 12),
@@ -95,6 +795,18 @@ class TestTensorFlowTensorSizeEstimation:
         node = ast.parse(code).body[0].value
         assert estimate_pytorch_tensor_size(node) == expected
 
+    @pytest.mark.parametrize("code,limit,expected,capped", [
+        ("torch.tensor([1, 2, 3])", 1000, 3, False),
+        ("torch.tensor([1, 2, 3])", 3, 3, False),
+        ("torch.tensor(" + str([[i for i in range(100)] for _ in range(100)]) + ")", 1000, 1000, True),
+        ("torch.zeros(3, 4)", 10, 12, False),
+    ])
+    def test_estimate_pytorch_tensor_size_with_limit(self, code, limit, expected, capped):
+        node = ast.parse(code).body[0].value
+        size = estimate_pytorch_tensor_size(node, limit)
+        assert size == expected
+        assert isinstance(size, AtLeast) == capped
+
     @pytest.mark.parametrize("code,expected", [
         ("tf.zeros([3, 4])", 12),
         ("tf.zeros((2, 5))", 10),
@@ -109,4 +821,249 @@ class TestTensorFlowTensorSizeEstimation:
     ])
     def test_estimate_tensorflow_tensor_size(self, code, expected):
         node = ast.parse(code).body[0].value
-        assert estimate_tensorflow_tensor_size(node) == expected
\ No newline at end of file
+        assert estimate_tensorflow_tensor_size(node) == expected
+
+    @pytest.mark.parametrize("code,limit,expected,capped", [
+        ("tf.constant(" + str([[i for i in range(100)] for _ in range(100)]) + ")", 500, 500, True),
+        ("tf.constant([[1, 2], [3, 4]])", 4, 4, False),
+        ("tf.constant([[1, 2], [3, 4]])", 3, 3, True),
+    ])
+    def test_estimate_tensorflow_tensor_size_with_limit(self, code, limit, expected, capped):
+        node = ast.parse(code).body[0].value
+        size = estimate_tensorflow_tensor_size(node, limit)
+        assert size == expected
+        assert isinstance(size, AtLeast) == capped
+
+    def test_count_elements_deeply_nested(self):
+        node = ast.List(elts=[ast.Constant(1)], ctx=ast.Load())
+        for _ in range(10000):
+            node = ast.List(elts=[node, ast.Constant(1)], ctx=ast.Load())
+        assert count_elements(node) == 10001
+        assert not isinstance(count_elements(node), AtLeast)
+        assert count_elements(node, 100) == 100
+        assert isinstance(count_elements(node, 100), AtLeast)
+
+
+class TestDirectoryAnalysis:
+    @pytest.fixture
+    def function_dir(self, tmp_path):
+        shutil.copytree(CPU_TESTDATA_DIR, tmp_path / "cpu")
+        shutil.copytree(GPU_TESTDATA_DIR, tmp_path / "gpu")
+        return str(tmp_path)
+
+    def test_parallel_matches_serial(self, function_dir):
+        serial = analyze_directory_for_gpu_code(function_dir, workers=1)
+        parallel = analyze_directory_for_gpu_code(function_dir, workers=3, chunksize=2)
+        assert len(serial) == 10
+        assert json.dumps(parallel, indent=4) == json.dumps(serial, indent=4)
+
+    def test_same_file_name_in_two_packages(self, tmp_path):
+        for package, source in (("a", "import torch\nx = torch.zeros(2)\n"), ("b", "import math\n")):
+            (tmp_path / package).mkdir()
+            (tmp_path / package / "util.py").write_text(source)
+        results = analyze_directory_for_gpu_code(str(tmp_path), all_files=True)
+        assert results[os.path.join("a", "util.py")]["details"]["imports"] == ["torch"]
+        assert results[os.path.join("b", "util.py")]["details"]["imports"] == []
+
+    def test_cache_reuses_unchanged_files(self, function_dir, tmp_path):
+        cache_dir = str(tmp_path / "cache")
+        uncached = analyze_directory_for_gpu_code(function_dir)
+
+        stats = {}
+        first = analyze_directory_for_gpu_code(function_dir, cache=AnalysisCache(cache_dir), stats=stats)
+        assert stats["cache_hits"] == 0 and stats["cache_misses"] == 10
+        assert stats["prefiltered"] == 1
+
+        with open(os.path.join(function_dir, "cpu", "cpu.py"), "a") as f:
+            f.write("\nimport torch\n")
+        stats = {}
+        second = analyze_directory_for_gpu_code(function_dir, cache=AnalysisCache(cache_dir), stats=stats)
+        assert stats["cache_hits"] == 9 and stats["cache_misses"] == 1
+        assert json.dumps(first) == json.dumps(uncached)
+        assert second[os.path.join("cpu", "cpu.py")]["execution_mode"] == "cpu_preferred"
+
+    def test_cache_eviction(self, function_dir, tmp_path):
+        cache_dir = str(tmp_path / "cache")
+        analyze_directory_for_gpu_code(function_dir, cache=AnalysisCache(cache_dir, max_bytes=2048))
+        total = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
+        assert 0 < total <= 2048
+
+    def test_synthetic_corpus(self, tmp_path):
+        expected_files = generate_project(str(tmp_path), small_files=20, giant_files=1, giant_functions=10,
+                                          deep_chain_files=1, literal_files=1, literal_elements=5000,
+                                          vendored_files=5)
+        stats = {}
+        results = analyze_directory_for_gpu_code(str(tmp_path), stats=stats)
+        assert len(results) == expected_files
+        assert results[os.path.join("function", "tables", "table_0.py")]["execution_mode"] == "gpu_preferred"
+        assert stats["unreachable"] == [os.path.join("scripts", "export_0.py"), os.path.join("scripts", "export_1.py")]
+        assert len(analyze_directory_for_gpu_code(str(tmp_path), all_files=True)) == expected_files + 2
+
+    def test_ndjson_stream_matches_json(self, function_dir):
+        out = io.StringIO()
+        stream_directory_analysis(out, function_dir, workers=2)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        summary = records.pop()["summary"]
+        assert {record["file"]: record["result"] for record in records} == \
+               json.loads(json.dumps(analyze_directory_for_gpu_code(function_dir)))
+        assert summary["execution_mode"] == "gpu"
+        assert summary["files"] == 10
+
+
+class TestImportGraph:
+    def write(self, root, files):
+        for name, source in files.items():
+            path = root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(source)
+        return sorted(str(root / name) for name in files)
+
+    def reachable(self, root, files):
+        reachable, unreachable = reachable_files(str(root), self.write(root, files))
+        return sorted(os.path.relpath(path, root) for path in reachable), \
+            sorted(os.path.relpath(path, root) for path in unreachable)
+
+    def test_only_imported_modules(self, tmp_path):
+        reachable, unreachable = self.reachable(tmp_path, {
+            "function/__init__.py": "from .func import new\n",
+            "function/func.py": "from . import helpers\nfrom function.models import net\n",
+            "function/helpers.py": "def lazy():\n    import function.lazy\n",
+            "function/lazy.py": "",
+            "function/models/__init__.py": "",
+            "function/models/net.py": "from ..helpers import lazy\n",
+            "function/unused.py": "import torch\n",
+            "train.py": "import torch\nfrom function import func\n",
+        })
+        assert reachable == ["function/__init__.py", "function/func.py", "function/helpers.py",
+                             "function/lazy.py", "function/models/__init__.py", "function/models/net.py"]
+        assert unreachable == ["function/unused.py", "train.py"]
+
+    def test_dynamic_import(self, tmp_path):
+        reachable, _ = self.reachable(tmp_path, {
+            "function/__init__.py": "import importlib\nnew = importlib.import_module('function.impl').new\n",
+            "function/impl.py": "def new():\n    pass\n",
+        })
+        assert reachable == ["function/__init__.py", "function/impl.py"]
+
+    def test_continued_and_unparsable_imports(self, tmp_path):
+        reachable, unreachable = self.reachable(tmp_path, {
+            "function/__init__.py": "from .func import new\n",
+            "function/func.py": (
+                "from .helpers import a, \\\n    b\n"
+                "from .models import (net,  # see setup()\n    other)\n"
+            ),
+            "function/helpers.py": "import torch\na = b = torch.zeros(1000, 1000)\n",
+            "function/models.py": "",
+        })
+        assert reachable == ["function/__init__.py", "function/func.py", "function/helpers.py",
+                             "function/models.py"]
+        assert unreachable == []
+
+    def test_without_entry_point_everything_is_reachable(self, tmp_path):
+        reachable, unreachable = self.reachable(tmp_path, {"main.py": "", "function/__init__.py": "x = 1\n"})
+        assert reachable == ["function/__init__.py", "main.py"]
+        assert unreachable == []
+
+
+class TestServer:
+    def test_stdio_requests(self):
+        gpu_file = os.path.join(GPU_TESTDATA_DIR, "gpu.py")
+        stdin = io.StringIO(
+            json.dumps({"id": 1, "files": [gpu_file]}) + "\n"
+            + json.dumps({"id": 2, "directory": CPU_TESTDATA_DIR}) + "\n"
+            + "{}\n"
+        )
+        stdout = io.StringIO()
+        serve_stdio(handle_request, idle_timeout=5, stdin=stdin, stdout=stdout)
+        first, second, third = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        assert first["id"] == 1
+        assert first["results"][gpu_file]["execution_mode"] == "gpu"
+        assert second["id"] == 2
+        assert second["results"] == json.loads(json.dumps(analyze_directory_for_gpu_code(CPU_TESTDATA_DIR)))
+        assert "error" in third
+
+    def test_cache_across_requests(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("FUNC_ANALYSIS_THRESHOLDS", str(tmp_path / "thresholds.json"))
+        gpu_file = os.path.join(GPU_TESTDATA_DIR, "gpu.py")
+        cache = AnalysisCache(str(tmp_path / "cache"))
+        stats = [handle_request({"files": [gpu_file]}, cache=cache)["stats"] for _ in range(3)]
+        assert [(s["cache_hits"], s["cache_misses"]) for s in stats] == [(0, 1), (1, 0), (1, 0)]
+
+        # recalibrating while serving invalidates the cached results
+        (tmp_path / "thresholds.json").write_text(json.dumps(
+            {"version": 2, "tensor_bytes_pytorch": 1, "tensor_bytes_tensorflow": 1, "function_flops": 1}))
+        response = handle_request({"files": [gpu_file]}, cache=cache)
+        assert (response["stats"]["cache_hits"], response["stats"]["cache_misses"]) == (0, 1)
+
+    def test_stdio_idle_timeout(self):
+        read_end, write_end = os.pipe()
+        with os.fdopen(read_end) as stdin:
+            stdout = io.StringIO()
+            serve_stdio(handle_request, idle_timeout=0.1, stdin=stdin, stdout=stdout)
+            os.close(write_end)  # lets the reader thread finish
+        assert stdout.getvalue() == ""
+
+    @pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="unix sockets not supported")
+    def test_unix_socket(self, tmp_path):
+        path = str(tmp_path / "classifier.sock")
+        server = threading.Thread(target=serve_unix_socket, args=(path, handle_request, 0.5))
+        server.start()
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            threading.Event().wait(0.01)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            with client.makefile("rw") as stream:
+                stream.write(json.dumps({"files": [os.path.join(GPU_TESTDATA_DIR, "gpu_1.py")]}) + "\n")
+                stream.flush()
+                response = json.loads(stream.readline())
+        assert list(response["results"].values())[0]["execution_mode"] == "gpu"
+
+        server.join(timeout=5)
+        assert not server.is_alive()
+        assert not os.path.exists(path)
+
+
+class TestDirectoryWalker:
+    def write(self, root, relative, content="import os\n"):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    def found(self, root, **kwargs):
+        return [os.path.relpath(path, root).replace(os.sep, "/") for path in walk_python_files(str(root), **kwargs)]
+
+    def test_prunes_environments_and_tests(self, tmp_path):
+        for relative in ["func.py", "latest.py", "pkg/contest_utils.py",
+                         ".git/hooks/hook.py", "__pycache__/func.py", "node_modules/x/y.py",
+                         ".tox/py3/lib.py", "build/lib/func.py", "dist/func.py",
+                         "lib/python3.11/site-packages/torch/__init__.py",
+                         "myenv/lib/mod.py", "tests/test_func.py", "test_func.py", "func_test.py"]:
+            self.write(tmp_path, relative)
+        self.write(tmp_path, "myenv/pyvenv.cfg", "home = /usr/bin\n")
+        stats = {}
+        assert self.found(tmp_path, stats=stats) == ["func.py", "latest.py", "pkg/contest_utils.py"]
+        assert stats["pruned_dirs"] == 9
+
+    def test_honors_ignore_files(self, tmp_path):
+        for relative in ["func.py", "generated/a.py", "model.gen.py", "keep.gen.py",
+                         "scripts/tool.py", "pkg/scripts/helper.py", "pkg/local.py", "pkg/other.py"]:
+            self.write(tmp_path, relative)
+        self.write(tmp_path, ".gitignore", "# generated code\ngenerated/\n*.gen.py\n!keep.gen.py\n")
+        self.write(tmp_path, ".funcignore", "/scripts\n")
+        self.write(tmp_path, "pkg/.gitignore", "local.py\n")
+        assert self.found(tmp_path) == ["func.py", "keep.gen.py", "pkg/other.py", "pkg/scripts/helper.py"]
+
+    def test_anchored_directory(self, tmp_path):
+        for relative in ["func.py", "scripts/tool.py", "pkg/scripts/helper.py", "build_tools/x.py",
+                         "pkg/build_tools/y.py"]:
+            self.write(tmp_path, relative)
+        self.write(tmp_path, ".funcignore", "/scripts/\nbuild_tools/\n")
+        assert self.found(tmp_path) == ["func.py", "pkg/scripts/helper.py"]
+
+    def test_max_file_size(self, tmp_path):
+        self.write(tmp_path, "small.py")
+        self.write(tmp_path, "large.py", "x = 1\n" * 1000)
+        assert self.found(tmp_path, max_file_size=1024) == ["small.py"]
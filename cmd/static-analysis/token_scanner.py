@@ -0,0 +1,315 @@
+import ast
+import keyword
+import tokenize
+
+from constants import REQUEST_HANDLERS, PYTORCH_TENSOR_OPS, TENSORFLOW_TENSOR_OPS, TENSOR_BYTES_THRESHOLD_PYTORCH, \
+    TENSOR_BYTES_THRESHOLD_TENSORFLOW, NUMPY_ARRAY_OPS, PANDAS_FRAME_OPS, CUML_ESTIMATORS
+from model_zoo import MODEL_CALL_NAMES, INFERENCE_METHODS
+from request_init import INIT_CALL_NAMES
+from tensor_estimation import COST_OP_NAMES
+
+# Only calls ending in one of these names can influence the verdict, all other
+# calls are not captured at all.
+RELEVANT_CALL_NAMES = {'device', 'to', 'cuda'} | COST_OP_NAMES | MODEL_CALL_NAMES | INFERENCE_METHODS | \
+    INIT_CALL_NAMES | CUML_ESTIMATORS | {
+        op.rsplit('.', 1)[-1] for op in PYTORCH_TENSOR_OPS | TENSORFLOW_TENSOR_OPS | NUMPY_ARRAY_OPS | PANDAS_FRAME_OPS}
+# Arguments of a call are kept as tokens up to this many, beyond that only
+# literal elements are counted, enough for the smallest dtype to reach the
+# byte thresholds.
+MAX_CAPTURED_TOKENS = 4096
+DEFAULT_MAX_COUNTED_LITERALS = max(TENSOR_BYTES_THRESHOLD_PYTORCH, TENSOR_BYTES_THRESHOLD_TENSORFLOW)
+
+# Assigned values are kept up to this many tokens, longer values are unknown.
+MAX_ASSIGNMENT_TOKENS = 256
+AUGMENTED_ASSIGNMENTS = {'+=', '-=', '*=', '//=', '%=', '**=', '<<='}
+
+# Async handlers are kept as source up to this many lines to be linted
+MAX_HANDLER_LINES = 10000
+
+STATEMENT_START = {tokenize.ENCODING, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT}
+IGNORED_TOKENS = {tokenize.COMMENT, tokenize.NL}
+LITERAL_NAMES = {'True', 'False', 'None'}
+
+
+class CallCapture:
+    def __init__(self, func_source, lineno, depth, max_literals):
+        self.func_source = func_source
+        self.lineno = lineno
+        self.depth = depth
+        self.max_literals = max_literals
+        self.tokens = []
+        self.overflow = False
+        self.literals = 0
+
+    def add(self, tok):
+        if not self.overflow:
+            self.tokens.append((tok.type, tok.string))
+            if len(self.tokens) > MAX_CAPTURED_TOKENS:
+                self.literals = sum(1 for t in self.tokens if is_literal(t[0], t[1]))
+                self.tokens = None
+                self.overflow = True
+        elif self.literals <= self.max_literals and is_literal(tok.type, tok.string):
+            self.literals += 1
+
+    def to_call(self):
+        """Build a small ast.Call equivalent to the captured call.
+
+        Arguments too large to keep are replaced by a list literal with as
+        many elements as were counted, which is all the size estimators need.
+        """
+        if self.overflow:
+            source = f"{self.func_source}([{', '.join(['0'] * self.literals)}])"
+        else:
+            source = self.func_source + "(" + tokenize.untokenize(self.tokens) + ")"
+        try:
+            tree = ast.parse(source.strip(), mode='eval')
+        except SyntaxError:
+            return None
+        ast.increment_lineno(tree, self.lineno - 1)
+        return tree.body
+
+
+def assigned_value(name, operator, tokens, lineno=1):
+    """Parse the value of `name = value` or `name += value` on line lineno
+    into an ast node."""
+    if not tokens:
+        return None
+    source = tokenize.untokenize(tokens).strip()
+    if operator != '=':
+        source = f"{name} {operator[:-1]} ({source})"
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError:
+        return None
+    ast.increment_lineno(tree, lineno - 1)
+    return tree.body
+
+
+def parse_handler(lines, first_row, col):
+    """Parse the source lines of an async handler starting at first_row,
+    indented by col, into an ast.AsyncFunctionDef with the file's lines."""
+    source = "".join(lines)
+    if col > 0:
+        source = "if True:\n" + source
+        first_row -= 1
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+    ast.increment_lineno(tree, first_row - 1)
+    node = tree.body[0]
+    return node.body[0] if col > 0 else node
+
+
+def parse_import(tokens, lineno):
+    """Parse the tokens of an import statement on line lineno into an
+    ast.Import or ast.ImportFrom."""
+    try:
+        tree = ast.parse(tokenize.untokenize(tokens).strip())
+    except SyntaxError:
+        return None
+    ast.increment_lineno(tree, lineno - 1)
+    return tree.body[0] if tree.body else None
+
+
+def is_literal(token_type, string):
+    return token_type in (tokenize.NUMBER, tokenize.STRING) or string in LITERAL_NAMES
+
+
+def scan_file(filename, max_literals=DEFAULT_MAX_COUNTED_LITERALS):
+    """Scan a python file token by token without building its syntax tree.
+
+    Yields ("import", node) for every import statement and ("call", node)
+    for every call which may be GPU related, where node is an ast.Call with
+    the call's arguments but without any nested calls.  For constant
+    propagation it also yields ("assign", name, value node or None) for
+    simple `name = value` statements and ("enter", "function"|"class", name)
+    / ("exit",) around function and class bodies, binding the parameters of
+    a function as unknown.  For hot path weighting ("enter", "loop", None) /
+    ("exit",) surround the bodies of for and while loops, and ("ref", name,
+    is_method) is yielded for every call of a plain name or of self.name.
+    The body of an async handle() is yielded as ("handler", node) before
+    its exit, to be linted for blocking calls.
+    Memory use is bounded by the nesting depth of
+    calls, not by the size of the file.  Literals of calls too large to keep
+    are counted up to one more than max_literals, the largest tensor byte
+    threshold, so a literal cut off there is still seen as too large.
+    """
+    chain = []  # dotted name right before the current token
+    chain_rooted = False  # chain starts with a plain name, not an expression
+    captures = []
+    depth = 0
+    import_tokens = None  # the tokens of the import statement being read
+    import_row = 0
+    relevant_names = set(RELEVANT_CALL_NAMES)
+    prev = None
+    stmt_pos = 0
+    stmt_head = []  # the first tokens of the statement, to spot self.name = ...
+    indent = 0
+    scope_indents = []
+    pending_scope = None
+    pending_name = None
+    scope_depth = 0
+    params = []
+    pending_loop = None  # "header" until the colon of a loop, then "body"
+    loop_depth = 0
+    inline_loop = False
+    assignment = None  # (name, operator, tokens, lineno) of the statement being read
+    handler_lines = None  # source lines of the async def being read
+    handler_row = handler_first_row = handler_col = 0
+    handler_indent = None  # indent of the handler's body once it is entered
+
+    with open(filename, 'rb') as f:
+        for tok in tokenize.tokenize(f.readline):
+            if handler_lines is not None and tok.end[0] > handler_row:
+                if tok.start[0] > handler_row:
+                    handler_lines.extend(["\n"] * (tok.start[0] - handler_row - 1))
+                    handler_lines.extend(tok.line.splitlines(keepends=True) or [""])
+                else:
+                    # the rest of a multi line string starting on a captured line
+                    handler_lines.extend(tok.line.splitlines(keepends=True)[handler_row - tok.start[0] + 1:])
+                handler_row = tok.end[0]
+                if len(handler_lines) > MAX_HANDLER_LINES:
+                    handler_lines, handler_indent = None, None
+
+            if tok.type in IGNORED_TOKENS:
+                continue
+
+            for capture in captures:
+                capture.add(tok)
+
+            statement_start = prev is None or prev.type in STATEMENT_START or prev.string == ';'
+            stmt_pos = 0 if statement_start else stmt_pos + 1
+            if statement_start:
+                stmt_head = [tok.string]
+            elif stmt_pos < 3:
+                stmt_head.append(tok.string)
+
+            # Function and class scopes
+            if tok.type == tokenize.NAME and tok.string in ('def', 'class') and (
+                    statement_start or prev.string == 'async'):
+                pending_scope = 'function' if tok.string == 'def' else 'class'
+                scope_depth, params, pending_name = depth, [], None
+                if tok.string == 'def' and prev is not None and prev.string == 'async' and handler_lines is None:
+                    handler_lines, handler_row = [tok.line], tok.start[0]
+                    handler_first_row, handler_col = prev.start[0], prev.start[1]
+            elif pending_scope is not None and pending_name is None and tok.type == tokenize.NAME:
+                pending_name = tok.string
+            elif pending_scope == 'function' and depth > scope_depth and tok.type == tokenize.NAME \
+                    and prev.string in ('(', ',', '*', '**'):
+                params.append(tok.string)
+            elif tok.type == tokenize.INDENT:
+                indent += 1
+                if pending_scope is not None and prev.type == tokenize.NEWLINE:
+                    yield "enter", pending_scope, pending_name
+                    for param in params:
+                        yield "assign", param, None
+                    scope_indents.append(indent)
+                    if handler_lines is not None and handler_indent is None:
+                        if pending_name in REQUEST_HANDLERS:
+                            handler_indent = indent
+                        else:
+                            handler_lines = None
+                elif pending_loop == 'body' and prev.type == tokenize.NEWLINE:
+                    yield "enter", "loop", None
+                    scope_indents.append(indent)
+                pending_scope = pending_loop = None
+            elif tok.type == tokenize.DEDENT:
+                if scope_indents and scope_indents[-1] == indent:
+                    scope_indents.pop()
+                    if handler_indent == indent:
+                        # the dedent is on the first line after the handler
+                        lines = handler_lines[:tok.start[0] - handler_first_row]
+                        node = parse_handler(lines, handler_first_row, handler_col)
+                        if node is not None:
+                            yield "handler", node
+                        handler_lines, handler_indent = None, None
+                    yield ("exit",)
+                indent -= 1
+            elif prev is not None and prev.type == tokenize.NEWLINE:
+                pending_scope = None  # a one line def or class
+                if handler_indent is None:
+                    handler_lines = None
+
+            # Loops
+            if inline_loop and tok.type == tokenize.NEWLINE:
+                inline_loop = False
+                yield ("exit",)
+            elif tok.type == tokenize.NAME and tok.string in ('for', 'while') and (
+                    statement_start or prev.string == 'async'):
+                pending_loop, loop_depth = 'header', depth
+            elif pending_loop == 'header' and tok.string == ':' and depth == loop_depth:
+                pending_loop = 'body'
+            elif pending_loop == 'body' and tok.type not in (tokenize.NEWLINE, tokenize.INDENT):
+                # the body follows the colon on the same line
+                pending_loop, inline_loop = None, True
+                yield "enter", "loop", None
+
+            # Assignments
+            if assignment is not None:
+                if depth == 0 and (tok.type in (tokenize.NEWLINE, tokenize.ENDMARKER) or tok.string == ';'):
+                    yield "assign", assignment[0], assigned_value(*assignment)
+                    assignment = None
+                elif assignment[2] is not None:
+                    assignment[2].append((tok.type, tok.string))
+                    if len(assignment[2]) > MAX_ASSIGNMENT_TOKENS:
+                        assignment = (assignment[0], assignment[1], None, assignment[3])
+            elif stmt_pos == 1 and depth == 0 and prev.type == tokenize.NAME and not keyword.iskeyword(prev.string) \
+                    and (tok.string == '=' or tok.string in AUGMENTED_ASSIGNMENTS):
+                assignment = (prev.string, tok.string, [], prev.start[0])
+            elif stmt_pos == 3 and depth == 0 and tok.string == '=' and stmt_head[:2] == ['self', '.'] \
+                    and prev.type == tokenize.NAME:
+                assignment = ("self." + prev.string, tok.string, [], prev.start[0])
+
+            # Imports
+            if import_tokens is not None:
+                if tok.type in (tokenize.NEWLINE, tokenize.ENDMARKER) or tok.string == ';':
+                    node = parse_import(import_tokens, import_row)
+                    if node is not None:
+                        yield "import", node
+                        # calls of an imported op under another name, e.g. rn() for randn
+                        relevant_names.update(alias.asname for alias in node.names
+                                              if alias.asname and alias.name.rpartition('.')[2] in relevant_names)
+                    import_tokens = None
+                elif len(import_tokens) < MAX_CAPTURED_TOKENS:
+                    import_tokens.append((tok.type, tok.string))
+            elif tok.type == tokenize.NAME and tok.string in ('import', 'from') and (
+                    prev is None or prev.type in STATEMENT_START or prev.string in (';', ':')):
+                import_tokens, import_row = [(tok.type, tok.string)], tok.start[0]
+
+            # Calls
+            if tok.type == tokenize.NAME and not keyword.iskeyword(tok.string):
+                if prev is not None and prev.string == '.' and (chain or not chain_rooted):
+                    chain.append(tok.string)
+                else:
+                    chain, chain_rooted = [tok.string], True
+            elif tok.string == '.' and tok.type == tokenize.OP:
+                if prev is None or prev.type != tokenize.NAME:
+                    # attribute of an expression such as model(x).to or x[0].cuda
+                    chain, chain_rooted = [], False
+            elif tok.string in ('(', '[', '{'):
+                if tok.string == '(' and chain_rooted and not (pending_scope is not None and depth == scope_depth):
+                    # calls of other functions of the file, but not `def f(`
+                    if len(chain) == 1:
+                        yield "ref", chain[0], False
+                    elif len(chain) == 2 and chain[0] == 'self':
+                        yield "ref", chain[1], True
+                if tok.string == '(' and chain and chain[-1] in relevant_names:
+                    func_source = ".".join(chain) if chain_rooted else "()." + ".".join(chain)
+                    captures.append(CallCapture(func_source, tok.start[0], depth, max_literals))
+                chain = []
+                depth += 1
+            elif tok.string in (')', ']', '}'):
+                depth -= 1
+                while captures and captures[-1].depth == depth:
+                    capture = captures.pop()
+                    if not capture.overflow:
+                        capture.tokens.pop()  # the closing parenthesis
+                    node = capture.to_call()
+                    if node is not None:
+                        yield "call", node
+                chain = []
+            else:
+                chain = []
+
+            prev = tok
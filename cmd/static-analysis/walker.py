@@ -0,0 +1,155 @@
+import os
+import re
+
+# Directories which never contain function code worth analyzing.
+PRUNED_DIRS = {
+    '.git', '.hg', '.svn', '__pycache__', 'site-packages', 'dist-packages',
+    'node_modules', '.tox', '.nox', '.venv', 'venv', '.eggs', 'build', 'dist',
+    '.mypy_cache', '.pytest_cache', '.ruff_cache', 'tests', 'test',
+}
+IGNORE_FILES = ('.gitignore', '.funcignore')
+# Marker file of a virtualenv, used to prune environments not named venv/.venv
+VENV_MARKER = 'pyvenv.cfg'
+
+# When running from source the analyzer must not classify itself.
+SELF_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def is_test_file(filename):
+    return filename.startswith('test_') or filename.endswith('_test.py') or filename == 'conftest.py'
+
+
+def walk_python_files(root, max_file_size=None, stats=None):
+    """Return the paths of all analyzable .py files below root, sorted.
+
+    Directories in PRUNED_DIRS, virtualenvs and paths matched by .gitignore or
+    .funcignore files are pruned from os.walk before it descends into them.
+    Files larger than max_file_size bytes are skipped.  If a `stats` dict is
+    passed, the number of pruned directories and skipped files is recorded.
+    """
+    root = os.path.abspath(root)
+    rules_by_dir = {root: load_ignore_rules(root, [])}
+    filepaths = []
+    pruned = 0
+    skipped = 0
+
+    for dirpath, dirs, files in os.walk(root):
+        rules = rules_by_dir.pop(dirpath)
+
+        kept = []
+        for dirname in sorted(dirs):
+            path = os.path.join(dirpath, dirname)
+            if (dirname in PRUNED_DIRS
+                    or os.path.isfile(os.path.join(path, VENV_MARKER))
+                    or is_ignored(rules, path, True)):
+                pruned += 1
+                continue
+            rules_by_dir[path] = load_ignore_rules(path, rules)
+            kept.append(dirname)
+        dirs[:] = kept
+
+        if dirpath == SELF_DIR:
+            continue
+
+        for filename in sorted(files):
+            if not filename.endswith('.py') or is_test_file(filename):
+                continue
+            path = os.path.join(dirpath, filename)
+            if is_ignored(rules, path, False):
+                skipped += 1
+                continue
+            if max_file_size is not None:
+                try:
+                    if os.path.getsize(path) > max_file_size:
+                        skipped += 1
+                        continue
+                except OSError:
+                    continue
+            filepaths.append(path)
+
+    if stats is not None:
+        stats["pruned_dirs"] = pruned
+        stats["skipped_files"] = skipped
+    return filepaths
+
+
+def load_ignore_rules(directory, inherited):
+    """Extend the inherited rules with the ignore files found in directory."""
+    rules = list(inherited)
+    for name in IGNORE_FILES:
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            continue
+        for line in lines:
+            rule = parse_ignore_line(directory, line)
+            if rule is not None:
+                rules.append(rule)
+    return rules
+
+
+def parse_ignore_line(base, line):
+    """Parse one gitignore style line into (base, regex, negated, dir_only)."""
+    line = line.rstrip()
+    if not line or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    elif line.startswith('\\'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    # A pattern without a leading or inner slash matches at any depth below base.
+    anchored = '/' in line
+    line = line.lstrip('/')
+    if not line:
+        return None
+    regex = translate_pattern(line)
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    return base, re.compile(regex + '$'), negated, dir_only
+
+
+def translate_pattern(pattern):
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            out.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            out.append('[' + body.replace('\\', '\\\\') + ']')
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(out)
+
+
+def is_ignored(rules, path, is_dir):
+    """The last matching rule decides, as in git."""
+    ignored = False
+    for base, regex, negated, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        relative = os.path.relpath(path, base).replace(os.sep, '/')
+        if relative.startswith('..'):
+            continue
+        if regex.match(relative):
+            ignored = not negated
+    return ignored
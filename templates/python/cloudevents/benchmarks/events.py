@@ -0,0 +1,80 @@
+"""
+Events per second of the default Function (func.py), which handles one
+event per request, and of the batch variant (batch.py), including decoding
+the requests and encoding the responses as the middleware does.
+
+Run from the Function's directory:
+
+    python benchmarks/events.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from cloudevents.conversion import to_binary, to_structured
+from cloudevents.http import CloudEvent, from_http
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from function import batch, func  # noqa: E402
+
+
+class Sender:
+    """ Encodes responses as the middleware's CloudEventSender does. """
+
+    async def __call__(self, event):
+        to_structured(event)
+
+    async def binary(self, event):
+        to_binary(event)
+
+
+def requests(count, data, binary, batch=False):
+    """ The encoded HTTP requests of count events carrying data. """
+    encode = to_binary if binary else to_structured
+    return [encode(CloudEvent({
+        "id": f"event-{i}",
+        "type": "com.example.benchmark",
+        "source": "https://example.com/benchmark",
+        **({"datacontenttype": "application/octet-stream"} if binary else {}),
+        **({"batch": "true"} if batch else {}),
+    }, data)) for i in range(count)]
+
+
+async def run(function, encoded, events_per_request):
+    send = Sender()
+    start = time.perf_counter()
+    for headers, body in encoded:
+        await function.handle({"event": from_http(headers, body)}, {}, send)
+    return len(encoded) * events_per_request / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--payload-bytes", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    record = {"message": "benchmark", "value": 1}
+    binary = os.urandom(args.payload_bytes)
+    binary_events = max(1, args.events // 10)
+    cases = [
+        ("json, one event per request", func.new(), requests(args.events, record, False), 1),
+        ("json, batch variant, one event per request", batch.new(), requests(args.events, record, False), 1),
+        (f"json, batches of {args.batch_size}", batch.new(),
+         requests(args.events // args.batch_size, [record] * args.batch_size, False, batch=True), args.batch_size),
+        (f"{args.payload_bytes} byte payload, structured", func.new(),
+         requests(binary_events, binary, False), 1),
+        (f"{args.payload_bytes} byte payload, binary pass-through", batch.new(),
+         requests(binary_events, binary, True), 1),
+    ]
+    for name, function, encoded, events_per_request in cases:
+        rate = asyncio.run(run(function, encoded, events_per_request))
+        print(f"{name:<50} {rate:>12,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
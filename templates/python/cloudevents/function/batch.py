@@ -0,0 +1,124 @@
+# Batch Function
+#
+# A variant of func.py for high-volume event streams.  To use it, change
+# function/__init__.py to `from .batch import new`.
+import json
+import logging
+from cloudevents.http import CloudEvent
+
+BINARY_TYPES = (bytes, bytearray, memoryview)
+
+# Extension attribute marking an event whose JSON array data is a batch
+BATCH_ATTRIBUTE = "batch"
+
+
+def new():
+    """ New is the only method that must be implemented by a Function.
+    The instance returned can be of any name.
+    """
+    return Function()
+
+
+def process(payloads):
+    """ process handles the payloads of a batch together and returns one
+    result per payload, in order.  Binary payloads are memoryviews of the
+    request body, so slicing them doesn't copy it.  A binary result is sent
+    back as the data of a binary encoded CloudEvent, copied into bytes once
+    if it is a memoryview, any other result as JSON.
+    """
+    return list(payloads)
+
+
+class Function:
+    def __init__(self):
+        """ The init method is an optional method where initialization can be
+        performed. See the start method for a startup hook which includes
+        configuration.
+        """
+
+    async def handle(self, scope, receive, send):
+        """ Handle all HTTP requests to this Function other than readiness
+        and liveness probes.  The CloudEvent from the request is already
+        decoded and available in the scope as 'event'.
+
+        An event with the extension attribute batch=true and a JSON array
+        as data is a batch: its items are processed together by one
+        process() call and answered by one batch event with the list of
+        results.  Binary data is processed without being decoded and sent
+        back as a binary encoded CloudEvent, so it is not re-encoded as
+        base64.  Any other data, including unmarked arrays, is processed as
+        a batch of one.
+        """
+        request = scope["event"]
+        data = request.data
+
+        response = CloudEvent({
+            "type": "dev.knative.function.response",
+            "source": "https://knative.dev/python-function-response",
+            "id": f"response-{request.get('id', 'unknown')}"
+        })
+
+        if isinstance(data, BINARY_TYPES):
+            result = single_result(process([memoryview(data)]))
+            if isinstance(result, BINARY_TYPES):
+                response["datacontenttype"] = request.get("datacontenttype", "application/octet-stream")
+                response.data = bytes(result) if isinstance(result, memoryview) else result
+            else:
+                response["datacontenttype"] = "application/json"
+                response.data = json.dumps(result).encode()
+            await send.binary(response)
+        elif is_batch(request) and isinstance(data, list):
+            logging.debug("Processing a batch of %d events", len(data))
+            response[BATCH_ATTRIBUTE] = "true"
+            response.data = list(process(data))
+            await send(response)
+        else:
+            response.data = single_result(process([data]))
+            await send(response)
+
+    def start(self, cfg):
+        """ start is an optional method which is called when a new Function
+        instance is started, such as when scaling up or during an update.
+        Provided is a dictionary containing all environmental configuration.
+        Args:
+            cfg (Dict[str, str]): A dictionary containing environmental config.
+                In most cases this will be a copy of os.environ, but it is
+                best practice to use this cfg dict instead of os.environ.
+        """
+        logging.info("Function starting")
+
+    def stop(self):
+        """ stop is an optional method which is called when a function is
+        stopped, such as when scaled down, updated, or manually canceled.  Stop
+        can block while performing function shutdown/cleanup operations.  The
+        process will eventually be killed if this method blocks beyond the
+        platform's configured maximum studown timeout.
+        """
+        logging.info("Function stopping")
+
+    def alive(self):
+        """ alive is an optional method for performing a deep check on your
+        Function's liveness.  If removed, the system will assume the function
+        is ready if the process is running. This is exposed by default at the
+        path /health/liveness.  The optional string return is a message.
+        """
+        return True, "Alive"
+
+    def ready(self):
+        """ ready is an optional method for performing a deep check on your
+        Function's readiness.  If removed, the system will assume the function
+        is ready if the process is running.  This is exposed by default at the
+        path /health/rediness.
+        """
+        return True, "Ready"
+
+
+def is_batch(event):
+    return str(event.get(BATCH_ATTRIBUTE, "")).lower() == "true"
+
+
+def single_result(results):
+    results = list(results)
+    if len(results) != 1:
+        raise ValueError(f"process returned {len(results)} results for one payload")
+    return results[0]
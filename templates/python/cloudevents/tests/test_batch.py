@@ -0,0 +1,88 @@
+"""
+Unit tests of the batch variant of the CloudEvent function, which processes
+batches together and passes binary payloads through.
+"""
+import json
+
+import pytest
+from cloudevents.http import CloudEvent
+from function import batch
+
+ATTRIBUTES = {
+    "id": "test-id",
+    "type": "com.example.test1",
+    "source": "https://example.com/event-producer",
+}
+
+
+class Sender:
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, event):
+        self.sent.append(("structured", event))
+
+    async def binary(self, event):
+        self.sent.append(("binary", event))
+
+
+@pytest.mark.asyncio
+async def test_batch_is_processed_together(monkeypatch):
+    calls = []
+
+    def upper(payloads):
+        calls.append(payloads)
+        return [payload.upper() for payload in payloads]
+
+    monkeypatch.setattr(batch, "process", upper)
+    send = Sender()
+    event = CloudEvent({**ATTRIBUTES, "batch": "true"}, ["a", "b", "c"])
+    await batch.new().handle({"event": event}, {}, send)
+
+    assert calls == [["a", "b", "c"]]
+    [(mode, event)] = send.sent
+    assert mode == "structured"
+    assert event.data == ["A", "B", "C"]
+    assert event["id"] == "response-test-id"
+    assert event["batch"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_unmarked_array_is_one_payload():
+    send = Sender()
+    await batch.new().handle({"event": CloudEvent(ATTRIBUTES, ["a", "b"])}, {}, send)
+    [(mode, event)] = send.sent
+    assert event.data == ["a", "b"]
+    assert "batch" not in event
+
+
+@pytest.mark.asyncio
+async def test_binary_data_is_passed_through():
+    payload = bytes(range(256)) * 64
+    send = Sender()
+    await batch.new().handle({"event": CloudEvent(ATTRIBUTES, payload)}, {}, send)
+
+    [(mode, event)] = send.sent
+    assert mode == "binary"
+    assert type(event.data) is bytes
+    assert event.data == payload
+    assert event["datacontenttype"] == "application/octet-stream"
+
+
+@pytest.mark.asyncio
+async def test_structured_result_of_binary_data_is_json(monkeypatch):
+    monkeypatch.setattr(batch, "process", lambda payloads: [{"size": len(payload)} for payload in payloads])
+    send = Sender()
+    await batch.new().handle({"event": CloudEvent(ATTRIBUTES, b"\x00\x01\x02")}, {}, send)
+
+    [(mode, event)] = send.sent
+    assert mode == "binary"
+    assert event["datacontenttype"] == "application/json"
+    assert json.loads(event.data) == {"size": 3}
+
+
+@pytest.mark.asyncio
+async def test_single_event():
+    send = Sender()
+    await batch.new().handle({"event": CloudEvent(ATTRIBUTES, {"message": "test"})}, {}, send)
+    assert [(mode, event.data) for mode, event in send.sent] == [("structured", {"message": "test"})]
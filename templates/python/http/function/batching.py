@@ -0,0 +1,91 @@
+# Micro-batching
+#
+# Collects the inputs of concurrent requests into batches, so a model runs
+# once per batch instead of once per request.
+import asyncio
+import logging
+
+
+class MicroBatcher:
+    """ MicroBatcher runs process(inputs) on batches of the inputs submitted
+    by concurrent callers.
+
+    A batch is flushed once it holds max_size inputs or max_wait seconds
+    after its first input arrived, whichever comes first, so a lone request
+    waits at most max_wait.  process must return one result per input, in
+    order.  A plain function is run on the executor (None for the loop's
+    default executor), a coroutine function is awaited.  Batches are run
+    concurrently, the executor bounds how many compute at once.
+    """
+
+    def __init__(self, process, max_size=32, max_wait=0.005, executor=None):
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1, not {max_size}")
+        self.process = process
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self.queue = None
+        self.collector = None
+        self.batches = set()  # keeps running batches from being collected
+
+    @classmethod
+    def from_config(cls, process, cfg, executor=None):
+        """ from_config creates a MicroBatcher configured by the start(cfg)
+        settings BATCH_MAX_SIZE (default: 1, which runs every input on its
+        own) and BATCH_MAX_WAIT_MS (default: 5).
+        """
+        return cls(process,
+                   max_size=int(cfg.get("BATCH_MAX_SIZE") or 1),
+                   max_wait=float(cfg.get("BATCH_MAX_WAIT_MS") or 5) / 1000,
+                   executor=executor)
+
+    async def submit(self, item):
+        """ submit adds item to the next batch and returns its result. """
+        if self.collector is None or self.collector.done():
+            # created on first use, in the loop serving the requests
+            self.queue = asyncio.Queue()
+            self.collector = asyncio.ensure_future(self.collect())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # callers which gave up, e.g. on disconnect, are left out
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if batch:
+                task = asyncio.ensure_future(self.run(batch))
+                self.batches.add(task)
+                task.add_done_callback(self.batches.discard)
+
+    async def run(self, batch):
+        inputs = [item for item, _ in batch]
+        try:
+            if asyncio.iscoroutinefunction(self.process):
+                results = await self.process(inputs)
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(self.executor, self.process, inputs)
+            results = list(results)
+            if len(results) != len(inputs):
+                raise ValueError(f"batch of {len(inputs)} inputs returned {len(results)} results")
+        except Exception as e:
+            logging.exception("Batch failed")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,184 @@
+# Response cache
+#
+# Remembers the responses of a handler whose response depends only on the
+# request, so repeated requests are answered without running it again.
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict, namedtuple
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 300
+
+Entry = namedtuple("Entry", "start body size expires")
+
+
+class ResponseCache:
+    """ ResponseCache memoizes the responses of a handle(scope, receive,
+    send) whose response is a function of the request's method, path, query
+    string and body.  Only use it for such handlers: requests are matched by
+    a hash of their body, headers are ignored.
+
+    Successful (2xx) responses are kept for ttl seconds.  Least recently
+    used entries are evicted beyond max_entries responses or max_bytes of
+    response bodies, and responses larger than max_bytes are not kept.
+    Identical requests arriving while the first is being handled wait for
+    its response instead of running the handler again.  hits, misses and
+    coalesced count the requests answered from the cache, by the handler
+    and by waiting for a concurrent identical request.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL_SECONDS,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.pending = {}  # key -> future of the Entry, or None if not cacheable
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_config(cls, cfg):
+        """ from_config creates a ResponseCache configured by the start(cfg)
+        settings RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES and
+        RESPONSE_CACHE_TTL_SECONDS.
+        """
+        return cls(max_entries=int(cfg.get("RESPONSE_CACHE_MAX_ENTRIES") or DEFAULT_MAX_ENTRIES),
+                   max_bytes=int(cfg.get("RESPONSE_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES),
+                   ttl=float(cfg.get("RESPONSE_CACHE_TTL_SECONDS") or DEFAULT_TTL_SECONDS))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "entries": len(self.entries), "bytes": self.bytes}
+
+    def wrap(self, handle):
+        """ wrap returns handle with its responses cached. """
+        async def cached(scope, receive, send):
+            await self.handle(scope, receive, send, handle)
+        return cached
+
+    async def handle(self, scope, receive, send, handle):
+        """ handle answers the request from the cache or by calling
+        handle(scope, receive, send), whose response is then cached. """
+        body = await read_body(receive)
+        key = (scope.get('method'), scope.get('path'), scope.get('query_string', b''),
+               hashlib.sha256(body).digest())
+
+        entry = self.lookup(key)
+        if entry is not None:
+            self.hits += 1
+            await replay(send, entry)
+            return
+
+        pending = self.pending.get(key)
+        if pending is not None:
+            entry = await asyncio.shield(pending)
+            if entry is not None:
+                self.coalesced += 1
+                await replay(send, entry)
+                return
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(key, future)
+        recorder = Recorder(send, self.max_bytes)
+        try:
+            await handle(scope, replay_body(body, receive), recorder)
+        finally:
+            entry = recorder.entry(self.clock() + self.ttl)
+            if self.pending.get(key) is future:
+                del self.pending[key]
+            future.set_result(entry)
+        if entry is not None:
+            self.store(key, entry)
+
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= self.clock():
+            self.remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key, entry):
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = entry
+        self.bytes += entry.size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        self.bytes -= self.entries.pop(key).size
+
+
+class Recorder:
+    """ A send which forwards the response and keeps a copy of it, up to
+    max_bytes of body. """
+
+    def __init__(self, send, max_bytes):
+        self.send = send
+        self.max_bytes = max_bytes
+        self.start = None
+        self.chunks = []
+        self.size = 0
+        self.complete = False
+        self.cacheable = True
+
+    async def __call__(self, message):
+        if message['type'] == 'http.response.start':
+            self.start = message
+            self.cacheable = 200 <= message.get('status', 200) < 300
+        elif message['type'] == 'http.response.body' and self.cacheable:
+            body = message.get('body', b'')
+            self.size += len(body)
+            if self.size > self.max_bytes:
+                self.cacheable = False
+                self.chunks = []
+            else:
+                self.chunks.append(bytes(body))
+            self.complete = not message.get('more_body', False)
+        await self.send(message)
+
+    def entry(self, expires):
+        if self.start is None or not self.cacheable or not self.complete:
+            return None
+        return Entry(self.start, b"".join(self.chunks), self.size, expires)
+
+
+async def replay(send, entry):
+    await send(dict(entry.start))
+    await send({'type': 'http.response.body', 'body': entry.body})
+
+
+def replay_body(body, receive):
+    """ A receive which returns the already read body, then defers to the
+    original receive, e.g. for the disconnect. """
+    sent = False
+
+    async def receive_body():
+        nonlocal sent
+        if sent:
+            return await receive()
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    return receive_body
+
+
+async def read_body(receive):
+    """ read_body returns the complete body of the request. """
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return b"".join(chunks)
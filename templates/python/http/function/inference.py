@@ -0,0 +1,251 @@
+# Inference Function
+#
+# A variant of func.py for serving a model.  To use it, change
+# function/__init__.py to `from .inference import new`.
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .batching import MicroBatcher
+from .caching import ResponseCache, read_body
+
+# Input run through the model once at startup, before reporting ready
+WARMUP_INPUT = "warm up"
+
+# The model of a process pool worker, loaded once per worker process, and
+# the barrier its warm-up waits at until every worker has warmed up
+_worker_model = None
+_worker_warmed_up = None
+
+
+def new():
+    """ New is the only method that must be implemented by a Function.
+    The instance returned can be of any name.
+    """
+    return Function()
+
+
+def load_model(cfg):
+    """ load_model loads the model served by this Function.  It is called
+    once per instance from start(), never per request.  Replace the example
+    with your own model, for instance:
+
+        from transformers import pipeline
+        return pipeline("sentiment-analysis", model=cfg["MODEL_NAME"])
+    """
+    return ExampleModel()
+
+
+def predict(model, inputs):
+    """ predict runs one inference.  It is called on the executor, so it
+    may block and use the CPU for as long as it needs without stalling
+    other requests.
+    """
+    return model(inputs)
+
+
+def predict_batch(model, batch):
+    """ predict_batch returns the predictions of a batch of inputs, in
+    order.  Models which accept batches, e.g. a transformers pipeline called
+    with a list, should be called with the whole batch here.
+    """
+    return [predict(model, inputs) for inputs in batch]
+
+
+def load_worker_model(cfg, warmed_up):
+    global _worker_model, _worker_warmed_up
+    _worker_model = load_model(cfg)
+    _worker_warmed_up = warmed_up
+
+
+def warm_up_worker():
+    """ warm_up_worker runs the warm-up inference in a worker process and
+    then waits until every other worker has run its own.  A worker runs one
+    task at a time, so no warm-up returns before each worker process took
+    one of them.  Returns the worker's process id.
+    """
+    try:
+        predict_batch(_worker_model, [WARMUP_INPUT])
+    except BaseException:
+        _worker_warmed_up.abort()  # fails the warm-ups waiting for this one
+        raise
+    _worker_warmed_up.wait()
+    return os.getpid()
+
+
+def predict_batch_in_worker(batch):
+    return predict_batch(_worker_model, batch)
+
+
+class ExampleModel:
+    """ A stand-in model which counts the words of its input. """
+
+    def __call__(self, text):
+        return {"words": len(text.split())}
+
+
+class Function:
+    def __init__(self):
+        """ The init method is an optional method where initialization can be
+        performed. See the start method for a startup hook which includes
+        configuration.
+        """
+        self.executor = None
+        self.batcher = None
+        self.cache = None
+        self.warmup = None
+
+    async def handle(self, scope, receive, send):
+        """ Handle all HTTP requests to this Function other than readiness
+        and liveness probes.  The request body is the model input, the
+        prediction is returned as JSON.
+
+        Inference runs on the executor, so while it computes the event loop
+        keeps receiving and answering other requests, and with batching the
+        inputs of concurrent requests are predicted together.  With the
+        response cache, repeated inputs are answered without inference.
+        """
+        if self.cache is not None:
+            await self.cache.handle(scope, receive, send, self.respond)
+        else:
+            await self.respond(scope, receive, send)
+
+    async def respond(self, scope, receive, send):
+        if not self.ready()[0]:
+            await send_json(send, 503, {"error": "model is not ready"})
+            return
+
+        body = await read_body(receive)
+        try:
+            text = body.decode()
+        except UnicodeDecodeError:
+            await send_json(send, 400, {"error": "the request body must be UTF-8 text"})
+            return
+        try:
+            result = await self.batcher.submit(text)
+        except Exception:
+            logging.exception("Inference failed")
+            await send_json(send, 500, {"error": "inference failed"})
+            return
+        await send_json(send, 200, result)
+
+    def start(self, cfg):
+        """ start is an optional method which is called when a new Function
+        instance is started, such as when scaling up or during an update.
+        Provided is a dictionary containing all environmental configuration.
+        Args:
+            cfg (Dict[str, str]): A dictionary containing environmental config.
+                In most cases this will be a copy of os.environ, but it is
+                best practice to use this cfg dict instead of os.environ.
+
+        The model is loaded here and warmed up by one inference in the
+        background.  INFERENCE_WORKERS (default: the number of CPUs) bounds
+        how many inferences run at once, INFERENCE_EXECUTOR chooses between a
+        "thread" pool sharing one model (default) and a "process" pool with
+        a model per worker, for models which hold the GIL.  Every worker
+        process of a process pool loads its model and runs a warm-up
+        inference before the Function is ready.
+        BATCH_MAX_SIZE (default: 1, no batching) and BATCH_MAX_WAIT_MS
+        (default: 5) set how many concurrent inputs are predicted at once
+        and how long the first of them waits for the others.
+        RESPONSE_CACHE=true caches the predictions of repeated inputs, see
+        ResponseCache.from_config for its settings.
+        """
+        logging.info("Function starting")
+        workers = int(cfg.get("INFERENCE_WORKERS") or os.cpu_count() or 1)
+        if cfg.get("INFERENCE_EXECUTOR", "thread") == "process":
+            # the barrier reaches the workers as they start, it can't be
+            # passed to them with a task
+            context = multiprocessing.get_context()
+            warmed_up = context.Barrier(workers)
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=load_worker_model, initargs=(dict(cfg), warmed_up))
+            process = predict_batch_in_worker
+            warmups = [self.executor.submit(warm_up_worker) for _ in range(workers)]
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+            process = functools.partial(predict_batch, load_model(cfg))
+            warmups = [self.executor.submit(process, [WARMUP_INPUT])]
+        self.batcher = MicroBatcher.from_config(process, cfg, self.executor)
+        if cfg.get("RESPONSE_CACHE", "").lower() == "true":
+            self.cache = ResponseCache.from_config(cfg)
+        self.warmup = all_of(warmups)
+
+    def stop(self):
+        """ stop is an optional method which is called when a function is
+        stopped, such as when scaled down, updated, or manually canceled.  Stop
+        can block while performing function shutdown/cleanup operations.  The
+        process will eventually be killed if this method blocks beyond the
+        platform's configured maximum studown timeout.
+        """
+        logging.info("Function stopping")
+        if self.cache is not None:
+            logging.info("Response cache: %s", self.cache.stats())
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def alive(self):
+        """ alive is an optional method for performing a deep check on your
+        Function's liveness.  If removed, the system will assume the function
+        is ready if the process is running. This is exposed by default at the
+        path /health/liveness.  The optional string return is a message.
+        """
+        return True, "Alive"
+
+    def ready(self):
+        """ ready is an optional method for performing a deep check on your
+        Function's readiness.  Requests are only routed to the Function once
+        the warm-up started by start() succeeded, until then they are
+        answered with 503.  This is exposed by default at the path
+        /health/rediness.
+        """
+        if self.warmup is None or not self.warmup.done():
+            return False, "Warming up"
+        if self.warmup.exception() is not None:
+            return False, f"Warm-up failed: {self.warmup.exception()}"
+        return True, "Ready"
+
+
+def all_of(futures):
+    """ all_of returns a future of the results of futures, which fails with
+    the first of their exceptions. """
+    combined = Future()
+    remaining = len(futures)
+    lock = threading.Lock()
+
+    def done(_):
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        for future in futures:
+            if future.cancelled():
+                combined.set_exception(CancelledError())
+                return
+            if future.exception() is not None:
+                combined.set_exception(future.exception())
+                return
+        combined.set_result([future.result() for future in futures])
+
+    for future in futures:
+        future.add_done_callback(done)
+    return combined
+
+
+async def send_json(send, status, value):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            [b'content-type', b'application/json'],
+        ],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps(value).encode(),
+    })
@@ -0,0 +1,89 @@
+# Streaming responses
+#
+# Sends a response body in chunks as it is produced, instead of building it
+# in memory first.
+import asyncio
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_DONE = object()
+
+
+async def stream_response(send, chunks, status=200, headers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                          executor=None):
+    """ stream_response sends the bytes or strings of chunks, a sync or
+    async iterable such as a generator, as the body of a response.
+
+    Every chunk is sent as soon as it is produced, with more_body set, so
+    small chunks such as tokens or server-sent events reach the client right
+    away.  Chunks larger than chunk_size are split into messages of at most
+    chunk_size bytes.  The next chunk is only produced once the previous one
+    was sent, so a slow client slows the generator down instead of the
+    response piling up in memory: memory stays at about one chunk per
+    request, however long the response.  Sync iterables are advanced on the
+    executor (None for the loop's default executor), so generators may
+    block, e.g. reading a file.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers if headers is not None else [
+            [b'content-type', b'application/octet-stream'],
+        ],
+    })
+    iterator = chunks if hasattr(chunks, '__aiter__') else SyncChunks(chunks, executor)
+    try:
+        async for chunk in iterator:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            for offset in range(0, len(chunk), chunk_size):
+                body = bytes(chunk[offset:offset + chunk_size])
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        close = getattr(iterator, 'aclose', None)
+        if close is not None:
+            await close()
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+class SyncChunks:
+    """ SyncChunks iterates a sync iterable asynchronously, advancing it on
+    the executor one chunk at a time. """
+
+    def __init__(self, chunks, executor):
+        self.chunks = chunks
+        self.iterator = iter(chunks)
+        self.executor = executor
+        self.pending = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        self.pending = loop.run_in_executor(self.executor, next, self.iterator, _DONE)
+        # shielded, so a cancelled request leaves pending running as long as
+        # next() does
+        chunk = await asyncio.shield(self.pending)
+        self.pending = None
+        if chunk is _DONE:
+            raise StopAsyncIteration
+        return chunk
+
+    async def aclose(self):
+        """ Close the iterable if it has a close method.  A generator can't
+        be closed while next() is still running on the executor, it is then
+        closed once next() returned. """
+        close = getattr(self.chunks, 'close', None)
+        if close is None:
+            return
+        if self.pending is None or self.pending.done():
+            close()
+            return
+
+        def close_when_done(future):
+            if not future.cancelled():
+                future.exception()  # retrieved, the request has already failed
+            close()
+
+        self.pending.add_done_callback(close_when_done)
@@ -0,0 +1,51 @@
+"""
+Unit tests of the micro-batching helper, which predicts the inputs of
+concurrent requests together.
+"""
+import asyncio
+import pytest
+from function.batching import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_flushes_full_batches():
+    batches = []
+
+    def double(inputs):
+        batches.append(inputs)
+        return [2 * x for x in inputs]
+
+    batcher = MicroBatcher(double, max_size=3, max_wait=10)
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(6))), 5)
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+
+
+@pytest.mark.asyncio
+async def test_flushes_after_max_wait():
+    batches = []
+
+    async def double(inputs):
+        batches.append(inputs)
+        return [2 * x for x in inputs]
+
+    batcher = MicroBatcher(double, max_size=100, max_wait=0.01)
+    assert await asyncio.wait_for(asyncio.gather(batcher.submit(1), batcher.submit(2)), 5) == [2, 4]
+    assert await asyncio.wait_for(batcher.submit(3), 5) == 6
+    assert batches == [[1, 2], [3]]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller():
+    def wrong_length(inputs):
+        return inputs[1:]
+
+    batcher = MicroBatcher(wrong_length, max_size=2, max_wait=10)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+def test_from_config():
+    batcher = MicroBatcher.from_config(list, {"BATCH_MAX_SIZE": "16", "BATCH_MAX_WAIT_MS": "20"})
+    assert (batcher.max_size, batcher.max_wait) == (16, 0.02)
+    assert MicroBatcher.from_config(list, {}).max_size == 1
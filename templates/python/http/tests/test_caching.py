@@ -0,0 +1,107 @@
+"""
+Unit tests of the response cache, which answers repeated identical requests
+without running the handler again.
+"""
+import asyncio
+import pytest
+from function.caching import ResponseCache
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_handler(status=200):
+    calls = []
+
+    async def handle(scope, receive, send):
+        message = await receive()
+        calls.append(message['body'])
+        await send({'type': 'http.response.start', 'status': status, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b"re: ", 'more_body': True})
+        await send({'type': 'http.response.body', 'body': message['body']})
+
+    return handle, calls
+
+
+async def invoke(handle, body, method='POST', path='/'):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await handle({'method': method, 'path': path}, receive, send)
+    return sent[0]['status'], b"".join(m.get('body', b'') for m in sent[1:])
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_hit():
+    handle, calls = counting_handler()
+    cache = ResponseCache()
+    cached = cache.wrap(handle)
+
+    assert await invoke(cached, b"a") == (200, b"re: a")
+    assert await invoke(cached, b"a") == (200, b"re: a")
+    assert await invoke(cached, b"b") == (200, b"re: b")
+    assert await invoke(cached, b"a", path='/other') == (200, b"re: a")
+    assert calls == [b"a", b"b", b"a"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_lru_eviction():
+    handle, calls = counting_handler()
+    clock = Clock()
+    cache = ResponseCache(max_entries=2, ttl=10, clock=clock)
+    cached = cache.wrap(handle)
+
+    for body in (b"a", b"b", b"a", b"c", b"a", b"b"):
+        await invoke(cached, body)
+    # b was least recently used when c arrived
+    assert calls == [b"a", b"b", b"c", b"b"]
+
+    clock.now = 11
+    await invoke(cached, b"a")
+    assert calls[-1] == b"a"
+
+
+@pytest.mark.asyncio
+async def test_byte_cap_and_errors_are_not_cached():
+    handle, calls = counting_handler()
+    cache = ResponseCache(max_bytes=8)
+    cached = cache.wrap(handle)
+    await invoke(cached, b"too long")
+    await invoke(cached, b"too long")
+    assert len(calls) == 2 and cache.bytes == 0
+
+    failing, failed_calls = counting_handler(status=500)
+    cached = ResponseCache().wrap(failing)
+    await invoke(cached, b"a")
+    await invoke(cached, b"a")
+    assert len(failed_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_coalesce():
+    release = asyncio.Event()
+    handle, calls = counting_handler()
+
+    async def slow(scope, receive, send):
+        await release.wait()
+        await handle(scope, receive, send)
+
+    cache = ResponseCache()
+    cached = cache.wrap(slow)
+    requests = asyncio.gather(*(invoke(cached, b"a") for _ in range(5)))
+    await asyncio.sleep(0)
+    release.set()
+    assert await requests == [(200, b"re: a")] * 5
+    assert calls == [b"a"]
+    assert (cache.hits, cache.misses, cache.coalesced) == (0, 1, 4)
@@ -0,0 +1,185 @@
+"""
+Unit tests of the inference variant of the Function, which runs the model
+on an executor once start() warmed it up.
+"""
+import asyncio
+import json
+import multiprocessing
+import threading
+import pytest
+from function import inference
+
+
+def request(body):
+    messages = [
+        {'type': 'http.request', 'body': body[:1], 'more_body': True},
+        {'type': 'http.request', 'body': body[1:], 'more_body': False},
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    return receive
+
+
+async def invoke(f, body):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await f.handle({}, request(body), send)
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+@pytest.mark.asyncio
+async def test_inference_after_warmup():
+    f = inference.new()
+    assert f.ready()[0] is False
+
+    f.start({"INFERENCE_WORKERS": "2"})
+    f.warmup.result(timeout=10)
+    assert f.ready() == (True, "Ready")
+
+    assert await invoke(f, b"three little words") == (200, {"words": 3})
+    f.stop()
+
+
+@pytest.mark.asyncio
+async def test_not_ready_until_warm(monkeypatch):
+    release = threading.Event()
+
+    def slow_predict(model, inputs):
+        release.wait(10)
+        return model(inputs)
+
+    monkeypatch.setattr(inference, "predict", slow_predict)
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "1"})
+    assert f.ready() == (False, "Warming up")
+    assert await invoke(f, b"too early") == (503, {"error": "model is not ready"})
+
+    release.set()
+    f.warmup.result(timeout=10)
+    assert f.ready()[0] is True
+    f.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_warmup_is_not_ready(monkeypatch):
+    def broken_predict(model, inputs):
+        raise RuntimeError("model is broken")
+
+    monkeypatch.setattr(inference, "predict", broken_predict)
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "1"})
+    with pytest.raises(RuntimeError):
+        f.warmup.result(timeout=10)
+    assert f.ready() == (False, "Warm-up failed: model is broken")
+    assert await invoke(f, b"a b") == (503, {"error": "model is not ready"})
+    f.stop()
+
+
+@pytest.mark.asyncio
+async def test_process_pool_warms_every_worker():
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "2", "INFERENCE_EXECUTOR": "process"})
+    pids = f.warmup.result(timeout=30)
+    assert len(set(pids)) == 2
+    assert set(pids) == set(f.executor._processes)
+    assert await invoke(f, b"a b c") == (200, {"words": 3})
+    f.stop()
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="workers only inherit the patch when forked")
+@pytest.mark.asyncio
+async def test_process_pool_warmup_fails_with_any_worker(monkeypatch):
+    monkeypatch.setattr(inference, "load_model", lambda cfg: BrokenModel())
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "2", "INFERENCE_EXECUTOR": "process"})
+    with pytest.raises(Exception):
+        f.warmup.result(timeout=30)
+    assert f.ready()[0] is False
+    f.stop()
+
+
+class BrokenModel:
+    def __call__(self, text):
+        raise RuntimeError("model is broken")
+
+
+@pytest.mark.asyncio
+async def test_non_utf8_body_is_rejected():
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "1"})
+    f.warmup.result(timeout=10)
+    assert await invoke(f, b"\xff\xfe") == (400, {"error": "the request body must be UTF-8 text"})
+    f.stop()
+
+
+@pytest.mark.asyncio
+async def test_requests_overlap(monkeypatch):
+    running = 0
+    overlapped = threading.Event()
+    lock = threading.Lock()
+
+    def blocking_predict(model, inputs):
+        nonlocal running
+        with lock:
+            running += 1
+            if running == 2:
+                overlapped.set()
+        overlapped.wait(10)
+        with lock:
+            running -= 1
+        return model(inputs)
+
+    monkeypatch.setattr(inference, "predict", blocking_predict)
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "2"})
+    overlapped.set()  # let the warm-up through alone
+    f.warmup.result(timeout=10)
+    overlapped.clear()
+
+    results = await asyncio.gather(invoke(f, b"a b"), invoke(f, b"c"))
+    assert results == [(200, {"words": 2}), (200, {"words": 1})]
+    f.stop()
+
+
+@pytest.mark.asyncio
+async def test_batched_inference(monkeypatch):
+    batches = []
+
+    def record_batch(model, batch):
+        batches.append(batch)
+        return [model(inputs) for inputs in batch]
+
+    monkeypatch.setattr(inference, "predict_batch", record_batch)
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "1", "BATCH_MAX_SIZE": "2", "BATCH_MAX_WAIT_MS": "10000"})
+    f.warmup.result(timeout=10)
+
+    results = await asyncio.gather(invoke(f, b"a b"), invoke(f, b"c"))
+    assert results == [(200, {"words": 2}), (200, {"words": 1})]
+    assert batches == [["warm up"], ["a b", "c"]]
+    f.stop()
+
+
+@pytest.mark.asyncio
+async def test_cached_inference(monkeypatch):
+    inputs = []
+
+    def record_predict(model, text):
+        inputs.append(text)
+        return model(text)
+
+    monkeypatch.setattr(inference, "predict", record_predict)
+    f = inference.new()
+    f.start({"INFERENCE_WORKERS": "1", "RESPONSE_CACHE": "true"})
+    f.warmup.result(timeout=10)
+
+    assert await invoke(f, b"a b") == (200, {"words": 2})
+    assert await invoke(f, b"a b") == (200, {"words": 2})
+    assert inputs == ["warm up", "a b"]
+    assert f.cache.stats()["hits"] == 1
+    f.stop()
@@ -0,0 +1,100 @@
+"""
+Unit tests of the streaming helper, which sends a response body in chunks
+as a generator produces it.
+"""
+import asyncio
+import threading
+import pytest
+from function.streaming import stream_response
+
+
+class Recorder:
+    def __init__(self):
+        self.messages = []
+
+    async def __call__(self, message):
+        self.messages.append(message)
+
+    def bodies(self):
+        return [(m['body'], m['more_body']) for m in self.messages if m['type'] == 'http.response.body']
+
+
+@pytest.mark.asyncio
+async def test_sends_chunks_as_produced():
+    async def chunks():
+        yield b"ab"
+        yield "cde"
+        yield b"fghijkl"
+
+    send = Recorder()
+    await stream_response(send, chunks(), chunk_size=4)
+    assert send.messages[0]['status'] == 200
+    assert send.bodies() == [(b"ab", True), (b"cde", True), (b"fghi", True), (b"jkl", True), (b"", False)]
+
+
+@pytest.mark.asyncio
+async def test_sync_generator_waits_for_send():
+    produced = []
+
+    def chunks():
+        for i in range(3):
+            produced.append(i)
+            yield b"x" * 10
+
+    sent_when_produced = []
+
+    async def send(message):
+        sent_when_produced.append(len(produced))
+
+    await stream_response(send, chunks(), chunk_size=10)
+    # start, one message per chunk sent before the next is produced, end
+    assert sent_when_produced == [0, 1, 2, 3, 3]
+
+
+@pytest.mark.asyncio
+async def test_generator_closed_on_failed_send():
+    closed = False
+
+    def chunks():
+        nonlocal closed
+        try:
+            while True:
+                yield b"x" * 10
+        finally:
+            closed = True
+
+    async def send(message):
+        if message.get('more_body'):
+            raise OSError("client disconnected")
+
+    with pytest.raises(OSError):
+        await stream_response(send, chunks(), chunk_size=10)
+    assert closed
+
+
+@pytest.mark.asyncio
+async def test_generator_closed_after_cancel_during_next():
+    producing = threading.Event()
+    release = threading.Event()
+    closed = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def chunks():
+        try:
+            producing.set()
+            release.wait(10)
+            yield b"x"
+        finally:
+            loop.call_soon_threadsafe(closed.set)
+
+    async def send(message):
+        pass
+
+    task = asyncio.create_task(stream_response(send, chunks()))
+    await loop.run_in_executor(None, producing.wait, 10)
+    # the request is cancelled while next() still runs on the executor
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    release.set()
+    await asyncio.wait_for(closed.wait(), 10)